@@ -2,11 +2,13 @@ package com.detection;
 
 import org.springframework.boot.SpringApplication;
 import org.springframework.boot.autoconfigure.SpringBootApplication;
+import org.springframework.scheduling.annotation.EnableScheduling;
 
 /**
  * 人体异常行为检测系统 - 主启动类
  */
 @SpringBootApplication
+@EnableScheduling
 public class BehaviorDetectionApplication {
     
     public static void main(String[] args) {
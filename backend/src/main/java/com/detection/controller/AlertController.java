@@ -11,6 +11,8 @@ import org.springframework.format.annotation.DateTimeFormat;
 import org.springframework.web.bind.annotation.*;
 
 import java.time.LocalDateTime;
+import java.util.ArrayList;
+import java.util.HashMap;
 import java.util.List;
 import java.util.Map;
 
@@ -30,17 +32,7 @@ public class AlertController {
     @PostMapping("/notify")
     public ApiResponse<Alert> receiveAlert(@RequestBody Map<String, Object> alertData) {
         try {
-            Alert alert = new Alert();
-            alert.setUserId(Long.valueOf(alertData.get("user_id").toString()));
-            alert.setRecordId(Long.valueOf(alertData.getOrDefault("record_id", 0L).toString()));
-            alert.setAlertType(alertData.get("alert_type").toString());
-            alert.setAlertLevel(alertData.getOrDefault("alert_level", "MEDIUM").toString());
-            alert.setConfidence(Float.valueOf(alertData.get("confidence").toString()));
-            alert.setDescription(alertData.getOrDefault("description", "").toString());
-            alert.setDetailData(alertData.getOrDefault("detail_data", "{}").toString());
-            alert.setSnapshotPath(alertData.getOrDefault("snapshot_path", "").toString());
-            
-            Alert savedAlert = alertService.createAlert(alert);
+            Alert savedAlert = alertService.createAlert(toAlert(alertData));
             
             return ApiResponse.success("告警已记录并推送", savedAlert);
         } catch (Exception e) {
@@ -48,6 +40,42 @@ public class AlertController {
         }
     }
     
+    /**
+     * 批量接收Python服务的告警通知（逐条记录并推送，单条失败不影响其余告警）
+     */
+    @PostMapping("/notify/batch")
+    public ApiResponse<Map<String, Object>> receiveAlerts(@RequestBody List<Map<String, Object>> alertDataList) {
+        List<Long> alertIds = new ArrayList<>();
+        List<String> errors = new ArrayList<>();
+        for (Map<String, Object> alertData : alertDataList) {
+            try {
+                alertIds.add(alertService.createAlert(toAlert(alertData)).getId());
+            } catch (Exception e) {
+                errors.add(e.getMessage());
+            }
+        }
+        
+        Map<String, Object> result = new HashMap<>();
+        result.put("received", alertDataList.size());
+        result.put("saved", alertIds.size());
+        result.put("alert_ids", alertIds);
+        result.put("errors", errors);
+        return ApiResponse.success("告警已记录并推送", result);
+    }
+    
+    private Alert toAlert(Map<String, Object> alertData) {
+        Alert alert = new Alert();
+        alert.setUserId(Long.valueOf(alertData.get("user_id").toString()));
+        alert.setRecordId(Long.valueOf(alertData.getOrDefault("record_id", 0L).toString()));
+        alert.setAlertType(alertData.get("alert_type").toString());
+        alert.setAlertLevel(alertData.getOrDefault("alert_level", "MEDIUM").toString());
+        alert.setConfidence(Float.valueOf(alertData.get("confidence").toString()));
+        alert.setDescription(alertData.getOrDefault("description", "").toString());
+        alert.setDetailData(alertData.getOrDefault("detail_data", "{}").toString());
+        alert.setSnapshotPath(alertData.getOrDefault("snapshot_path", "").toString());
+        return alert;
+    }
+    
     /**
      * 获取用户的告警列表
      */
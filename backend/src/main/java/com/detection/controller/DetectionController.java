@@ -63,6 +63,11 @@ public class DetectionController {
                     System.out.println("开始调用Python服务检测，记录ID: " + record.getId() + ", 用户ID: " + userId);
                     Map<String, Object> result = detectionService.detectBehavior(filePath, sourceType, userId, record.getId());
                     System.out.println("Python服务返回结果: " + result);
+                    if (result != null && result.containsKey("job_id")) {
+                        // 视频检测任务在后台执行，记录保持处理中，由定时任务查询结果后更新
+                        detectionService.attachDetectionJob(record.getId(), String.valueOf(result.get("job_id")));
+                        return;
+                    }
                     detectionService.updateDetectionRecord(record.getId(), result);
                     System.out.println("检测记录更新成功，记录ID: " + record.getId());
                 } catch (Exception e) {
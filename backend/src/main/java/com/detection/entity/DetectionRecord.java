@@ -49,6 +49,9 @@ public class DetectionRecord {
     @Column(columnDefinition = "TEXT")
     private String errorMessage; // 错误信息
     
+    @Column(length = 64)
+    private String jobId; // Python视频检测任务ID
+    
     @Column(nullable = false, updatable = false)
     private LocalDateTime createdAt;
     
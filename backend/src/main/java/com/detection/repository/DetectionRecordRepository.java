@@ -24,5 +24,7 @@ public interface DetectionRecordRepository extends JpaRepository<DetectionRecord
     Long countByUserIdAndHasAbnormal(Long userId, Boolean hasAbnormal);
     
     Long countByHasAbnormal(Boolean hasAbnormal);
+    
+    List<DetectionRecord> findByStatusAndJobIdIsNotNull(String status);
 }
 
@@ -15,7 +15,11 @@ import org.springframework.web.reactive.function.client.WebClient;
 import org.springframework.core.io.FileSystemResource;
 import org.springframework.http.MediaType;
 import org.springframework.http.client.MultipartBodyBuilder;
+import org.springframework.scheduling.annotation.Scheduled;
+import org.springframework.web.reactive.function.client.WebClientResponseException;
 
+import java.time.Duration;
+import java.time.LocalDateTime;
 import java.util.List;
 import java.util.Map;
 
@@ -34,6 +38,9 @@ public class DetectionService {
     @Value("${python.service.url}")
     private String pythonServiceUrl;
     
+    @Value("${python.service.job-timeout-ms:3600000}")
+    private long jobTimeoutMs;
+    
     /**
      * 创建检测记录
      */
@@ -86,6 +93,7 @@ public class DetectionService {
             
             System.out.println("Python服务响应: " + response);
             
+            // 视频检测以异步任务方式执行时，返回值只含 job_id，结果由 pollDetectionJobs 定时查询
             return response;
         } catch (Exception e) {
             System.err.println("调用Python检测服务异常: " + e.getMessage());
@@ -94,6 +102,66 @@ public class DetectionService {
         }
     }
     
+    /**
+     * 记录视频检测对应的Python检测任务，结果由 pollDetectionJobs 定时查询后写回
+     */
+    @Transactional
+    public DetectionRecord attachDetectionJob(Long recordId, String jobId) {
+        DetectionRecord record = detectionRecordRepository.findById(recordId)
+                .orElseThrow(() -> new RuntimeException("检测记录不存在"));
+        record.setJobId(jobId);
+        return detectionRecordRepository.save(record);
+    }
+    
+    /**
+     * 定时查询处理中的视频检测任务：完成则写回结果，失败、不存在或超时则标记失败，仍在进行则等待下一轮
+     */
+    @Scheduled(fixedDelayString = "${python.service.job-poll-interval-ms:2000}")
+    public void pollDetectionJobs() {
+        List<DetectionRecord> records = detectionRecordRepository.findByStatusAndJobIdIsNotNull("PROCESSING");
+        if (records.isEmpty()) {
+            return;
+        }
+        
+        WebClient webClient = webClientBuilder.baseUrl(pythonServiceUrl).build();
+        for (DetectionRecord record : records) {
+            try {
+                pollDetectionJob(webClient, record);
+            } catch (WebClientResponseException.NotFound e) {
+                // 任务已过期清理或Python服务重启
+                markDetectionFailed(record.getId(), "检测任务不存在: " + record.getJobId());
+            } catch (Exception e) {
+                // 网络等临时错误，下一轮重试
+                System.err.println("查询检测任务失败: jobId=" + record.getJobId() + " - " + e.getMessage());
+            }
+        }
+    }
+    
+    @SuppressWarnings("unchecked")
+    private void pollDetectionJob(WebClient webClient, DetectionRecord record) {
+        String jobId = record.getJobId();
+        Map<String, Object> job = webClient.get()
+                .uri("/detect/jobs/{jobId}", jobId)
+                .retrieve()
+                .bodyToMono(Map.class)
+                .block();
+        String status = job != null ? String.valueOf(job.get("status")) : null;
+        
+        if ("COMPLETED".equals(status)) {
+            Map<String, Object> result = webClient.get()
+                    .uri("/detect/jobs/{jobId}/result", jobId)
+                    .retrieve()
+                    .bodyToMono(Map.class)
+                    .block();
+            updateDetectionRecord(record.getId(), result);
+        } else if ("FAILED".equals(status)) {
+            markDetectionFailed(record.getId(), "检测任务失败: " + job.get("error"));
+        } else if (record.getCreatedAt() != null
+                && record.getCreatedAt().plus(Duration.ofMillis(jobTimeoutMs)).isBefore(LocalDateTime.now())) {
+            markDetectionFailed(record.getId(), "检测任务超时: " + jobId);
+        }
+    }
+    
     /**
      * 更新检测记录
      */
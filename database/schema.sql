@@ -46,6 +46,7 @@ CREATE TABLE IF NOT EXISTS detection_records (
     confidence FLOAT COMMENT '置信度 (0-1)',
     status VARCHAR(20) NOT NULL DEFAULT 'PROCESSING' COMMENT '状态: PROCESSING, COMPLETED, FAILED',
     error_message TEXT COMMENT '错误信息',
+    job_id VARCHAR(64) COMMENT 'Python视频检测任务ID',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     
@@ -1,33 +1,128 @@
 """
 告警通知器
 负责将检测到的异常行为推送到Spring Boot后端
+
+send_alert 只把告警放入有界队列，由后台线程合并成批、经长连接发送；
+发送失败按指数退避重试，后端不可用时告警写入磁盘暂存，恢复后补发
 """
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import Dict, Any
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+from config import (
+    LOG_LEVEL, LOG_FORMAT, BACKEND_URL,
+    ALERT_QUEUE_SIZE, ALERT_BATCH_SIZE, ALERT_BATCH_MAX_WAIT_MS, ALERT_TIMEOUT,
+    ALERT_MAX_RETRIES, ALERT_RETRY_BACKOFF, ALERT_SPOOL_DIR, ALERT_SPOOL_MAX, ALERT_SPOOL_RETRY_INTERVAL
+)
+from pose_data import serialize_result
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# 队列与暂存文件中的一条告警：(告警数据, 入队时间戳)
+QueuedAlert = Tuple[Dict[str, Any], float]
+
+# 发送结果
+DELIVERED = "delivered"
+REJECTED = "rejected"  # 后端拒绝（4xx），重试无意义
+FAILED = "failed"  # 网络错误或 5xx，可重试
+
 
 class AlertNotifier:
     """告警通知器"""
-    
-    def __init__(self, backend_url: str = "http://localhost:8080/api"):
+
+    def __init__(
+        self,
+        backend_url: str = BACKEND_URL,
+        queue_size: int = ALERT_QUEUE_SIZE,
+        batch_size: int = ALERT_BATCH_SIZE,
+        batch_max_wait_ms: float = ALERT_BATCH_MAX_WAIT_MS,
+        timeout: float = ALERT_TIMEOUT,
+        max_retries: int = ALERT_MAX_RETRIES,
+        retry_backoff: float = ALERT_RETRY_BACKOFF,
+        spool_dir: str = ALERT_SPOOL_DIR,
+        spool_max: int = ALERT_SPOOL_MAX,
+        spool_retry_interval: float = ALERT_SPOOL_RETRY_INTERVAL
+    ):
         """
         初始化通知器
-        
+
         参数:
             backend_url: Spring Boot后端地址
+            queue_size: 待发送队列容量，队列满时丢弃新告警
+            batch_size: 每批最多合并的告警数
+            batch_max_wait_ms: 批次第一条告警的最长等待时间（毫秒）
+            timeout: 单次请求超时（秒）
+            max_retries: 发送失败后的重试次数
+            retry_backoff: 第一次重试前的等待（秒），之后每次翻倍
+            spool_dir: 后端不可用时暂存告警的目录
+            spool_max: 暂存告警条数上限，超出后丢弃
+            spool_retry_interval: 后端不可用后探测恢复的间隔（秒）
         """
         self.backend_url = backend_url
         self.alert_endpoint = f"{backend_url}/alerts/notify"
-    
+        self.batch_endpoint = f"{backend_url}/alerts/notify/batch"
+        self.batch_size = max(1, batch_size)
+        self.batch_max_wait = max(0.0, batch_max_wait_ms) / 1000
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.spool_dir = Path(spool_dir)
+        self.spool_max = spool_max
+        self.spool_retry_interval = spool_retry_interval
+
+        self._queue: "queue.Queue[QueuedAlert]" = queue.Queue(maxsize=max(1, queue_size))
+        self._session: Optional[requests.Session] = None
+        self._batch_supported = True
+        self._down_until = 0.0  # 在此之前认为后端不可用，新批次直接暂存
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # 统计
+        self.enqueued_count = 0
+        self.delivered_count = 0
+        self.dropped_count = 0
+        self.rejected_count = 0
+        self.retry_count = 0
+        self.batch_count = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency: Optional[float] = None
+        self.spooled_count = sum(self._spool_file_size(path) for path in self._spool_files())
+
+    def start(self):
+        with self._start_lock:
+            if self._running:
+                return
+            self._running = True
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="alert-notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程：队列中剩余告警各发送一次，失败则写入暂存"""
+        self._running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     def send_alert(self, alert_data: Dict[str, Any]) -> bool:
         """
-        发送告警到后端
-        
+        将告警放入发送队列（不等待网络请求）
+
         参数:
             alert_data: 告警数据字典，包含以下字段：
                 - user_id: 用户ID
@@ -38,29 +133,285 @@ class AlertNotifier:
                 - description: 描述
                 - detail_data: 详细数据（JSON字符串）
                 - snapshot_path: 快照图片路径（可选）
-        
+
         返回:
-            是否发送成功
+            是否成功入队（队列已满时丢弃并返回 False）
         """
+        if not self._running:
+            self.start()
         try:
-            response = requests.post(
-                self.alert_endpoint,
-                json=alert_data,
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"告警发送成功: {alert_data['alert_type']}")
-                return True
-            else:
-                logger.error(f"告警发送失败: {response.status_code} - {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"发送告警时发生错误: {str(e)}")
+            self._queue.put_nowait((alert_data, time.time()))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped_count += 1
+            logger.warning(f"告警队列已满，丢弃告警: {alert_data.get('alert_type')}")
             return False
-    
+        with self._stats_lock:
+            self.enqueued_count += 1
+        return True
+
+    def _get_session(self) -> requests.Session:
+        """复用连接的会话，只在后台线程中使用"""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    @staticmethod
+    def _classify(response: requests.Response) -> str:
+        if response.status_code == 200:
+            return DELIVERED
+        if response.status_code >= 500 or response.status_code == 429:
+            return FAILED
+        return REJECTED
+
+    def _post(self, items: List[QueuedAlert]) -> Tuple[List[QueuedAlert], List[QueuedAlert], List[QueuedAlert]]:
+        """
+        发送一批告警：多条时优先调用批量接口，后端不支持（404/405）时改为逐条发送
+
+        返回:
+            (已送达, 被拒绝, 可重试) 三个列表
+        """
+        session = self._get_session()
+        try:
+            if len(items) > 1 and self._batch_supported:
+                response = session.post(
+                    self.batch_endpoint,
+                    json=[alert for alert, _ in items],
+                    timeout=self.timeout
+                )
+                if response.status_code in (404, 405):
+                    self._batch_supported = False
+                    logger.info("后端不支持批量告警接口，改为逐条发送")
+                else:
+                    status = self._classify(response)
+                    if status == REJECTED:
+                        logger.error(f"批量告警被拒绝: {response.status_code} - {response.text}")
+                    elif status == FAILED:
+                        logger.warning(f"批量告警发送失败: {response.status_code}")
+                    return (
+                        items if status == DELIVERED else [],
+                        items if status == REJECTED else [],
+                        items if status == FAILED else []
+                    )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"发送告警时发生错误: {str(e)}")
+            return [], [], items
+
+        delivered, rejected = [], []
+        for index, item in enumerate(items):
+            try:
+                response = session.post(self.alert_endpoint, json=item[0], timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"发送告警时发生错误: {str(e)}")
+                return delivered, rejected, items[index:]
+            status = self._classify(response)
+            if status == FAILED:
+                logger.warning(f"告警发送失败: {response.status_code}")
+                return delivered, rejected, items[index:]
+            if status == REJECTED:
+                logger.error(f"告警被拒绝: {response.status_code} - {response.text}")
+                rejected.append(item)
+            else:
+                delivered.append(item)
+        return delivered, rejected, []
+
+    def _record_result(self, delivered: List[QueuedAlert], rejected: List[QueuedAlert]):
+        now = time.time()
+        with self._stats_lock:
+            for alert, enqueued_at in delivered:
+                latency = now - enqueued_at
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                self.last_latency = latency
+            self.delivered_count += len(delivered)
+            self.rejected_count += len(rejected)
+        for alert, _ in delivered:
+            logger.info(f"告警发送成功: {alert.get('alert_type')}")
+
+    def _backend_down(self) -> bool:
+        return time.monotonic() < self._down_until
+
+    def _mark_down(self):
+        if not self._backend_down():
+            logger.error(f"告警后端不可用，{self.spool_retry_interval:g} 秒后重试，期间告警写入暂存")
+        self._down_until = time.monotonic() + self.spool_retry_interval
+
+    def _deliver(self, items: List[QueuedAlert], max_retries: int):
+        """发送一批告警，失败时退避重试，仍失败则写入暂存"""
+        if self._backend_down():
+            self._spool(items)
+            return
+
+        attempt = 0
+        while items:
+            delivered, rejected, items = self._post(items)
+            self._record_result(delivered, rejected)
+            if not items:
+                break
+            if attempt >= max_retries:
+                self._mark_down()
+                self._spool(items)
+                return
+            delay = self.retry_backoff * (2 ** attempt)
+            attempt += 1
+            with self._stats_lock:
+                self.retry_count += 1
+            # 停止时不再等待
+            if self._stop_event.wait(delay):
+                max_retries = attempt
+        self._down_until = 0.0
+        with self._stats_lock:
+            self.batch_count += 1
+
+    def _collect_batch(self) -> List[QueuedAlert]:
+        """等待第一条告警，然后在截止时间内尽量凑满一批"""
+        try:
+            first = self._queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if batch:
+                self._deliver(batch, self.max_retries)
+            elif self.spooled_count and not self._backend_down():
+                self._replay_spool()
+
+        # 退出时剩余告警各发送一次，失败则暂存到下次启动
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                break
+            self._deliver(batch, 0)
+
+    # ---- 磁盘暂存 ----
+
+    def _spool_files(self) -> List[Path]:
+        """按写入顺序排列的暂存文件，文件名为 <纳秒时间戳>_<条数>.json"""
+        if not self.spool_dir.is_dir():
+            return []
+        return sorted(self.spool_dir.glob("*.json"))
+
+    @staticmethod
+    def _spool_file_size(path: Path) -> int:
+        try:
+            return int(path.stem.rsplit("_", 1)[1])
+        except (IndexError, ValueError):
+            return 0
+
+    def _write_spool_file(self, items: List[QueuedAlert], path: Path = None):
+        if path is None:
+            path = self.spool_dir / f"{time.time_ns():020d}_{len(items)}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([{'alert': alert, 'enqueued_at': enqueued_at} for alert, enqueued_at in items], f,
+                      ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _spool(self, items: List[QueuedAlert]):
+        """写入暂存目录，超出上限的部分丢弃"""
+        room = max(0, self.spool_max - self.spooled_count)
+        dropped = len(items) - room
+        if dropped > 0:
+            items = items[:room]
+            with self._stats_lock:
+                self.dropped_count += dropped
+            logger.warning(f"告警暂存已满，丢弃 {dropped} 条告警")
+        if not items:
+            return
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._write_spool_file(items)
+        except OSError as e:
+            with self._stats_lock:
+                self.dropped_count += len(items)
+            logger.error(f"写入告警暂存失败，丢弃 {len(items)} 条告警: {str(e)}")
+            return
+        with self._stats_lock:
+            self.spooled_count += len(items)
+
+    def _replay_spool(self):
+        """按写入顺序补发暂存告警，有新告警入队或后端仍不可用时暂停"""
+        for path in self._spool_files():
+            if not self._running or not self._queue.empty():
+                return
+            count = self._spool_file_size(path)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    items = [(entry['alert'], entry['enqueued_at']) for entry in json.load(f)]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"暂存文件损坏，已丢弃: {path.name} ({str(e)})")
+                path.unlink(missing_ok=True)
+                with self._stats_lock:
+                    self.spooled_count -= count
+                    self.dropped_count += count
+                continue
+
+            delivered, rejected, remaining = self._post(items)
+            self._record_result(delivered, rejected)
+            if remaining:
+                # 只保留未送达的部分，等待下次探测
+                remaining_path = path.with_name(f"{path.stem.rsplit('_', 1)[0]}_{len(remaining)}.json")
+                if remaining_path != path:
+                    self._write_spool_file(remaining, remaining_path)
+                    path.unlink(missing_ok=True)
+                with self._stats_lock:
+                    self.spooled_count -= count - len(remaining)
+                self._mark_down()
+                return
+            path.unlink(missing_ok=True)
+            with self._stats_lock:
+                self.spooled_count -= count
+                self.batch_count += 1
+            logger.info(f"已补发 {len(items)} 条暂存告警")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """队列深度、送达/丢弃/重试计数、暂存条数与送达延迟（入队到后端确认）"""
+        with self._stats_lock:
+            return {
+                'running': self._running,
+                'backend_available': not self._backend_down(),
+                'batch_endpoint_supported': self._batch_supported,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'enqueued': self.enqueued_count,
+                'delivered': self.delivered_count,
+                'dropped': self.dropped_count,
+                'rejected': self.rejected_count,
+                'retries': self.retry_count,
+                'batches': self.batch_count,
+                'spooled': self.spooled_count,
+                'avg_delivery_latency_ms': (
+                    round(self.total_latency * 1000 / self.delivered_count, 2) if self.delivered_count else 0.0
+                ),
+                'max_delivery_latency_ms': round(self.max_latency * 1000, 2),
+                'last_delivery_latency_ms': (
+                    round(self.last_latency * 1000, 2) if self.last_latency is not None else None
+                ),
+            }
+
     def create_alert_from_detection(
         self,
         user_id: int,
@@ -100,7 +451,7 @@ class AlertNotifier:
             'alert_level': alert_level,
             'confidence': confidence,
             'description': description,
-            'detail_data': json.dumps(detection_result),
+            'detail_data': json.dumps(serialize_result(detection_result)),
         }
         
         if record_id is not None:
@@ -114,4 +465,3 @@ class AlertNotifier:
 
 # 全局通知器实例
 notifier = AlertNotifier()
-
@@ -0,0 +1,132 @@
+"""
+检测结果可视化
+图片与视频帧共用的绘制器：检测框与骨架直接由 PoseBatch 的关键点数组绘制，
+文字面板只在其所在的小矩形内半透明混合，不生成整帧副本
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 与 ultralytics 姿态可视化相同的调色板 (BGR)、骨架连接（关键点下标）与配色
+POSE_PALETTE = np.array([
+    [255, 128, 0], [255, 153, 51], [255, 178, 102], [230, 230, 0], [255, 153, 255],
+    [153, 204, 255], [255, 102, 255], [255, 51, 255], [102, 178, 255], [51, 153, 255],
+    [255, 153, 153], [255, 102, 102], [255, 51, 51], [153, 255, 153], [102, 255, 102],
+    [51, 255, 51], [0, 255, 0], [0, 0, 255], [255, 0, 0], [255, 255, 255],
+], dtype=np.uint8)
+SKELETON = np.array([
+    [15, 13], [13, 11], [16, 14], [14, 12], [11, 12], [5, 11], [6, 12], [5, 6], [5, 7], [6, 8],
+    [7, 9], [8, 10], [1, 2], [0, 1], [0, 2], [1, 3], [2, 4], [3, 5], [4, 6],
+])
+LIMB_COLORS = [tuple(int(c) for c in color)
+               for color in POSE_PALETTE[[9, 9, 9, 9, 7, 7, 7, 0, 0, 0, 0, 0, 16, 16, 16, 16, 16, 16, 16]]]
+KEYPOINT_COLORS = [tuple(int(c) for c in color)
+                   for color in POSE_PALETTE[[16, 16, 16, 16, 16, 0, 0, 0, 0, 0, 0, 9, 9, 9, 9, 9, 9]]]
+BOX_COLOR = (255, 42, 4)
+
+# 面板背景的不透明度（黑色底）
+PANEL_ALPHA = 0.6
+
+
+class FrameAnnotator:
+    """
+    检测结果绘制器
+
+    annotate 直接在传入的图像上绘制；需要保留原图时由调用方传 copy=True，只复制一次
+    """
+
+    def __init__(self, line_width: int = 2, keypoint_radius: int = 5, keypoint_threshold: float = 0.25):
+        """
+        参数:
+            line_width: 检测框线宽（骨架线宽为其一半向上取整）
+            keypoint_radius: 关键点半径
+            keypoint_threshold: 关键点置信度低于该值时不绘制该点及相连的骨架
+        """
+        self.line_width = line_width
+        self.keypoint_radius = keypoint_radius
+        self.keypoint_threshold = keypoint_threshold
+
+    def annotate(self, image: np.ndarray, detection_result: Dict[str, Any], copy: bool = False,
+                 scale: Tuple[float, float] = (1.0, 1.0)) -> np.ndarray:
+        """
+        绘制检测框、骨架、状态面板与人数面板
+
+        参数:
+            image: BGR 图像
+            detection_result: _analyze_results 的分析结果（persons 为 PoseBatch）
+            copy: 为 True 时在副本上绘制，否则直接修改 image
+            scale: 检测结果坐标到 image 坐标的缩放 (x, y)，检测帧与绘制帧尺寸不同时使用
+
+        返回:
+            绘制后的图像
+        """
+        canvas = image.copy() if copy else image
+        persons = detection_result.get('persons')
+        if persons is not None and len(persons):
+            keypoints, boxes = persons.keypoints, persons.boxes
+            if scale != (1.0, 1.0):
+                keypoints = keypoints * [scale[0], scale[1], 1.0]
+                boxes = boxes * [scale[0], scale[1], scale[0], scale[1]]
+            self.draw_persons(canvas, keypoints, boxes)
+
+        if detection_result['has_abnormal']:
+            shade_rect(canvas, (10, 10), (350, 70))
+            cv2.putText(canvas, f"ABNORMAL: {detection_result['behavior_type']}", (18, 33),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 255), 2)
+            cv2.putText(canvas, f"Confidence: {detection_result['confidence']:.2f}", (18, 55),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        else:
+            shade_rect(canvas, (10, 10), (200, 50))
+            cv2.putText(canvas, "Status: NORMAL", (18, 35),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 0), 2)
+
+        # 人数统计（左下角）
+        person_count_text = f"Persons: {detection_result['person_count']}"
+        (text_w, text_h), _ = cv2.getTextSize(person_count_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        text_x, text_y = 18, canvas.shape[0] - 22
+        shade_rect(canvas, (text_x - 8, text_y - text_h - 8), (text_x + text_w + 8, text_y + 8))
+        cv2.putText(canvas, person_count_text, (text_x, text_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return canvas
+
+    def draw_persons(self, canvas: np.ndarray, keypoints: np.ndarray, boxes: Optional[np.ndarray] = None):
+        """
+        绘制每人的检测框、关键点与骨架
+
+        参数:
+            canvas: 绘制目标图像（原地修改）
+            keypoints: 关键点 (N, 17, 3)
+            boxes: 检测框 (M, 4)，可为空
+        """
+        if boxes is not None:
+            for x1, y1, x2, y2 in boxes.astype(int).tolist():
+                cv2.rectangle(canvas, (x1, y1), (x2, y2), BOX_COLOR, self.line_width, cv2.LINE_AA)
+
+        # 整批一次判断可见性并取整，逐人逐段只剩绘制调用
+        visible = keypoints[:, :, 2] >= self.keypoint_threshold
+        points = keypoints[:, :, :2].astype(int)
+        limbs = (visible[:, SKELETON[:, 0]] & visible[:, SKELETON[:, 1]]
+                 & (points[:, SKELETON].reshape(len(points), len(SKELETON), 4).min(axis=2) >= 0))
+        limb_thickness = int(np.ceil(self.line_width / 2))
+        for person_points, person_visible, person_limbs in zip(points.tolist(), visible.tolist(), limbs.tolist()):
+            for index, (point, shown) in enumerate(zip(person_points, person_visible)):
+                if shown:
+                    cv2.circle(canvas, tuple(point), self.keypoint_radius, KEYPOINT_COLORS[index], -1, cv2.LINE_AA)
+            for index, shown in enumerate(person_limbs):
+                if shown:
+                    start, end = SKELETON[index]
+                    cv2.line(canvas, tuple(person_points[start]), tuple(person_points[end]),
+                             LIMB_COLORS[index], limb_thickness, cv2.LINE_AA)
+
+
+def shade_rect(canvas: np.ndarray, top_left: Tuple[int, int], bottom_right: Tuple[int, int],
+               alpha: float = PANEL_ALPHA):
+    """将矩形区域（含边界，超出画面部分忽略）按 alpha 与黑色混合，只处理该矩形内的像素"""
+    height, width = canvas.shape[:2]
+    x1, y1 = max(top_left[0], 0), max(top_left[1], 0)
+    x2, y2 = min(bottom_right[0] + 1, width), min(bottom_right[1] + 1, height)
+    if x1 >= x2 or y1 >= y2:
+        return
+    roi = canvas[y1:y2, x1:x2]
+    roi[:] = cv2.convertScaleAbs(roi, alpha=1 - alpha)
@@ -1,21 +1,35 @@
 """
 人体异常行为检测服务 - FastAPI主应用
 """
-from fastapi import FastAPI, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 import os
 import cv2
 import io
+import json
 import numpy as np
+import logging
 from pathlib import Path
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import LOG_LEVEL, LOG_FORMAT, MAX_FILE_SIZE
+
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
 
 from detector import BehaviorDetector
+from pose_data import serialize_result
 from alert_notifier import notifier
-from rtsp_handler import RTSPStreamHandler
+from stream_manager import RTSPStreamManager, DEFAULT_CAMERA_ID
+from job_manager import DetectionJobManager, JOB_COMPLETED, JOB_FAILED
+from preview import MJPEG_BOUNDARY
+from result_feed import parse_fields
 import time
 
 # 记录服务启动时间
@@ -39,21 +53,35 @@ app.add_middleware(
 # 初始化检测器
 detector = BehaviorDetector()
 
-# 初始化RTSP流处理器
-rtsp_handler = RTSPStreamHandler(detector, notifier)
+# 初始化多路RTSP流管理器（所有摄像头共享同一检测器）
+stream_manager = RTSPStreamManager(detector, notifier)
+
+# 初始化视频检测任务管理器
+job_manager = DetectionJobManager()
 
 # 创建必要的目录
 UPLOAD_DIR = Path("uploads")
 TEMP_DIR = Path("temp")
 VISUALIZATIONS_DIR = Path("visualizations")
 SNAPSHOT_DIR = Path("snapshots")
+RESULTS_DIR = Path("results")  # 视频逐帧检测记录（NPZ）
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传文件分块读取大小
 
-for directory in [UPLOAD_DIR, TEMP_DIR, VISUALIZATIONS_DIR, SNAPSHOT_DIR]:
+for directory in [UPLOAD_DIR, TEMP_DIR, VISUALIZATIONS_DIR, SNAPSHOT_DIR, RESULTS_DIR]:
     directory.mkdir(exist_ok=True)
 
 # 挂载静态文件目录
 app.mount("/visualizations", StaticFiles(directory=str(VISUALIZATIONS_DIR)), name="visualizations")
 app.mount("/snapshots", StaticFiles(directory=str(SNAPSHOT_DIR)), name="snapshots")
+app.mount("/results", StaticFiles(directory=str(RESULTS_DIR)), name="results")
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """停止所有RTSP流与后台任务"""
+    stream_manager.stop_all()
+    job_manager.shutdown()
+    notifier.stop()
 
 
 @app.get("/")
@@ -79,6 +107,8 @@ async def health_check():
         "model_name": "yolov8n-pose.pt",
         "version": "1.0.0",
         "uptime_seconds": int(time.time() - start_time),
+        "jobs": job_manager.stats(),
+        "alerts": notifier.get_stats(),
         "system": {
             "cpu_percent": cpu_percent,
             "memory_used_mb": memory.used / (1024 * 1024),
@@ -88,6 +118,137 @@ async def health_check():
     }
 
 
+@app.get("/debug/trace")
+async def get_detection_trace(limit: int = 200, kind: str = None):
+    """
+    获取最近的判定过程追踪记录（需设置 DETECTION_TRACE_SIZE 开启）
+    
+    kind 可选 frame / fall / fight
+    """
+    return {
+        **detector.trace.stats(),
+        "records": detector.trace.snapshot(limit=limit, kind=kind)
+    }
+
+
+@app.delete("/debug/trace")
+async def clear_detection_trace():
+    """清空判定过程追踪记录"""
+    detector.trace.clear()
+    return {"message": "追踪记录已清空"}
+
+
+def _save_alert_snapshot(result: dict, source_type: str, source) -> str:
+    """
+    保存告警快照，返回快照文件名
+    
+    source: IMAGE 为上传的图片内容（bytes），VIDEO 为视频临时文件路径
+    """
+    snapshot_filename = f"{result['behavior_type']}_{int(time.time())}.jpg"
+    snapshot_file_path = SNAPSHOT_DIR / snapshot_filename
+    
+    if source_type == "IMAGE":
+        # 图片直接写入原始内容
+        with open(snapshot_file_path, "wb") as f:
+            f.write(source)
+    elif source_type == "VIDEO":
+        # 视频提取第一帧作为快照
+        cap = cv2.VideoCapture(str(source))
+        ret, frame = cap.read()
+        if ret:
+            cv2.imwrite(str(snapshot_file_path), frame)
+        cap.release()
+    return snapshot_filename
+
+
+def _notify_if_abnormal(result: dict, source_type: str, source,
+                        user_id: int, record_id: int, enable_alert: bool):
+    """如果检测到异常且启用告警，保存快照并发送告警通知（source 见 _save_alert_snapshot）"""
+    if not (enable_alert and result['has_abnormal'] and user_id is not None):
+        return
+    try:
+        snapshot_filename = _save_alert_snapshot(result, source_type, source)
+        
+        # 创建并发送告警
+        alert_data = notifier.create_alert_from_detection(
+            user_id=user_id,
+            detection_result=result,
+            record_id=record_id,
+            snapshot_path=f"snapshots/{snapshot_filename}"
+        )
+        
+        # 发送通知
+        notifier.send_alert(alert_data)
+    except Exception as alert_error:
+        # 告警发送失败不影响检测结果返回
+        logger.error("告警发送失败: %s", alert_error)
+
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过 MAX_FILE_SIZE"""
+
+
+def _read_upload(src, max_size: int = MAX_FILE_SIZE) -> bytes:
+    """分块读取上传内容到内存，超过 max_size 时中止"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = src.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLargeError(f"文件大小超过限制 ({max_size // (1024 * 1024)}MB)")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _save_upload(src, dst_path: Path, max_size: int = MAX_FILE_SIZE) -> int:
+    """分块将上传内容写入 dst_path，超过 max_size 时中止并删除已写入的部分，返回写入字节数"""
+    size = 0
+    try:
+        with open(dst_path, "wb") as dst:
+            while True:
+                chunk = src.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"文件大小超过限制 ({max_size // (1024 * 1024)}MB)")
+                dst.write(chunk)
+    except BaseException:
+        _remove_temp_file(dst_path)
+        raise
+    return size
+
+
+def _remove_temp_file(path: Path):
+    """清理临时文件"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_video_job(temp_file_path: Path, vis_filename: str, records_filename: str, user_id: int,
+                   record_id: int, enable_alert: bool, progress_callback) -> dict:
+    """后台任务：检测视频并生成可视化视频与逐帧记录，完成后发送告警并清理临时文件"""
+    from urllib.parse import quote
+    try:
+        vis_path = VISUALIZATIONS_DIR / vis_filename
+        # 使用OpenCV直接生成可视化视频，逐帧记录写入 NPZ
+        result = detector.detect_video(str(temp_file_path), visualize=True, output_path=str(vis_path),
+                                       progress_callback=progress_callback,
+                                       records_path=str(RESULTS_DIR / records_filename))
+        # 添加可视化视频与逐帧记录URL（使用URL编码）
+        result['visualization_url'] = f"http://localhost:5000/visualizations/{quote(vis_filename)}"
+        result['frame_records_url'] = f"http://localhost:5000/results/{quote(records_filename)}"
+        _notify_if_abnormal(result, "VIDEO", temp_file_path, user_id, record_id, enable_alert)
+        return result
+    finally:
+        _remove_temp_file(temp_file_path)
+
+
 @app.post("/detect")
 async def detect_behavior(
     file: UploadFile = File(...),
@@ -99,6 +260,9 @@ async def detect_behavior(
     """
     检测异常行为
     
+    图片同步返回检测结果；视频提交为后台任务，立即返回任务ID（HTTP 202），
+    通过 /detect/jobs/{job_id} 轮询进度，通过 /detect/jobs/{job_id}/result 获取结果
+    
     参数:
         file: 上传的图片或视频文件
         source_type: 来源类型 (IMAGE, VIDEO, REALTIME)
@@ -107,105 +271,122 @@ async def detect_behavior(
         enable_alert: 是否启用告警推送
     
     返回:
-        检测结果JSON
+        检测结果JSON，或视频任务信息
     """
     try:
-        # 保存上传的文件
-        file_extension = os.path.splitext(file.filename)[1]
-        temp_file_path = TEMP_DIR / f"temp_{file.filename}"
+        if source_type not in ("IMAGE", "VIDEO"):
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"不支持的源类型: {source_type}"}
+            )
         
-        with open(temp_file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 已知大小时提前拒绝，未知时在分块读取过程中检查
+        if file.size is not None and file.size > MAX_FILE_SIZE:
+            raise UploadTooLargeError(f"文件大小超过限制 ({MAX_FILE_SIZE // (1024 * 1024)}MB)")
         
-        # 生成可视化文件路径（使用纯ASCII文件名避免编码问题）
-        import time
+        # 生成文件名（使用纯ASCII文件名避免编码问题，避免同名上传互相覆盖）
         import uuid
         timestamp = int(time.time())
         unique_id = str(uuid.uuid4())[:8]
         file_extension = os.path.splitext(file.filename)[1].lower()
         
-        # 根据类型进行检测
-        if source_type == "IMAGE":
-            # 图片：保留原扩展名
-            vis_filename = f"vis_{timestamp}_{unique_id}{file_extension}"
-            vis_path = VISUALIZATIONS_DIR / vis_filename
-            
-            result = detector.detect_image(str(temp_file_path), visualize=True, output_path=str(vis_path))
-            # 添加可视化图片URL（使用URL编码）
-            from urllib.parse import quote
-            result['visualization_url'] = f"http://localhost:5000/visualizations/{quote(vis_filename)}"
+        if source_type == "VIDEO":
+            # 分块写入唯一的临时文件，不在内存中保留整个视频
+            temp_file_path = TEMP_DIR / f"temp_{timestamp}_{unique_id}{file_extension}"
+            await run_in_threadpool(_save_upload, file.file, temp_file_path)
             
-        elif source_type == "VIDEO":
-            # 视频：统一使用.mp4扩展名
+            # 视频：统一使用.mp4扩展名，提交后台任务
             vis_filename = f"vis_{timestamp}_{unique_id}.mp4"
-            vis_path = VISUALIZATIONS_DIR / vis_filename
-            
-            # 使用OpenCV直接生成可视化视频
-            result = detector.detect_video(str(temp_file_path), visualize=True, output_path=str(vis_path))
-            
-            # 添加可视化视频URL（使用URL编码）
-            from urllib.parse import quote
-            result['visualization_url'] = f"http://localhost:5000/visualizations/{quote(vis_filename)}"
-        else:
+            records_filename = f"frames_{timestamp}_{unique_id}.npz"
+            job = job_manager.submit(
+                lambda progress: _run_video_job(temp_file_path, vis_filename, records_filename, user_id,
+                                                record_id, enable_alert, progress),
+                source_type=source_type,
+                filename=file.filename,
+                record_id=record_id,
+            )
+            return JSONResponse(
+                status_code=202,
+                content={
+                    **job.to_dict(),
+                    "status_url": f"/detect/jobs/{job.job_id}",
+                    "result_url": f"/detect/jobs/{job.job_id}/result",
+                }
+            )
+        
+        # 图片：在内存中解码，不写临时文件
+        contents = await run_in_threadpool(_read_upload, file.file)
+        frame = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
             return JSONResponse(
                 status_code=400,
-                content={"error": f"不支持的源类型: {source_type}"}
+                content={"error": "无法读取图片"}
             )
         
-        # 如果检测到异常且启用告警，发送告警通知
-        if enable_alert and result['has_abnormal'] and user_id is not None:
-            try:
-                # 保存快照
-                import time
-                import cv2
-                import shutil
-                snapshot_filename = f"{result['behavior_type']}_{int(time.time())}.jpg"
-                snapshot_file_path = SNAPSHOT_DIR / snapshot_filename
-                
-                if source_type == "IMAGE":
-                    # 图片直接复制
-                    shutil.copy(str(temp_file_path), str(snapshot_file_path))
-                elif source_type == "VIDEO":
-                    # 视频提取第一帧作为快照
-                    cap = cv2.VideoCapture(str(temp_file_path))
-                    ret, frame = cap.read()
-                    if ret:
-                        cv2.imwrite(str(snapshot_file_path), frame)
-                    cap.release()
-                
-                # 创建并发送告警
-                alert_data = notifier.create_alert_from_detection(
-                    user_id=user_id,
-                    detection_result=result,
-                    record_id=record_id,
-                    snapshot_path=f"snapshots/{snapshot_filename}"
-                )
-                
-                # 发送通知
-                notifier.send_alert(alert_data)
-            except Exception as alert_error:
-                # 告警发送失败不影响检测结果返回
-                print(f"告警发送失败: {alert_error}")
+        # 保留原扩展名
+        vis_filename = f"vis_{timestamp}_{unique_id}{file_extension}"
+        vis_path = VISUALIZATIONS_DIR / vis_filename
+        
+        result = await run_in_threadpool(
+            detector.detect_frame, frame, visualize=True, output_path=str(vis_path)
+        )
+        # 添加可视化图片URL（使用URL编码）
+        from urllib.parse import quote
+        result['visualization_url'] = f"http://localhost:5000/visualizations/{quote(vis_filename)}"
         
-        # 清理临时文件
-        try:
-            os.remove(temp_file_path)
-        except:
-            pass
+        _notify_if_abnormal(result, source_type, contents, user_id, record_id, enable_alert)
         
-        return JSONResponse(content=result)
+        return JSONResponse(content=serialize_result(result))
     
+    except UploadTooLargeError as e:
+        return JSONResponse(
+            status_code=413,
+            content={"error": str(e)}
+        )
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"检测失败详细错误:\n{error_trace}")
+        logger.error("检测失败详细错误:\n%s", error_trace)
         return JSONResponse(
             status_code=500,
             content={"error": f"检测失败: {str(e)}", "detail": error_trace}
         )
 
 
+@app.get("/detect/jobs/{job_id}")
+async def get_detection_job(job_id: str):
+    """查询视频检测任务状态与进度"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"任务不存在: {job_id}"}
+        )
+    return job.to_dict()
+
+
+@app.get("/detect/jobs/{job_id}/result")
+async def get_detection_job_result(job_id: str):
+    """获取视频检测任务结果；任务未完成时返回 409"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"任务不存在: {job_id}"}
+        )
+    if job.status == JOB_FAILED:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"检测失败: {job.error}", "job_id": job_id, "status": job.status}
+        )
+    if job.status != JOB_COMPLETED:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "任务尚未完成", **job.to_dict()}
+        )
+    return JSONResponse(content=job.result)
+
+
 @app.post("/detect/realtime")
 async def detect_realtime(
     file: UploadFile = File(...),
@@ -216,7 +397,7 @@ async def detect_realtime(
     """
     try:
         # 读取图片
-        contents = await file.read()
+        contents = await run_in_threadpool(_read_upload, file.file)
         nparr = np.frombuffer(contents, np.uint8)
         frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
@@ -226,12 +407,13 @@ async def detect_realtime(
                 content={"error": "无法读取图片"}
             )
         
-        # 检测
-        results = detector.model(frame)
-        result = detector._analyze_results(results, frame.shape)
+        # 检测（缩小到推理尺寸，结果坐标映射回原图）
+        model_input, transform = detector.prepare(frame)
+        results = await run_in_threadpool(detector.predict, model_input)
+        result = detector._analyze_results(results, frame.shape, transform=transform)
         
-        # 可视化
-        vis_frame = detector._visualize_frame(frame, results, result)
+        # 可视化（解码出的帧只在本请求中使用，直接在其上绘制）
+        vis_frame = detector.annotator.annotate(frame, result)
         
         # 编码为JPEG
         _, buffer = cv2.imencode('.jpg', vis_frame)
@@ -241,6 +423,11 @@ async def detect_realtime(
             media_type="image/jpeg"
         )
     
+    except UploadTooLargeError as e:
+        return JSONResponse(
+            status_code=413,
+            content={"error": str(e)}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -257,17 +444,26 @@ class RTSPConfig(BaseModel):
     user_id: int = None
 
 
-@app.post("/rtsp/start")
-async def start_rtsp(config: RTSPConfig):
-    """启动RTSP流检测"""
+@app.get("/rtsp/cameras")
+async def list_rtsp_cameras():
+    """获取所有摄像头的运行状态与指标"""
+    return {"cameras": stream_manager.list_status(), "scheduler": stream_manager.scheduler.get_stats()}
+
+
+@app.post("/rtsp/{camera_id}/start")
+async def start_camera_stream(camera_id: str, config: RTSPConfig):
+    """启动指定摄像头的RTSP流检测"""
     try:
-        rtsp_handler.start(
+        # 连接RTSP流可能耗时数秒，放到线程池中执行
+        await run_in_threadpool(
+            stream_manager.start,
+            camera_id=camera_id,
             rtsp_url=config.rtsp_url,
             detection_interval=config.detection_interval,
             enable_alert=config.enable_alert,
             user_id=config.user_id
         )
-        return {"status": "success", "message": "RTSP流检测已启动"}
+        return {"status": "success", "camera_id": camera_id, "message": "RTSP流检测已启动"}
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -275,12 +471,12 @@ async def start_rtsp(config: RTSPConfig):
         )
 
 
-@app.post("/rtsp/stop")
-async def stop_rtsp():
-    """停止RTSP流检测"""
+@app.post("/rtsp/{camera_id}/stop")
+async def stop_camera_stream(camera_id: str):
+    """停止指定摄像头的RTSP流检测"""
     try:
-        rtsp_handler.stop()
-        return {"status": "success", "message": "RTSP流检测已停止"}
+        await run_in_threadpool(stream_manager.stop, camera_id)
+        return {"status": "success", "camera_id": camera_id, "message": "RTSP流检测已停止"}
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -288,22 +484,20 @@ async def stop_rtsp():
         )
 
 
-@app.get("/rtsp/frame")
-async def get_rtsp_frame():
-    """获取RTSP流的最新帧"""
+@app.get("/rtsp/{camera_id}/frame")
+async def get_camera_frame(camera_id: str):
+    """获取指定摄像头的最新帧"""
     try:
-        frame = rtsp_handler.get_latest_frame()
-        if frame is None:
+        handler = stream_manager.get(camera_id)
+        # 同一帧只编码一次，多个请求共享缓存的 JPEG
+        jpeg = handler.get_latest_jpeg() if handler is not None else None
+        if jpeg is None:
             return JSONResponse(
                 status_code=404,
                 content={"error": "暂无视频帧"}
             )
         
-        _, buffer = cv2.imencode('.jpg', frame)
-        return StreamingResponse(
-            io.BytesIO(buffer.tobytes()),
-            media_type="image/jpeg"
-        )
+        return Response(content=jpeg, media_type="image/jpeg")
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -311,11 +505,33 @@ async def get_rtsp_frame():
         )
 
 
-@app.get("/rtsp/result")
-async def get_rtsp_result():
-    """获取RTSP流的最新检测结果"""
+@app.get("/rtsp/{camera_id}/preview")
+async def get_camera_preview(camera_id: str, fps: Optional[float] = None):
+    """
+    指定摄像头的实时预览（MJPEG，multipart/x-mixed-replace），可直接用于 <img> 标签
+    
+    每个新帧叠加检测结果后只编码一次，所有观看者共享；fps 为该观看者的帧率上限
+    （不超过 PREVIEW_MAX_FPS）
+    """
+    handler = stream_manager.get(camera_id)
+    if handler is None or not handler.is_running:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "RTSP流未运行"}
+        )
+    return StreamingResponse(
+        handler.preview.stream(fps),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/rtsp/{camera_id}/result")
+async def get_camera_result(camera_id: str):
+    """获取指定摄像头的最新检测结果"""
     try:
-        result = rtsp_handler.get_latest_result()
+        handler = stream_manager.get(camera_id)
+        result = handler.get_serialized_result() if handler is not None else None
         if result is None:
             return {"has_abnormal": False, "person_count": 0}
         return result
@@ -326,13 +542,90 @@ async def get_rtsp_result():
         )
 
 
+@app.websocket("/rtsp/{camera_id}/ws")
+async def camera_result_socket(websocket: WebSocket, camera_id: str, fields: Optional[str] = None,
+                               keypoints: bool = True):
+    """
+    指定摄像头检测结果的 WebSocket 推送，替代轮询 /rtsp/{camera_id}/result
+    
+    每出一个检测结果推送一条消息：第一条为完整结果，之后只含变化的字段。
+    fields 为逗号分隔的字段选择（summary / tracks / persons 或单个摘要字段），
+    keypoints=false 时 persons 只含检测框与跟踪ID
+    """
+    await websocket.accept()
+    handler = stream_manager.get(camera_id)
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close(code=1008)
+        return
+    if handler is None or not handler.is_running:
+        await websocket.send_json({"error": "RTSP流未运行"})
+        await websocket.close(code=1008)
+        return
+    
+    messages = handler.results.stream(selected, keypoints)
+    try:
+        async for message in messages:
+            await websocket.send_text(json.dumps(message, ensure_ascii=False, separators=(',', ':')))
+        # 流已停止
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # 及时注销订阅者
+        await messages.aclose()
+
+
+@app.get("/rtsp/{camera_id}/status")
+async def get_camera_status(camera_id: str):
+    """获取指定摄像头的RTSP流状态与指标"""
+    return stream_manager.status(camera_id)
+
+
+# 兼容旧的单路接口，对应默认摄像头
+
+@app.post("/rtsp/start")
+async def start_rtsp(config: RTSPConfig):
+    """启动RTSP流检测"""
+    return await start_camera_stream(DEFAULT_CAMERA_ID, config)
+
+
+@app.post("/rtsp/stop")
+async def stop_rtsp():
+    """停止RTSP流检测"""
+    return await stop_camera_stream(DEFAULT_CAMERA_ID)
+
+
+@app.get("/rtsp/frame")
+async def get_rtsp_frame():
+    """获取RTSP流的最新帧"""
+    return await get_camera_frame(DEFAULT_CAMERA_ID)
+
+
+@app.get("/rtsp/preview")
+async def get_rtsp_preview(fps: Optional[float] = None):
+    """RTSP流的实时预览（MJPEG）"""
+    return await get_camera_preview(DEFAULT_CAMERA_ID, fps)
+
+
+@app.get("/rtsp/result")
+async def get_rtsp_result():
+    """获取RTSP流的最新检测结果"""
+    return await get_camera_result(DEFAULT_CAMERA_ID)
+
+
+@app.websocket("/rtsp/ws")
+async def rtsp_result_socket(websocket: WebSocket, fields: Optional[str] = None, keypoints: bool = True):
+    """RTSP流检测结果的 WebSocket 推送"""
+    await camera_result_socket(websocket, DEFAULT_CAMERA_ID, fields, keypoints)
+
+
 @app.get("/rtsp/status")
 async def get_rtsp_status():
     """获取RTSP流状态"""
-    return {
-        "is_running": rtsp_handler.is_running,
-        "rtsp_url": rtsp_handler.rtsp_url if rtsp_handler.rtsp_url else None
-    }
+    return await get_camera_status(DEFAULT_CAMERA_ID)
 
 
 if __name__ == "__main__":
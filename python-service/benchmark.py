@@ -0,0 +1,1123 @@
+"""
+性能基准测试脚本
+
+用法:
+    python benchmark.py frame --image test.jpg --iterations 50
+    python benchmark.py video --video clip.mp4 --batch-sizes 1,2,4,8
+    python benchmark.py video --video clip.mp4 --batch-sizes 4 --frame-skip 5 --adaptive
+    python benchmark.py streams --cameras 1,2,4,8 --seconds 10
+    python benchmark.py fall --persons 1,10,50,100
+    python benchmark.py fight --persons 2,10,30,60,100
+    python benchmark.py persons --persons 1,10,30,100
+    python benchmark.py temporal --windows 15,60,150,300,900
+    python benchmark.py tracking --persons 2,10,30,60
+    python benchmark.py zones --zones 1,5,10,20,50
+    python benchmark.py render --persons 0,5,20,50
+    python benchmark.py imgsz --video clip.mp4 --sizes 320,480,640,960
+    python benchmark.py records --frames 1000,10000,100000
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+from config import TEMP_DIR, LOG_LEVEL, LOG_FORMAT
+
+
+def _timeit(func: Callable[[], None], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """执行 func 多次并返回耗时统计（毫秒）"""
+    for _ in range(warmup):
+        func()
+
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples_arr = np.array(samples)
+    return {
+        'mean_ms': float(samples_arr.mean()),
+        'p50_ms': float(np.percentile(samples_arr, 50)),
+        'p95_ms': float(np.percentile(samples_arr, 95)),
+    }
+
+
+def _print_row(name: str, stats: Dict[str, float]):
+    print(f"  {name:<28} mean={stats['mean_ms']:8.2f}ms  "
+          f"p50={stats['p50_ms']:8.2f}ms  p95={stats['p95_ms']:8.2f}ms")
+
+
+def _load_image(path: str, width: int = 1280, height: int = 720) -> np.ndarray:
+    """读取测试图片；未指定时生成随机噪声图"""
+    if path:
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"无法读取图片: {path}")
+        return image
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+
+
+def _load_detector():
+    """加载检测器；模型不可用时返回 None"""
+    try:
+        from detector import BehaviorDetector
+    except ImportError as e:
+        print(f"× 无法导入检测器，跳过模型相关测试: {e}")
+        return None
+    detector = BehaviorDetector()
+    return detector if detector.model is not None else None
+
+
+def bench_frame(args):
+    """对比临时文件往返路径与内存帧路径的单帧延迟"""
+    image = _load_image(args.image)
+    temp_path = str(TEMP_DIR / f"bench_{uuid.uuid4().hex[:8]}.jpg")
+    print(f"\n单帧检测路径对比 (图像 {image.shape[1]}x{image.shape[0]}, {args.iterations} 次)")
+
+    def file_roundtrip():
+        cv2.imwrite(temp_path, image)
+        cv2.imread(temp_path)
+
+    try:
+        roundtrip = _timeit(file_roundtrip, args.iterations)
+        _print_row("imwrite+imread 开销", roundtrip)
+
+        detector = _load_detector()
+        if detector is None:
+            return
+
+        def via_temp_file():
+            cv2.imwrite(temp_path, image)
+            detector.detect_image(temp_path)
+
+        def via_frame():
+            detector.detect_frame(image)
+
+        file_stats = _timeit(via_temp_file, args.iterations)
+        frame_stats = _timeit(via_frame, args.iterations)
+        _print_row("detect_image (临时文件)", file_stats)
+        _print_row("detect_frame (内存)", frame_stats)
+        print(f"  每帧节省: {file_stats['mean_ms'] - frame_stats['mean_ms']:.2f}ms")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def bench_video(args):
+    """对比不同批量大小下 detect_video 的吞吐量"""
+    detector = _load_detector()
+    if detector is None:
+        return
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    print(f"\n视频批量推理吞吐量 ({args.video})")
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        result = detector.detect_video(args.video, visualize=False, batch_size=batch_size,
+                                       frame_skip=args.frame_skip, adaptive=args.adaptive)
+        elapsed = time.perf_counter() - start
+        fps = result['frame_count'] / elapsed if elapsed > 0 else 0.0
+        print(f"  batch_size={batch_size:<3} 帧数={result['frame_count']:<6} "
+              f"推理帧数={result['inferred_frames']:<6} "
+              f"耗时={elapsed:7.2f}s  吞吐={fps:7.2f} fps")
+
+
+def bench_streams(args):
+    """多路摄像头并发检测：逐路单帧推理 vs 跨流批量调度"""
+    import threading
+    from inference_scheduler import InferenceScheduler
+
+    detector = _load_detector()
+    if detector is None:
+        return
+
+    image = _load_image(args.image, 640, 480)
+    camera_counts = [int(c) for c in args.cameras.split(",") if c.strip()]
+
+    def run_cameras(camera_count: int, detect) -> float:
+        """每路摄像头一个线程持续检测，返回总吞吐（帧/秒）"""
+        counts = [0] * camera_count
+        deadline = time.perf_counter() + args.seconds
+
+        def camera_loop(index: int):
+            while time.perf_counter() < deadline:
+                detect(image, index)
+                counts[index] += 1
+
+        threads = [threading.Thread(target=camera_loop, args=(i,)) for i in range(camera_count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return sum(counts) / args.seconds
+
+    print(f"\n多路摄像头推理吞吐 (每组 {args.seconds}s)")
+    for camera_count in camera_counts:
+        direct_fps = run_cameras(camera_count, lambda frame, _: detector.detect_frame(frame))
+        scheduler = InferenceScheduler(detector, max_batch_size=args.batch_size,
+                                       max_latency_ms=args.max_latency_ms)
+        scheduled_fps = run_cameras(camera_count, lambda frame, index: scheduler.detect(frame, str(index)))
+        stats = scheduler.get_stats()
+        scheduler.stop()
+        print(f"  摄像头={camera_count:<3} 逐路推理={direct_fps:7.2f} fps  "
+              f"批量调度={scheduled_fps:7.2f} fps  平均批大小={stats['avg_batch_size']:.2f}  "
+              f"平均排队={stats['avg_wait_ms']:.1f}ms")
+
+
+def _rule_detector():
+    """只用于规则层测试的检测器（不加载模型）"""
+    from detector import BehaviorDetector, KEYPOINT_DICT
+    from detection_trace import DecisionTrace
+    from annotator import FrameAnnotator
+
+    detector = BehaviorDetector.__new__(BehaviorDetector)
+    detector.KEYPOINT_DICT = KEYPOINT_DICT
+    detector.trace = DecisionTrace(0)
+    detector.annotator = FrameAnnotator()
+    return detector
+
+
+def _synthetic_keypoints(person_count: int, width: int, height: int, seed: int = 0) -> np.ndarray:
+    """生成随机分布在画面中的人体关键点 (N, 17, 3)，用于不依赖模型的规则层测试"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 1, (person_count, 1, 2)) * [width, height]
+    keypoints = np.empty((person_count, 17, 3))
+    keypoints[:, :, :2] = centers + rng.normal(0, 1, (person_count, 17, 2)) * [width * 0.02, height * 0.08]
+    keypoints[:, :, 2] = rng.uniform(0.2, 1.0, (person_count, 17))
+    return keypoints
+
+
+def _detect_fall_per_person(keypoint_dict: Dict[str, int], keypoints, image_shape) -> Dict:
+    """向量化之前的逐人跌倒检测规则（冻结副本，去掉了调试输出），作为耗时与结果对照"""
+    try:
+        keypoints = np.array(keypoints)
+        if keypoints.size == 0 or len(keypoints.shape) < 2:
+            return {'is_fall': False, 'confidence': 0.0, 'description': '关键点数据不足'}
+
+        nose = keypoints[keypoint_dict['nose']]
+        left_shoulder = keypoints[keypoint_dict['left_shoulder']]
+        right_shoulder = keypoints[keypoint_dict['right_shoulder']]
+        left_hip = keypoints[keypoint_dict['left_hip']]
+        right_hip = keypoints[keypoint_dict['right_hip']]
+        left_knee = keypoints[keypoint_dict['left_knee']]
+        right_knee = keypoints[keypoint_dict['right_knee']]
+        left_ankle = keypoints[keypoint_dict['left_ankle']]
+        right_ankle = keypoints[keypoint_dict['right_ankle']]
+        left_wrist = keypoints[keypoint_dict['left_wrist']]
+        right_wrist = keypoints[keypoint_dict['right_wrist']]
+
+        if nose[2] < 0.3 or (left_shoulder[2] < 0.3 and right_shoulder[2] < 0.3):
+            return {'is_fall': False, 'confidence': 0.0, 'description': '关键点不可见'}
+
+        shoulder_center = ((left_shoulder + right_shoulder) / 2) if (left_shoulder[2] > 0.3 and right_shoulder[2] > 0.3) else left_shoulder if left_shoulder[2] > 0.3 else right_shoulder
+        hip_center = ((left_hip + right_hip) / 2) if (left_hip[2] > 0.3 and right_hip[2] > 0.3) else left_hip if left_hip[2] > 0.3 else right_hip
+
+        fall_detected = False
+        confidence = 0.0
+        detection_reason = ""
+        is_sitting = False
+        is_exercise_pose = False
+
+        # 坐姿：臀部明显在膝盖上方，且膝盖到脚踝的水平距离小
+        for hip, knee, ankle in ((left_hip, left_knee, left_ankle), (right_hip, right_knee, right_ankle)):
+            if hip[2] > 0.3 and knee[2] > 0.3 and ankle[2] > 0.3:
+                if hip[1] < knee[1] - image_shape[0] * 0.1 and abs(knee[0] - ankle[0]) < image_shape[1] * 0.1:
+                    is_sitting = True
+
+        # 运动姿态：双手分开支撑 + 在肩膀下方 + 身体水平
+        if (left_shoulder[2] > 0.3 and right_shoulder[2] > 0.3 and
+                left_wrist[2] > 0.5 and right_wrist[2] > 0.5):
+            body_center_x = (left_shoulder[0] + right_shoulder[0]) / 2
+            body_center_y = (left_shoulder[1] + right_shoulder[1]) / 2
+            left_wrist_left = left_wrist[0] < body_center_x - image_shape[1] * 0.1
+            right_wrist_right = right_wrist[0] > body_center_x + image_shape[1] * 0.1
+            hands_below_shoulder = left_wrist[1] > body_center_y and right_wrist[1] > body_center_y
+            if hip_center[2] > 0.3:
+                body_horizontal = abs(shoulder_center[1] - hip_center[1]) < image_shape[0] * 0.2
+            else:
+                body_horizontal = False
+            if left_wrist_left and right_wrist_right and hands_below_shoulder and body_horizontal:
+                is_exercise_pose = True
+
+        # 方法1：重心高度
+        body_center_y = (nose[1] + shoulder_center[1] + hip_center[1]) / 3
+        body_height_ratio = body_center_y / image_shape[0]
+        if not is_sitting and not is_exercise_pose and body_height_ratio > 0.5:
+            confidence = min(0.95, (body_height_ratio - 0.5) / 0.4 * 0.6 + 0.35)
+            fall_detected = True
+            detection_reason = f"重心过低(ratio={body_height_ratio:.2f})"
+
+        # 方法2：头部位置
+        if nose[2] > 0.3:
+            nose_y_ratio = nose[1] / image_shape[0]
+            if not is_sitting and not is_exercise_pose and nose_y_ratio > 0.55:
+                head_confidence = min(0.92, (nose_y_ratio - 0.55) / 0.35 * 0.6 + 0.32)
+                if head_confidence > confidence:
+                    confidence = head_confidence
+                    fall_detected = True
+                    detection_reason = f"头部过低(ratio={nose_y_ratio:.2f})"
+
+        # 方法3：身体宽高比
+        all_x = [kpt[0] for kpt in keypoints if kpt[2] > 0.3]
+        all_y = [kpt[1] for kpt in keypoints if kpt[2] > 0.3]
+        if len(all_x) > 0 and len(all_y) > 0:
+            body_width = max(all_x) - min(all_x)
+            body_height = max(all_y) - min(all_y)
+            if body_height > 0:
+                aspect_ratio = body_width / body_height
+                if not is_sitting and not is_exercise_pose and aspect_ratio > 1.2:
+                    aspect_confidence = min(0.90, (aspect_ratio - 1.2) / 1.2 * 0.5 + 0.40)
+                    if aspect_confidence > confidence:
+                        confidence = aspect_confidence
+                        fall_detected = True
+                        detection_reason = f"身体横向(ratio={aspect_ratio:.2f})"
+
+        # 方法4：身体角度（相对于垂直方向）
+        if hip_center[2] > 0.3:
+            dx = shoulder_center[0] - hip_center[0]
+            dy = shoulder_center[1] - hip_center[1]
+            if abs(dy) > 1:
+                angle = abs(math.atan2(dx, dy) * 180 / math.pi)
+                if not is_sitting and not is_exercise_pose and angle > 45:
+                    angle_confidence = min(0.88, (angle - 45) / 45 * 0.6 + 0.28)
+                    if angle_confidence > confidence:
+                        confidence = angle_confidence
+                        fall_detected = True
+                        detection_reason = f"角度异常({angle:.1f}°)"
+
+        # 方法5：膝盖位置
+        if not is_sitting and not is_exercise_pose and (left_knee[2] > 0.3 or right_knee[2] > 0.3):
+            knee_y = max(left_knee[1] if left_knee[2] > 0.3 else 0,
+                         right_knee[1] if right_knee[2] > 0.3 else 0)
+            knee_y_ratio = knee_y / image_shape[0]
+            if knee_y_ratio > 0.7:
+                knee_confidence = min(0.86, (knee_y_ratio - 0.7) / 0.25 * 0.4 + 0.46)
+                if knee_confidence > confidence:
+                    confidence = knee_confidence
+                    fall_detected = True
+                    detection_reason = f"膝盖过低(ratio={knee_y_ratio:.2f})"
+
+        return {
+            'is_fall': fall_detected,
+            'confidence': float(confidence),
+            'description': f'检测到跌倒行为: {detection_reason}' if fall_detected else '未检测到跌倒'
+        }
+    except Exception as e:
+        return {'is_fall': False, 'confidence': 0.0, 'description': f'检测失败: {str(e)}'}
+
+
+def _check_fall_results(reference: List[Dict], batch: List[Dict]) -> int:
+    """逐人核对批量跌倒检测与逐人规则的判定、置信度与描述，返回判定为跌倒的人数"""
+    assert len(reference) == len(batch), f"人数不一致: {len(reference)} vs {len(batch)}"
+    for index, (expected, actual) in enumerate(zip(reference, batch)):
+        assert expected['is_fall'] == actual['is_fall'], f"第{index}人判定不一致: {expected} vs {actual}"
+        assert abs(expected['confidence'] - actual['confidence']) < 1e-9, \
+            f"第{index}人置信度不一致: {expected} vs {actual}"
+        assert expected['description'] == actual['description'], f"第{index}人描述不一致: {expected} vs {actual}"
+    return sum(1 for result in batch if result['is_fall'])
+
+
+def bench_fall(args):
+    """拥挤场景下跌倒检测：向量化之前的逐人规则 vs 逐人规则 / 向量化批量检测（按人数选择），以及开启判定追踪的开销"""
+    from detection_trace import DecisionTrace
+    from detector import FALL_BATCH_MIN_PERSONS
+
+    detector = _rule_detector()
+    image_shape = (args.height, args.width, 3)
+    person_counts = [int(n) for n in args.persons.split(",") if n.strip()]
+
+    # 结果核对：除计时用的数据外，再用横向身体、置信度取阈值边界值 (0.3/0.5) 的数据覆盖各规则分支
+    rng = np.random.default_rng(1)
+    edge = _synthetic_keypoints(args.verify, args.width, args.height, seed=1)
+    edge[::2, :, :2] = edge[::2, :, 1::-1] * [args.width / args.height, args.height / args.width]
+    edge[:, :, 2] = rng.choice([0.2, 0.3, 0.5, 0.9], edge.shape[:2])
+    edge_persons = [{'keypoints': kps.tolist()} for kps in edge]
+    edge_reference = [_detect_fall_per_person(detector.KEYPOINT_DICT, p['keypoints'], image_shape)
+                      for p in edge_persons]
+    edge_falls = _check_fall_results(edge_reference, detector._detect_fall_all(edge_persons, image_shape))
+    _check_fall_results(edge_reference, [detector._detect_fall(p['keypoints'], image_shape) for p in edge_persons])
+    print(f"\n结果核对: 边界数据 {args.verify} 人的批量与逐人检测均与逐人规则一致 (其中跌倒 {edge_falls} 人)")
+
+    print(f"\n跌倒检测规则耗时 (图像 {args.width}x{args.height}, {args.iterations} 次)")
+    for person_count in person_counts:
+        keypoints = _synthetic_keypoints(person_count, args.width, args.height)
+        persons = [{'keypoints': kps.tolist()} for kps in keypoints]
+
+        falls = _check_fall_results(
+            [_detect_fall_per_person(detector.KEYPOINT_DICT, p['keypoints'], image_shape) for p in persons],
+            detector._detect_fall_all(persons, image_shape))
+        reference = _timeit(lambda: [_detect_fall_per_person(detector.KEYPOINT_DICT, p['keypoints'], image_shape)
+                                     for p in persons], args.iterations)
+        rules = _timeit(lambda: [detector._detect_fall_rules(kps, image_shape) for kps in keypoints.tolist()],
+                        args.iterations)
+        batch = _timeit(lambda: detector._detect_fall_batch(keypoints, image_shape), args.iterations)
+        detect_all = _timeit(lambda: detector._detect_fall_all(persons, image_shape), args.iterations)
+        detector.trace = DecisionTrace(1000)
+        traced = _timeit(lambda: detector._detect_fall_all(persons, image_shape), args.iterations)
+        detector.trace = DecisionTrace(0)
+        print(f"  人数={person_count:<4} 冻结逐人={reference['mean_ms']:7.3f}ms  逐人规则={rules['mean_ms']:7.3f}ms  "
+              f"向量化={batch['mean_ms']:7.3f}ms  实际={detect_all['mean_ms']:7.3f}ms "
+              f"({'逐人' if person_count < FALL_BATCH_MIN_PERSONS else '向量化'}, "
+              f"加速={reference['mean_ms'] / detect_all['mean_ms']:5.2f}x)  开启追踪={traced['mean_ms']:7.3f}ms  "
+              f"跌倒={falls}/{person_count} (结果一致)")
+
+
+def _detect_fight_pairwise(keypoint_dict: Dict[str, int], persons: List[Dict], image_shape) -> Dict:
+    """网格索引之前的逐对打架检测（冻结副本，去掉了调试输出），作为耗时与结果对照"""
+    try:
+        if len(persons) < 2:
+            return {'is_fight': False, 'confidence': 0.0, 'description': '人数不足'}
+
+        for i in range(len(persons)):
+            for j in range(i + 1, len(persons)):
+                person1_kps = np.array(persons[i]['keypoints'])
+                person2_kps = np.array(persons[j]['keypoints'])
+                if person1_kps.size == 0 or len(person1_kps.shape) < 2:
+                    continue
+                if person2_kps.size == 0 or len(person2_kps.shape) < 2:
+                    continue
+
+                p1_valid_kps = person1_kps[person1_kps[:, 2] > 0.3][:, :2]
+                p2_valid_kps = person2_kps[person2_kps[:, 2] > 0.3][:, :2]
+                if len(p1_valid_kps) == 0 or len(p2_valid_kps) == 0:
+                    continue
+
+                person1_center = np.mean(p1_valid_kps, axis=0)
+                person2_center = np.mean(p2_valid_kps, axis=0)
+                center_distance = np.linalg.norm(person1_center - person2_center)
+                distance_ratio = center_distance / image_shape[1]
+
+                # 条件1：两人距离很近（小于图片宽度的25%）
+                if distance_ratio > 0.25:
+                    continue
+
+                # 条件2：手腕朝向对方
+                p1_left_wrist = person1_kps[keypoint_dict['left_wrist']]
+                p1_right_wrist = person1_kps[keypoint_dict['right_wrist']]
+                arms_engaged = False
+                if p1_left_wrist[2] > 0.3 and p1_right_wrist[2] > 0.3:
+                    p1_shoulder_center = (person1_kps[keypoint_dict['left_shoulder']][:2] +
+                                          person1_kps[keypoint_dict['right_shoulder']][:2]) / 2
+                    wrist_to_p2_left = np.linalg.norm(p1_left_wrist[:2] - person2_center)
+                    wrist_to_p2_right = np.linalg.norm(p1_right_wrist[:2] - person2_center)
+                    shoulder_to_p2 = np.linalg.norm(p1_shoulder_center - person2_center)
+                    if wrist_to_p2_left < shoulder_to_p2 or wrist_to_p2_right < shoulder_to_p2:
+                        arms_engaged = True
+
+                # 条件3：身体接触（逐对关键点距离）
+                has_overlap = False
+                for kp1 in p1_valid_kps:
+                    for kp2 in p2_valid_kps:
+                        if np.linalg.norm(kp1 - kp2) < image_shape[1] * 0.05:
+                            has_overlap = True
+                            break
+                    if has_overlap:
+                        break
+
+                fight_confidence = 0.0
+                if distance_ratio < 0.15:
+                    fight_confidence += 0.4
+                elif distance_ratio < 0.25:
+                    fight_confidence += 0.2
+                if arms_engaged:
+                    fight_confidence += 0.3
+                if has_overlap:
+                    fight_confidence += 0.3
+
+                if fight_confidence >= 0.6:
+                    return {
+                        'is_fight': True,
+                        'confidence': min(0.95, fight_confidence),
+                        'description': f'检测到打架行为（距离={distance_ratio:.2f}, 置信度={fight_confidence:.2f}）'
+                    }
+
+        return {'is_fight': False, 'confidence': 0.0, 'description': '未检测到打架'}
+    except Exception as e:
+        return {'is_fight': False, 'confidence': 0.0, 'description': f'检测失败: {str(e)}'}
+
+
+def _check_fight_result(expected: Dict, actual: Dict):
+    """核对网格索引打架检测与逐对检测的判定、置信度与描述"""
+    for key in ('is_fight', 'confidence', 'description'):
+        assert expected[key] == actual[key], f"打架检测结果不一致: {expected} vs {actual}"
+
+
+def bench_fight(args):
+    """拥挤场景下打架检测：逐对检测 vs 网格索引筛选候选对，每帧耗时与候选人对数量随人数的变化"""
+    detector = _rule_detector()
+    image_shape = (args.height, args.width, 3)
+    person_counts = [int(n) for n in args.persons.split(",") if n.strip()]
+
+    # 结果核对：人员集中在画面一角的随机场景，使打架判定的各分支（含未检测到）都出现
+    rng = np.random.default_rng(1)
+    fights = 0
+    for scene in range(args.verify):
+        count = int(rng.integers(2, 40))
+        keypoints = _synthetic_keypoints(count, args.width * rng.uniform(0.1, 1.0),
+                                         args.height * rng.uniform(0.1, 1.0), seed=scene)
+        persons = [{'keypoints': kps.tolist()} for kps in keypoints]
+        expected = _detect_fight_pairwise(detector.KEYPOINT_DICT, persons, image_shape)
+        _check_fight_result(expected, detector._detect_fight(persons, image_shape))
+        fights += expected['is_fight']
+    print(f"\n结果核对: {args.verify} 个场景与逐对检测一致 (其中打架 {fights} 个)")
+
+    def timed(keypoints):
+        persons = [{'keypoints': kps.tolist()} for kps in keypoints]
+        result = detector._detect_fight(persons, image_shape)
+        _check_fight_result(_detect_fight_pairwise(detector.KEYPOINT_DICT, persons, image_shape), result)
+        pairwise = _timeit(lambda: _detect_fight_pairwise(detector.KEYPOINT_DICT, persons, image_shape),
+                           args.iterations)
+        grid = _timeit(lambda: detector._detect_fight(persons, image_shape), args.iterations)
+        return (f"逐对={pairwise['mean_ms']:7.3f}ms 网格={grid['mean_ms']:7.3f}ms "
+                f"加速={pairwise['mean_ms'] / grid['mean_ms']:5.2f}x 打架={result['is_fight']!s:<5}")
+
+    # 无打架：所有候选对都要判断（最坏情况）；有打架：随机场景，找到第一对即返回
+    print(f"\n打架检测每帧耗时 (图像 {args.width}x{args.height}, {args.iterations} 次，结果均与逐对检测一致)")
+    for person_count in person_counts:
+        calm = _calm_crowd_keypoints(person_count, args.width, args.height)
+        centers = np.array([kps[kps[:, 2] > 0.3][:, :2].mean(axis=0) for kps in calm])
+        candidates = len(detector._fight_candidate_pairs(centers, args.width * 0.25)[0])
+        random_scene = _synthetic_keypoints(person_count, args.width, args.height)
+        print(f"  人数={person_count:<4} 全部人对={person_count * (person_count - 1) // 2:<5} 候选人对={candidates:<5} "
+              f"无打架: {timed(calm)}  随机: {timed(random_scene)}")
+
+
+def _calm_crowd_keypoints(person_count: int, width: int, height: int) -> np.ndarray:
+    """
+    均匀排布、互不接触且手腕不可见的人群 (N, 17, 3)：相邻的人距离很近但达不到打架阈值，
+    打架检测需判断所有候选对
+    """
+    cols = max(1, int(np.ceil(np.sqrt(person_count * width / height))))
+    rows = max(1, int(np.ceil(person_count / cols)))
+    index = np.arange(person_count)
+    centers = np.column_stack([(index % cols + 0.5) * width / cols, (index // cols + 0.5) * height / rows])
+    rng = np.random.default_rng(0)
+    keypoints = np.empty((person_count, 17, 3))
+    keypoints[:, :, :2] = centers[:, np.newaxis, :] + rng.normal(0, 2, (person_count, 17, 2))
+    keypoints[:, :, 2] = 0.9
+    keypoints[:, [9, 10], 2] = 0.1  # 手腕
+    return keypoints
+
+
+def _allocation_stats(func: Callable[[], object]) -> Dict[str, float]:
+    """执行一次 func，返回过程中的峰值内存与返回对象常驻的内存块数"""
+    import tracemalloc
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+    del result
+    return {'peak_kb': peak / 1024, 'retained_blocks': retained}
+
+
+def bench_persons(args):
+    """每帧人员数据：逐人 tolist() 字典 vs 整帧关键点数组视图（耗时与内存分配）"""
+    from pose_data import PoseBatch
+
+    detector = _rule_detector()
+    image_shape = (args.height, args.width, 3)
+    person_counts = [int(n) for n in args.persons.split(",") if n.strip()]
+
+    print(f"\n每帧人员数据表示对比 (图像 {args.width}x{args.height}, {args.iterations} 次)")
+    for person_count in person_counts:
+        # 模拟模型输出的 float32 张量
+        keypoints = _synthetic_keypoints(person_count, args.width, args.height).astype(np.float32)
+        boxes = np.tile(np.array([0, 0, 10, 10, 0.9, 0], dtype=np.float32), (person_count, 1))
+
+        def as_lists():
+            persons = [{'keypoints': kps.tolist(), 'box': boxes[i][:4].tolist()} for i, kps in enumerate(keypoints)]
+            return persons, detector._detect_abnormal_behavior(persons, image_shape)
+
+        def as_arrays():
+            persons = PoseBatch(keypoints.astype(np.float64), boxes[:, :4].astype(np.float64))
+            return persons, detector._detect_abnormal_behavior(persons, image_shape)
+
+        for name, func in (("tolist 字典", as_lists), ("数组视图", as_arrays)):
+            stats = _timeit(func, args.iterations)
+            alloc = _allocation_stats(func)
+            print(f"  人数={person_count:<4} {name:<10} mean={stats['mean_ms']:8.3f}ms  "
+                  f"峰值分配={alloc['peak_kb']:8.1f}KB  常驻内存块={alloc['retained_blocks']:<6}")
+
+
+def _rescan_window_stats(frames) -> tuple:
+    """逐帧重新扫描窗口计算统计量（增量统计之前的做法），作为对照"""
+    if not frames:
+        return 0.0, None, 0.0
+    abnormal_frames = [f for f in frames if f['has_abnormal'] and f['behavior_type']]
+    abnormal_ratio = len(abnormal_frames) / len(frames)
+    if not abnormal_frames:
+        return abnormal_ratio, None, 0.0
+    counter = Counter([f['behavior_type'] for f in abnormal_frames])
+    dominant_behavior, _ = counter.most_common(1)[0]
+    matched = [f['confidence'] for f in abnormal_frames if f['behavior_type'] == dominant_behavior]
+    return abnormal_ratio, dominant_behavior, sum(matched) / len(matched)
+
+
+def bench_temporal(args):
+    """时序分析器每帧 update + should_alert 耗时：逐帧重新扫描窗口 vs 增量统计"""
+    from temporal import TemporalBehaviorAnalyzer
+
+    window_sizes = [int(n) for n in args.windows.split(",") if n.strip()]
+    rng = np.random.default_rng(0)
+    behaviors = rng.choice(['fall', 'fight', 'abnormal_pose', None], size=args.frames, p=[0.3, 0.2, 0.1, 0.4])
+    results = [
+        {'has_abnormal': b is not None, 'behavior_type': b, 'confidence': float(c)}
+        for b, c in zip(behaviors, rng.uniform(0.5, 1.0, args.frames))
+    ]
+
+    print(f"\n时序分析每帧耗时 ({args.frames} 帧，异常帧约 60%)")
+    for window_size in window_sizes:
+        analyzer = TemporalBehaviorAnalyzer(window_size=window_size, cooldown_seconds=0)
+        mismatches = 0
+        rescan_time = stats_time = frame_time = 0.0
+        for result in results:
+            start = time.perf_counter()
+            analyzer.update(result)
+            analyzer.should_alert()
+            frame_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = _rescan_window_stats(analyzer.frames)
+            rescan_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = analyzer._window_stats()
+            stats_time += time.perf_counter() - start
+            if expected[:2] != actual[:2] or abs(expected[2] - actual[2]) > 1e-9:
+                mismatches += 1
+
+        rescan_us = rescan_time * 1e6 / args.frames
+        stats_us = stats_time * 1e6 / args.frames
+        frame_us = frame_time * 1e6 / args.frames
+        print(f"  窗口={window_size:<5} 窗口统计: 重新扫描={rescan_us:8.2f}us  增量={stats_us:6.2f}us  "
+              f"加速={rescan_us / stats_us:6.1f}x  每帧 update+should_alert={frame_us:6.2f}us  不一致={mismatches}")
+
+
+def _simulate_scene(person_count: int, frames: int, width: int, height: int, fall_start: int, seed: int = 0):
+    """
+    模拟多人场景：每人在画面内匀速往返走动（检测框带抖动），0 号人员从 fall_start 帧起跌倒。
+    跌倒者每帧被判为跌倒的概率 0.7，其他人每帧误判为跌倒的概率 0.03；检测顺序每帧随机打乱
+
+    返回:
+        每帧的 (PoseBatch, 逐人 (行为类型, 置信度), 逐人真实身份)
+    """
+    from pose_data import PoseBatch
+
+    rng = np.random.default_rng(seed)
+    size = np.array([width * 0.05, height * 0.25])
+    start = rng.uniform([0, 0], [width, height] - size, (person_count, 2))
+    velocity = rng.normal(0, 3, (person_count, 2))
+    scene = []
+    for frame_index in range(frames):
+        # 在画面内往返走动
+        span = np.array([width, height]) - size
+        position = np.abs((start + velocity * frame_index + span) % (2 * span) - span)
+        boxes = np.hstack([position, position + size]) + rng.normal(0, 2, (person_count, 4))
+        keypoints = np.zeros((person_count, 17, 3))
+        keypoints[:, :, :2] = ((boxes[:, :2] + boxes[:, 2:]) / 2)[:, np.newaxis, :]
+        keypoints[:, :, 2] = 0.9
+        falling = (np.arange(person_count) == 0) & (fall_start is not None and frame_index >= fall_start)
+        flagged = rng.uniform(size=person_count) < np.where(falling, 0.7, 0.03)
+        confidence = np.where(falling, rng.uniform(0.75, 0.95, person_count), rng.uniform(0.7, 0.85, person_count))
+        behaviors = [('FALL', float(c)) if f else (None, 0.0) for f, c in zip(flagged, confidence)]
+        order = rng.permutation(person_count)
+        scene.append((PoseBatch(keypoints[order], boxes[order]), [behaviors[i] for i in order], order))
+    return scene
+
+
+def bench_tracking(args):
+    """
+    人员跟踪每帧耗时、跟踪ID稳定性，以及整帧时序投票 vs 逐人时序投票的告警延迟与误报
+
+    每种人数模拟 --seeds 个随机场景：误报与ID切换为合计，跌倒后首次告警为平均帧数（未告警按剩余帧数计）。
+    另按 --cooldown-frames 的告警冷却统计实际发出的告警：跌倒前一直在误报的分析器，跌倒时往往仍在冷却中
+    """
+    from temporal import TemporalBehaviorAnalyzer, TrackedTemporalAnalyzer
+    from tracker import PersonTracker
+
+    person_counts = [int(n) for n in args.persons.split(",") if n.strip()]
+    fall_start = args.frames // 2
+    print(f"\n人员跟踪与时序告警 ({args.frames} 帧 x {args.seeds} 个场景，0 号人员从第 {fall_start} 帧起跌倒)")
+    for person_count in person_counts:
+        id_switches = 0
+        track_time = 0.0
+        false_alerts = defaultdict(int)
+        delays = defaultdict(list)
+        for seed in range(args.seeds):
+            scene = _simulate_scene(person_count, args.frames, args.width, args.height, fall_start, seed=seed)
+            tracker = PersonTracker()
+            frame_level = TemporalBehaviorAnalyzer(window_size=15, cooldown_seconds=0)
+            per_track = TrackedTemporalAnalyzer(cooldown_seconds=0)
+            identity_to_track: Dict[int, int] = {}
+            alerts = {'frame': [], 'track': []}
+            for frame_index, (persons, behaviors, identities) in enumerate(scene):
+                start = time.perf_counter()
+                track_ids = tracker.update(persons)
+                track_time += time.perf_counter() - start
+                for identity, track_id in zip(identities.tolist(), track_ids.tolist()):
+                    if identity in identity_to_track and identity_to_track[identity] != track_id:
+                        id_switches += 1
+                    identity_to_track[identity] = track_id
+
+                # 整帧判定：取第一个被判为跌倒的人（与 _detect_abnormal_behavior 一致）
+                flagged = [b for b in behaviors if b[0] is not None]
+                frame_result = {'has_abnormal': bool(flagged), 'behavior_type': flagged[0][0] if flagged else None,
+                                'confidence': flagged[0][1] if flagged else 0.0}
+                frame_level.update(frame_result)
+                if frame_level.should_alert()[0]:
+                    alerts['frame'].append(frame_index)
+
+                per_track.update({'tracks': [
+                    {'track_id': t, 'behavior_type': b, 'confidence': c}
+                    for t, (b, c) in zip(track_ids.tolist(), behaviors)
+                ]})
+                if per_track.should_alert()[0]:
+                    alerts['track'].append(frame_index)
+
+            for name in alerts:
+                for cooldown, frames in ((0, alerts[name]), (args.cooldown_frames,
+                                                             _apply_cooldown(alerts[name], args.cooldown_frames))):
+                    false_alerts[name, cooldown] += sum(1 for f in frames if f < fall_start)
+                    first = next((f for f in frames if f >= fall_start), args.frames)
+                    delays[name, cooldown].append(first - fall_start)
+
+        print(f"  人数={person_count:<4} 跟踪={track_time * 1000 / (args.frames * args.seeds):6.3f}ms/帧  "
+              f"ID切换={id_switches}")
+        for name, label in (('frame', '整帧投票'), ('track', '逐人投票')):
+            print(f"    {label}: " + "  ".join(
+                f"{'无冷却' if cooldown == 0 else f'冷却{cooldown}帧'}: 误报={false_alerts[name, cooldown]:<5} "
+                f"跌倒后首次告警={np.mean(delays[name, cooldown]):5.1f}帧"
+                for cooldown in (0, args.cooldown_frames)))
+
+
+def _apply_cooldown(alert_frames: List[int], cooldown_frames: int) -> List[int]:
+    """按告警冷却筛选实际发出的告警：距上一次发出不足 cooldown_frames 帧的告警被抑制"""
+    sent = []
+    for frame_index in alert_frames:
+        if not sent or frame_index - sent[-1] >= cooldown_frames:
+            sent.append(frame_index)
+    return sent
+
+
+def _draw_zones_per_zone_blend(detector, image: np.ndarray, intrusion_result: Dict) -> np.ndarray:
+    """逐区域整帧混合的区域绘制（预渲染叠加层之前的做法），作为对照"""
+    from zone_detector import ZONE_STYLES, INTRUSION_STYLE, _draw_zone_shape, _draw_zone_label
+
+    img = image.copy()
+    overlay = img.copy()
+    zone_stats = intrusion_result.get('zone_stats', {})
+    for zone in detector._layout(image.shape[1], image.shape[0]).zones:
+        stats = zone_stats.get(zone['zone_id'], {})
+        if stats.get('has_intrusion', False):
+            color, alpha = INTRUSION_STYLE
+            label = f"{zone['zone_name']}: {stats.get('person_count', 0)} person(s)"
+        else:
+            color, alpha = ZONE_STYLES.get(zone['zone_type'], ZONE_STYLES['MONITORED'])
+            label = zone['zone_name']
+        _draw_zone_shape(overlay, zone, color, -1)
+        _draw_zone_shape(img, zone, color, 2)
+        cv2.addWeighted(overlay, alpha, img, 1 - alpha, 0, img)
+        _draw_zone_label(img, zone, label, color)
+    return img
+
+
+def bench_zones(args):
+    """区域绘制每帧耗时：逐区域整帧混合 vs 预渲染叠加层单次混合，以及入侵判断耗时"""
+    from zone_detector import ZoneDetector
+    from pose_data import PoseBatch
+
+    zone_counts = [int(n) for n in args.zones.split(",") if n.strip()]
+    rng = np.random.default_rng(0)
+    image = _load_image(None, args.width, args.height)
+    corners = rng.uniform(0, 1, (args.persons, 2)) * [args.width - 80, args.height - 200]
+    # 与 _analyze_results 的输出相同的 PoseBatch，入侵判断直接使用其 boxes 数组
+    persons = PoseBatch(np.zeros((args.persons, 17, 3)), np.hstack([corners, corners + [80, 200]]))
+
+    print(f"\n区域绘制与入侵判断每帧耗时 (图像 {args.width}x{args.height}, {args.persons} 人, {args.iterations} 次)")
+    for zone_count in zone_counts:
+        zones = []
+        for i in range(zone_count):
+            center = rng.uniform(0.1, 0.9, 2)
+            angles = np.sort(rng.uniform(0, 2 * np.pi, 6))
+            radius = rng.uniform(0.03, 0.12, 6)
+            points = center + np.stack([np.cos(angles), np.sin(angles)], axis=1) * radius[:, np.newaxis]
+            zones.append({'id': i, 'name': f'Zone {i}', 'coordinates': np.round(points, 4).tolist(),
+                          'type': ('RESTRICTED', 'MONITORED', 'SAFE')[i % 3]})
+        detector = ZoneDetector()
+        start = time.perf_counter()
+        detector.set_zones(zones, (args.width, args.height))
+        build_ms = (time.perf_counter() - start) * 1000
+        result = detector.check_intrusion(persons, args.width, args.height)
+
+        start = time.perf_counter()
+        detector.draw_zones(image, result)
+        overlay_ms = (time.perf_counter() - start) * 1000
+        intrusion = _timeit(lambda: detector.check_intrusion(persons, args.width, args.height), args.iterations)
+        per_zone = _timeit(lambda: _draw_zones_per_zone_blend(detector, image, result), args.iterations)
+        cached = _timeit(lambda: detector.draw_zones(image, result), args.iterations)
+        print(f"  区域数={zone_count:<4} 入侵区域={result['affected_zones']:<3} 入侵判断={intrusion['mean_ms']:6.3f}ms  "
+              f"绘制: 逐区域混合={per_zone['mean_ms']:7.2f}ms  预渲染={cached['mean_ms']:6.2f}ms  "
+              f"加速={per_zone['mean_ms'] / cached['mean_ms']:5.1f}x  "
+              f"(栅格构建={build_ms:6.1f}ms, 叠加层构建={overlay_ms:6.1f}ms, 仅首帧)")
+
+
+def _plot_and_blend_reference(frame: np.ndarray, results, detection_result: Dict) -> np.ndarray:
+    """results[0].plot() 生成新帧后逐个面板整帧复制混合（共用绘制器之前的做法），作为对照"""
+    if detection_result['person_count'] > 0:
+        vis_frame = results[0].plot(conf=False, line_width=2, font_size=0.5, pil=False, labels=False,
+                                    boxes=True, kpt_radius=5, img=frame)
+    else:
+        vis_frame = frame.copy()
+
+    if detection_result['has_abnormal']:
+        overlay = vis_frame.copy()
+        cv2.rectangle(overlay, (10, 10), (350, 70), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
+        cv2.putText(vis_frame, f"ABNORMAL: {detection_result['behavior_type']}", (18, 33),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 255), 2)
+        cv2.putText(vis_frame, f"Confidence: {detection_result['confidence']:.2f}", (18, 55),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    else:
+        overlay = vis_frame.copy()
+        cv2.rectangle(overlay, (10, 10), (200, 50), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
+        cv2.putText(vis_frame, "Status: NORMAL", (18, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 0), 2)
+
+    person_count_text = f"Persons: {detection_result['person_count']}"
+    text_size = cv2.getTextSize(person_count_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+    text_x, text_y = 18, vis_frame.shape[0] - 22
+    overlay = vis_frame.copy()
+    cv2.rectangle(overlay, (text_x - 8, text_y - text_size[1] - 8),
+                  (text_x + text_size[0] + 8, text_y + 8), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
+    cv2.putText(vis_frame, person_count_text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return vis_frame
+
+
+def bench_render(args):
+    """检测结果可视化每帧耗时：plot + 整帧混合 vs 共用绘制器原地绘制"""
+    import torch
+    from ultralytics.engine.results import Results
+
+    detector = _rule_detector()
+    image = _load_image(args.image, args.width, args.height)
+    person_counts = [int(n) for n in args.persons.split(",") if n.strip()]
+
+    print(f"\n可视化每帧耗时 (图像 {image.shape[1]}x{image.shape[0]}, {args.iterations} 次)")
+    for person_count in person_counts:
+        keypoints = _synthetic_keypoints(person_count, image.shape[1], image.shape[0]).astype(np.float32)
+        boxes = np.concatenate([keypoints[:, :, :2].min(axis=1), keypoints[:, :, :2].max(axis=1),
+                                np.full((person_count, 1), 0.9), np.zeros((person_count, 1))],
+                               axis=1).astype(np.float32)
+        results = [Results(image, path="", names={0: "person"},
+                           boxes=torch.from_numpy(boxes), keypoints=torch.from_numpy(keypoints))]
+        detection_result = detector._analyze_results(results, image.shape)
+
+        reference = _timeit(lambda: _plot_and_blend_reference(image, results, detection_result), args.iterations)
+        # 视频与实时接口在解码出的帧上原地绘制；图片接口需保留原图，复制一次
+        frame = image.copy()
+        in_place = _timeit(lambda: detector.annotator.annotate(frame, detection_result), args.iterations)
+        copied = _timeit(lambda: detector.annotator.annotate(image, detection_result, copy=True), args.iterations)
+        print(f"  人数={person_count:<4} plot+整帧混合={reference['mean_ms']:7.2f}ms  "
+              f"原地绘制={in_place['mean_ms']:6.2f}ms  复制后绘制={copied['mean_ms']:6.2f}ms  "
+              f"加速={reference['mean_ms'] / in_place['mean_ms']:5.1f}x")
+
+
+def _load_frames(video: str, image: str, frame_count: int) -> List[np.ndarray]:
+    """从视频中均匀抽取 frame_count 帧；未指定视频时使用单张图片"""
+    if not video:
+        return [_load_image(image, 1920, 1080)]
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频: {video}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total // frame_count) if total > 0 else 1
+    frames = []
+    index = 0
+    while len(frames) < frame_count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % step == 0:
+            frames.append(frame)
+        index += 1
+    cap.release()
+    return frames
+
+
+def _compare_persons(reference, persons, keypoint_threshold: float = 0.5):
+    """
+    按检测框 IoU (>=0.5) 匹配两次检测的人员
+
+    返回:
+        (匹配人数, 匹配人员中双方均可见关键点的像素误差之和, 参与计算的关键点数)
+    """
+    from tracker import person_boxes, iou_matrix, _greedy_match
+
+    if not len(reference) or not len(persons):
+        return 0, 0.0, 0
+    iou = iou_matrix(person_boxes(reference), person_boxes(persons))
+    pairs = _greedy_match(iou, iou >= 0.5, descending=True)
+    error_sum, point_count = 0.0, 0
+    for i, j in pairs:
+        ref_kps, kps = reference.keypoints[i], persons.keypoints[j]
+        visible = (ref_kps[:, 2] >= keypoint_threshold) & (kps[:, 2] >= keypoint_threshold)
+        error_sum += float(np.linalg.norm(ref_kps[visible, :2] - kps[visible, :2], axis=1).sum())
+        point_count += int(visible.sum())
+    return len(pairs), error_sum, point_count
+
+
+def bench_imgsz(args):
+    """
+    不同推理尺寸的速度与精度：以原始分辨率推理为基准，比较各尺寸的人员召回、关键点误差与行为判定一致率，
+    另列出旧 RTSP 路径（拉伸到 640x480）作对照
+    """
+    from detector import round_imgsz
+    from letterbox import LetterboxTransform
+
+    detector = _load_detector()
+    if detector is None:
+        return
+    frames = _load_frames(args.video, args.image, args.frames)
+    if not frames:
+        print("× 没有可用的测试帧")
+        return
+    height, width = frames[0].shape[:2]
+    full_size = max(height, width)
+    sizes = sorted({int(n) for n in args.sizes.split(",") if n.strip()})
+
+    def run(detect) -> Dict[str, object]:
+        results, samples = [], []
+        for frame in frames:
+            start = time.perf_counter()
+            results.append(detect(frame))
+            samples.append((time.perf_counter() - start) * 1000)
+        return {'results': results, 'mean_ms': float(np.mean(samples)), 'p95_ms': float(np.percentile(samples, 95))}
+
+    def at_size(imgsz: int):
+        # 与 BehaviorDetector 相同的取整，只测服务实际可能使用的尺寸
+        detector.imgsz = round_imgsz(imgsz)
+        detector.detect_frame(frames[0])  # 预热
+        label = f"{detector.imgsz}" if detector.imgsz == imgsz else f"{detector.imgsz} (--sizes {imgsz})"
+        return label, run(detector.detect_frame)
+
+    def stretched(frame):
+        model_input = cv2.resize(frame, (640, 480))
+        results = detector.predict(model_input)
+        return detector._analyze_results(results, frame.shape, transform=LetterboxTransform(frame.shape, (640, 480)))
+
+    # 原始分辨率（取整到步长的倍数）推理作为精度基准；取整后相同的尺寸只测一次
+    full_size = round_imgsz(full_size)
+    name, reference = at_size(full_size)
+    rows = [(f"{name} (原始分辨率)", reference)]
+    tested = {full_size}
+    for size in sizes:
+        if round_imgsz(size) < full_size and round_imgsz(size) not in tested:
+            tested.add(round_imgsz(size))
+            rows.append(at_size(size))
+    rows.append(("640x480 拉伸 (旧RTSP)", run(stretched)))
+
+    print(f"\n推理尺寸速度/精度 (源 {width}x{height}, {len(frames)} 帧, 以原始分辨率推理为基准)")
+    print(f"  {'推理尺寸':<20} {'平均':>8} {'p95':>8} {'fps':>7} {'召回':>7} {'误检':>7} {'关键点误差':>10} {'行为一致':>8}")
+    for name, run_result in rows:
+        ref_total = pred_total = matched = points = 0
+        error_sum = 0.0
+        same_behavior = 0
+        for ref, result in zip(reference['results'], run_result['results']):
+            pair_count, frame_error, frame_points = _compare_persons(ref['persons'], result['persons'])
+            ref_total += len(ref['persons'])
+            pred_total += len(result['persons'])
+            matched += pair_count
+            error_sum += frame_error
+            points += frame_points
+            same_behavior += ref['behavior_type'] == result['behavior_type']
+        recall = matched / ref_total if ref_total else 1.0
+        false_rate = (pred_total - matched) / pred_total if pred_total else 0.0
+        keypoint_error = f"{error_sum / points:8.2f}px" if points else f"{'-':>10}"
+        fps = 1000 / run_result['mean_ms'] if run_result['mean_ms'] > 0 else 0.0
+        print(f"  {name:<20} {run_result['mean_ms']:6.1f}ms {run_result['p95_ms']:6.1f}ms {fps:7.1f} "
+              f"{recall:7.1%} {false_rate:7.1%} {keypoint_error} {same_behavior / len(frames):8.1%}")
+
+
+def bench_records(args):
+    """逐帧记录：写入 NPZ 后读回并校验与原始逐帧结果（含逐人跟踪记录）一致，对比文件大小与逐帧 JSON"""
+    from frame_records import FrameRecordWriter, load_frame_records
+    from pose_data import PoseBatch
+
+    rng = np.random.default_rng(0)
+    frame_counts = [int(n) for n in args.frames.split(",") if n.strip()]
+    behaviors = [None, 'FALL', 'FIGHT', 'ABNORMAL_POSE']
+
+    print("\n逐帧记录写入与读回")
+    for frame_count in frame_counts:
+        frames = []
+        for frame_number in range(1, frame_count + 1):
+            behavior_type = behaviors[rng.integers(0, len(behaviors))]
+            frames.append({
+                'frame_number': frame_number,
+                'timestamp': frame_number / 25,
+                'person_count': int(rng.integers(0, 30)),
+                'has_abnormal': behavior_type is not None,
+                'behavior_type': behavior_type,
+                'confidence': float(rng.uniform(0, 1)) if behavior_type else 0.0,
+                'inferred': bool(frame_number % 3 == 1),
+            })
+        # 每帧每人的跟踪ID与检测框
+        track_boxes = [rng.uniform(0, 1000, (frame['person_count'], 4)) for frame in frames]
+        track_ids = [rng.permutation(60)[:frame['person_count']] + 1 for frame in frames]
+        path = str(TEMP_DIR / f"bench_records_{uuid.uuid4().hex[:8]}.npz")
+        try:
+            start = time.perf_counter()
+            writer = FrameRecordWriter(path)
+            for frame, boxes, ids in zip(frames, track_boxes, track_ids):
+                persons = PoseBatch(np.zeros((len(ids), 17, 3)), boxes, track_ids=ids)
+                writer.append(frame['frame_number'], frame['timestamp'], dict(frame, persons=persons), frame['inferred'])
+            writer.close()
+            write_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            records = load_frame_records(path)
+            read_ms = (time.perf_counter() - start) * 1000
+
+            # 读回的每一列都应与写入的逐帧结果一致（置信度按 float32 存储）
+            behavior_types = [name or None for name in records['behavior_types'].tolist()]
+            assert len(records['frame_number']) == frame_count
+            assert records['frame_number'].tolist() == [f['frame_number'] for f in frames]
+            assert records['timestamp'].tolist() == [f['timestamp'] for f in frames]
+            assert records['person_count'].tolist() == [f['person_count'] for f in frames]
+            assert records['has_abnormal'].tolist() == [f['has_abnormal'] for f in frames]
+            assert [behavior_types[code] for code in records['behavior'].tolist()] == [f['behavior_type'] for f in frames]
+            assert np.array_equal(records['confidence'],
+                                  np.array([f['confidence'] for f in frames], dtype=np.float32))
+            assert records['inferred'].tolist() == [f['inferred'] for f in frames]
+            assert records['track_frame_number'].tolist() == [
+                f['frame_number'] for f in frames for _ in range(f['person_count'])]
+            assert records['track_id'].tolist() == np.concatenate(track_ids).tolist()
+            assert np.array_equal(records['track_box'], np.concatenate(track_boxes).astype(np.float32))
+
+            npz_size = os.path.getsize(path)
+            json_size = len(json.dumps([
+                dict(frame, tracks=[{'track_id': int(track_id), 'box': box.tolist()}
+                                    for track_id, box in zip(ids, boxes)])
+                for frame, boxes, ids in zip(frames, track_boxes, track_ids)
+            ]).encode())
+            print(f"  帧数={frame_count:<7} 写入={write_ms:8.1f}ms  读回={read_ms:6.1f}ms  "
+                  f"NPZ={npz_size / 1024:8.1f}KB  JSON={json_size / 1024:9.1f}KB  "
+                  f"压缩比={json_size / npz_size:5.1f}x  读回校验通过")
+        finally:
+            for leftover in (path, path + ".part", path + ".tracks.part"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测服务性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    frame_parser = subparsers.add_parser("frame", help="临时文件 vs 内存帧检测延迟")
+    frame_parser.add_argument("--image", default=None, help="测试图片路径（默认随机噪声图）")
+    frame_parser.add_argument("--iterations", type=int, default=30)
+    frame_parser.set_defaults(func=bench_frame)
+
+    video_parser = subparsers.add_parser("video", help="视频批量推理吞吐量")
+    video_parser.add_argument("--video", required=True, help="参考视频路径")
+    video_parser.add_argument("--batch-sizes", default="1,2,4,8", help="逗号分隔的批量大小列表")
+    video_parser.add_argument("--frame-skip", type=int, default=1, help="每隔几帧推理一次")
+    video_parser.add_argument("--adaptive", action="store_true", help="启用自适应采样")
+    video_parser.set_defaults(func=bench_video)
+
+    streams_parser = subparsers.add_parser("streams", help="多路摄像头跨流批量推理吞吐量")
+    streams_parser.add_argument("--image", default=None, help="测试图片路径（默认随机噪声图）")
+    streams_parser.add_argument("--cameras", default="1,2,4,8", help="逗号分隔的摄像头数量列表")
+    streams_parser.add_argument("--seconds", type=float, default=10.0, help="每组测试时长")
+    streams_parser.add_argument("--batch-size", type=int, default=8)
+    streams_parser.add_argument("--max-latency-ms", type=float, default=20.0)
+    streams_parser.set_defaults(func=bench_streams)
+
+    fall_parser = subparsers.add_parser("fall", help="拥挤场景跌倒检测：逐人 vs 向量化")
+    fall_parser.add_argument("--persons", default="1,10,50,100", help="逗号分隔的每帧人数列表")
+    fall_parser.add_argument("--width", type=int, default=1280)
+    fall_parser.add_argument("--height", type=int, default=720)
+    fall_parser.add_argument("--iterations", type=int, default=50)
+    fall_parser.add_argument("--verify", type=int, default=5000, help="结果核对用的边界数据人数")
+    fall_parser.set_defaults(func=bench_fall)
+
+    fight_parser = subparsers.add_parser("fight", help="拥挤场景打架检测每帧耗时")
+    fight_parser.add_argument("--persons", default="2,10,30,60,100", help="逗号分隔的每帧人数列表")
+    fight_parser.add_argument("--width", type=int, default=1280)
+    fight_parser.add_argument("--height", type=int, default=720)
+    fight_parser.add_argument("--iterations", type=int, default=50)
+    fight_parser.add_argument("--verify", type=int, default=300, help="结果核对用的随机场景数")
+    fight_parser.set_defaults(func=bench_fight)
+
+    persons_parser = subparsers.add_parser("persons", help="每帧人员数据表示：tolist 字典 vs 数组视图")
+    persons_parser.add_argument("--persons", default="1,10,30,100", help="逗号分隔的每帧人数列表")
+    persons_parser.add_argument("--width", type=int, default=1280)
+    persons_parser.add_argument("--height", type=int, default=720)
+    persons_parser.add_argument("--iterations", type=int, default=50)
+    persons_parser.set_defaults(func=bench_persons)
+
+    temporal_parser = subparsers.add_parser("temporal", help="时序分析窗口统计：重新扫描 vs 增量")
+    temporal_parser.add_argument("--windows", default="15,60,150,300,900", help="逗号分隔的窗口大小列表")
+    temporal_parser.add_argument("--frames", type=int, default=20000, help="模拟的帧数")
+    temporal_parser.set_defaults(func=bench_temporal)
+
+    tracking_parser = subparsers.add_parser("tracking", help="人员跟踪耗时与逐人时序告警")
+    tracking_parser.add_argument("--persons", default="2,10,30,60", help="逗号分隔的每帧人数列表")
+    tracking_parser.add_argument("--frames", type=int, default=600, help="模拟的帧数")
+    tracking_parser.add_argument("--seeds", type=int, default=8, help="每种人数模拟的随机场景数")
+    tracking_parser.add_argument("--cooldown-frames", type=int, default=50,
+                                 help="告警冷却帧数（默认 5 秒冷却、每秒检测 10 帧）")
+    tracking_parser.add_argument("--width", type=int, default=1280)
+    tracking_parser.add_argument("--height", type=int, default=720)
+    tracking_parser.set_defaults(func=bench_tracking)
+
+    zones_parser = subparsers.add_parser("zones", help="区域绘制：逐区域混合 vs 预渲染叠加层")
+    zones_parser.add_argument("--zones", default="1,5,10,20,50", help="逗号分隔的区域数量列表")
+    zones_parser.add_argument("--persons", type=int, default=20, help="每帧人数")
+    zones_parser.add_argument("--width", type=int, default=1280)
+    zones_parser.add_argument("--height", type=int, default=720)
+    zones_parser.add_argument("--iterations", type=int, default=50)
+    zones_parser.set_defaults(func=bench_zones)
+
+    render_parser = subparsers.add_parser("render", help="检测结果可视化：plot + 整帧混合 vs 共用绘制器")
+    render_parser.add_argument("--image", default=None, help="测试图片路径（默认随机噪声图）")
+    render_parser.add_argument("--persons", default="0,5,20,50", help="逗号分隔的每帧人数列表")
+    render_parser.add_argument("--width", type=int, default=1280)
+    render_parser.add_argument("--height", type=int, default=720)
+    render_parser.add_argument("--iterations", type=int, default=50)
+    render_parser.set_defaults(func=bench_render)
+
+    imgsz_parser = subparsers.add_parser("imgsz", help="不同推理尺寸的速度与精度（以原始分辨率为基准）")
+    imgsz_parser.add_argument("--video", default=None, help="测试视频路径（默认使用 --image）")
+    imgsz_parser.add_argument("--image", default=None, help="测试图片路径（默认随机噪声图）")
+    imgsz_parser.add_argument("--frames", type=int, default=50, help="从视频中均匀抽取的帧数")
+    imgsz_parser.add_argument("--sizes", default="320,480,640,960,1280", help="逗号分隔的推理尺寸列表")
+    imgsz_parser.set_defaults(func=bench_imgsz)
+
+    records_parser = subparsers.add_parser("records", help="逐帧记录 NPZ 写入、读回校验与大小")
+    records_parser.add_argument("--frames", default="1000,10000,100000", help="逗号分隔的帧数列表")
+    records_parser.set_defaults(func=bench_records)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
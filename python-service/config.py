@@ -27,19 +27,52 @@ MODEL_HALF = os.getenv("MODEL_HALF", "false").lower() == "true"  # 半精度，
 MODEL_IOU = float(os.getenv("MODEL_IOU", "0.45"))
 
 # 检测配置
+DETECTION_IMGSZ = int(os.getenv("DETECTION_IMGSZ", "640"))  # 推理尺寸（长边像素，向上取整到32的倍数），更大的帧送入模型前先缩小一次
 DETECTION_FRAME_SKIP = int(os.getenv("DETECTION_FRAME_SKIP", "5"))  # 视频检测跳帧数
+DETECTION_ACTIVE_FRAME_SKIP = int(os.getenv("DETECTION_ACTIVE_FRAME_SKIP", "1"))  # 有人/异常时的采样间隔
+DETECTION_ADAPTIVE_SAMPLING = os.getenv("DETECTION_ADAPTIVE_SAMPLING", "true").lower() == "true"  # 自适应采样
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", "4"))  # 视频检测时每次推理的帧数
+VIDEO_PIPELINE_QUEUE_SIZE = int(os.getenv("VIDEO_PIPELINE_QUEUE_SIZE", "4"))  # 视频流水线阶段间队列长度
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))  # 视频检测任务并发数
+VIDEO_JOB_TTL = int(os.getenv("VIDEO_JOB_TTL", "3600"))  # 已结束任务保留时间（秒）
+RTSP_MAX_STREAMS = int(os.getenv("RTSP_MAX_STREAMS", "32"))  # 同时运行的RTSP流上限
+RTSP_BATCH_SIZE = int(os.getenv("RTSP_BATCH_SIZE", "8"))  # 跨流推理每批最大帧数
+RTSP_BATCH_MAX_LATENCY_MS = float(os.getenv("RTSP_BATCH_MAX_LATENCY_MS", "20"))  # 跨流推理凑批最长等待（毫秒）
+RTSP_PREDICTION_FPS = float(os.getenv("RTSP_PREDICTION_FPS", "10"))  # 两次检测之间按跟踪运动估计推送预测结果的最高帧率，0 表示不推送
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", "640"))  # 实时预览画面宽度（按比例缩放），0 表示原始分辨率
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "70"))  # 实时预览 JPEG 质量（1-100）
+PREVIEW_MAX_FPS = float(os.getenv("PREVIEW_MAX_FPS", "15"))  # 实时预览每路最高帧率，单个观看者可请求更低帧率
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "100")) * 1024 * 1024  # MB
 
+# 人员跟踪配置
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))  # 检测框关联的最小IoU（候选门限，候选之间按中心点距离匹配）
+TRACK_CENTROID_THRESHOLD = float(os.getenv("TRACK_CENTROID_THRESHOLD", "0.5"))  # IoU不足时中心点关联的最大距离（相对框对角线）
+TRACK_MAX_AGE = int(os.getenv("TRACK_MAX_AGE", "5"))  # 连续几次检测未匹配后移除跟踪目标
+
 # 告警配置
 ALERT_ENABLED = os.getenv("ALERT_ENABLED", "true").lower() == "true"
 ALERT_THRESHOLD = float(os.getenv("ALERT_THRESHOLD", "0.7"))
 ALERT_COOLDOWN = int(os.getenv("ALERT_COOLDOWN", "5"))  # 秒
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))  # 待发送告警队列容量，满时丢弃新告警
+ALERT_BATCH_SIZE = int(os.getenv("ALERT_BATCH_SIZE", "20"))  # 每次请求最多合并的告警数
+ALERT_BATCH_MAX_WAIT_MS = float(os.getenv("ALERT_BATCH_MAX_WAIT_MS", "200"))  # 凑批最长等待（毫秒）
+ALERT_TIMEOUT = float(os.getenv("ALERT_TIMEOUT", "5"))  # 单次请求超时（秒）
+ALERT_MAX_RETRIES = int(os.getenv("ALERT_MAX_RETRIES", "3"))  # 发送失败后的重试次数
+ALERT_RETRY_BACKOFF = float(os.getenv("ALERT_RETRY_BACKOFF", "0.5"))  # 首次重试等待（秒），之后翻倍
+ALERT_SPOOL_DIR = os.getenv("ALERT_SPOOL_DIR", str(BASE_DIR / "alert_spool"))  # 后端不可用时的告警暂存目录
+ALERT_SPOOL_MAX = int(os.getenv("ALERT_SPOOL_MAX", "10000"))  # 暂存告警条数上限
+ALERT_SPOOL_RETRY_INTERVAL = float(os.getenv("ALERT_SPOOL_RETRY_INTERVAL", "10"))  # 后端恢复探测间隔（秒）
 
 # 服务器配置
 SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.getenv("SERVER_PORT", "5000"))
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
+# 日志配置
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG_MODE else "INFO").upper()  # 生产环境不输出 DEBUG
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+DETECTION_TRACE_SIZE = int(os.getenv("DETECTION_TRACE_SIZE", "0"))  # 判定过程追踪缓冲区容量，0 表示关闭
+
 # 支持的文件格式
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
 ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv"}
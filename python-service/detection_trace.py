@@ -0,0 +1,67 @@
+"""
+检测判定过程追踪
+每次判定的中间指标（比例、角度、距离等）以记录形式写入固定容量的环形缓冲区，
+不在检测过程中输出，需要排查时通过接口按需读取
+"""
+import itertools
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+class DecisionTrace:
+    """
+    判定过程追踪缓冲区
+
+    容量为 0 时关闭，record() 直接返回；开启时只做一次 deque 追加（线程安全，无锁），
+    超出容量时自动丢弃最旧的记录
+    """
+
+    def __init__(self, capacity: int = 0):
+        """
+        参数:
+            capacity: 最多保留的记录数，0 表示关闭
+        """
+        self.capacity = max(0, capacity)
+        self._records: deque = deque(maxlen=self.capacity or 1)
+        self._seq = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def record(self, kind: str, **fields):
+        """
+        追加一条记录
+
+        参数:
+            kind: 记录类型（如 fall、fight、frame）
+            fields: 判定指标
+        """
+        if self.capacity:
+            self._records.append((next(self._seq), time.time(), kind, fields))
+
+    def snapshot(self, limit: Optional[int] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        读取最近的记录（按时间先后）
+
+        参数:
+            limit: 最多返回的条数
+            kind: 只返回指定类型的记录
+        """
+        records = list(self._records) if self.capacity else []
+        if kind is not None:
+            records = [r for r in records if r[2] == kind]
+        if limit is not None:
+            records = records[-limit:] if limit > 0 else []
+        return [{'seq': seq, 'timestamp': ts, 'kind': k, **fields} for seq, ts, k, fields in records]
+
+    def clear(self):
+        self._records.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'size': len(self._records) if self.capacity else 0,
+        }
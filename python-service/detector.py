@@ -5,16 +5,38 @@
 import cv2
 import numpy as np
 import math
-from typing import Dict, List, Any, Tuple, Optional
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Any, Tuple, Optional, Callable
 from ultralytics import YOLO
 from zone_detector import ZoneDetector
+from config import (
+    VIDEO_BATCH_SIZE,
+    DETECTION_FRAME_SKIP,
+    DETECTION_ACTIVE_FRAME_SKIP,
+    DETECTION_ADAPTIVE_SAMPLING,
+    VIDEO_PIPELINE_QUEUE_SIZE,
+    DETECTION_TRACE_SIZE,
+    DETECTION_IMGSZ,
+)
+from video_pipeline import StagedPipeline
+from pose_data import PoseBatch
+from frame_records import FrameRecordWriter, FRAME_RECORD_DTYPE, TRACK_RECORD_COLUMNS
+from detection_trace import DecisionTrace
+from tracker import PersonTracker
+from annotator import FrameAnnotator
+from letterbox import letterbox, LetterboxTransform
+
+logger = logging.getLogger(__name__)
 
 # 配置参数
 MODEL_PATH = "yolov8n-pose.pt"
 CONFIDENCE_THRESHOLD = 0.3
 IOU_THRESHOLD = 0.5
 MODEL_DEVICE = "cpu"  # 或 "cuda:0"
-DETECTION_FRAME_SKIP = 1  # 视频检测时每隔几帧检测一次
+MODEL_STRIDE = 32  # 模型最大步长，推理尺寸需为其整数倍
+FALL_BATCH_MIN_PERSONS = 24  # 人数达到该值才用向量化跌倒检测，人少时逐人判断更快
 
 # 关键点索引映射
 KEYPOINT_DICT = {
@@ -37,13 +59,148 @@ KEYPOINT_DICT = {
     'right_ankle': 16
 }
 
+# 人数较少时打架检测直接比较全部人对：人数 -> (first, second)
+_SMALL_PAIRS = {count: np.triu_indices(count, k=1) for count in range(2, 8)}
+
+
+def round_imgsz(imgsz: int) -> int:
+    """推理尺寸向上取整到 MODEL_STRIDE 的倍数（与 ultralytics 的取整方式一致，保证预先缩小的帧在模型内不再缩放）"""
+    return max(MODEL_STRIDE, math.ceil(imgsz / MODEL_STRIDE) * MODEL_STRIDE)
+
+
+class _VideoResultAggregator:
+    """
+    视频逐帧结果汇总：异常帧与有人帧只保留计数等累计量，另维护连续检测片段；
+    逐帧记录写入磁盘（可选），不在内存中累积
+    """
+    
+    def __init__(self, fps: float, records: Optional[FrameRecordWriter] = None):
+        self.fps = fps if fps and fps > 0 else 25
+        self.records = records  # 逐帧记录写入器
+        self.abnormal_frame_count = 0  # 异常行为帧数
+        self.abnormal_confidence_sum = 0.0
+        self.behavior_counts = Counter()  # 各异常行为类型的帧数（按首次出现顺序）
+        self.person_frame_count = 0  # 检测到人的帧数
+        self.detection_segments = []  # 检测片段（连续检测到人的时间段）
+        self.current_segment = None  # 当前检测片段
+        self.max_person_count = 0
+    
+    def add(self, frame_number: int, frame_result: Dict[str, Any], inferred: bool = True):
+        """按帧序号顺序加入一帧的分析结果"""
+        timestamp = frame_number / self.fps
+        self.max_person_count = max(self.max_person_count, frame_result['person_count'])
+        if self.records is not None:
+            self.records.append(frame_number, timestamp, frame_result, inferred)
+        
+        # 统计异常帧
+        if frame_result['has_abnormal']:
+            self.abnormal_frame_count += 1
+            self.abnormal_confidence_sum += frame_result['confidence']
+            self.behavior_counts[frame_result['behavior_type']] += 1
+        
+        # 统计检测到人的帧
+        if frame_result['person_count'] > 0:
+            self.person_frame_count += 1
+            
+            # 检测片段管理
+            segment = self.current_segment
+            if segment is None:
+                # 开始新片段
+                self.current_segment = {
+                    'start_frame': frame_number,
+                    'end_frame': frame_number,
+                    'start_time': timestamp,
+                    'end_time': timestamp,
+                    'person_count_max': frame_result['person_count'],
+                    'has_abnormal': frame_result['has_abnormal'],
+                    'abnormal_count': 1 if frame_result['has_abnormal'] else 0,
+                    'total_frames': 1
+                }
+            else:
+                # 继续当前片段
+                segment['end_frame'] = frame_number
+                segment['end_time'] = timestamp
+                segment['person_count_max'] = max(segment['person_count_max'], frame_result['person_count'])
+                segment['has_abnormal'] = segment['has_abnormal'] or frame_result['has_abnormal']
+                if frame_result['has_abnormal']:
+                    segment['abnormal_count'] += 1
+                segment['total_frames'] += 1
+        elif self.current_segment is not None:
+            # 未检测到人，结束当前片段
+            segment = self._close_segment()
+            logger.debug("保存检测片段: 帧%d-%d, 时长%.1fs, 最多%d人, 异常帧%d帧",
+                         segment['start_frame'], segment['end_frame'], segment['duration'],
+                         segment['person_count_max'], segment['abnormal_count'])
+    
+    def _close_segment(self) -> Dict[str, Any]:
+        segment = self.current_segment
+        segment['duration'] = segment['end_time'] - segment['start_time']
+        self.detection_segments.append(segment)
+        self.current_segment = None
+        return segment
+    
+    def finish(self):
+        """处理最后一个片段"""
+        if self.current_segment is not None:
+            segment = self._close_segment()
+            logger.debug("保存最后检测片段: 帧%d-%d, 时长%.1fs",
+                         segment['start_frame'], segment['end_frame'], segment['duration'])
+    
+    def summary(self, frame_count: int) -> Dict[str, Any]:
+        """汇总结果（时序平滑：投票 + 平均置信度）"""
+        abnormal_frame_count = self.abnormal_frame_count
+        has_abnormal = abnormal_frame_count > 0
+        if has_abnormal:
+            # 投票：最常出现的行为类型
+            behavior_type = self.behavior_counts.most_common(1)[0][0]
+            
+            # 平均置信度
+            confidence = self.abnormal_confidence_sum / abnormal_frame_count
+            
+            description = f"视频中检测到{abnormal_frame_count}帧异常行为: {behavior_type}"
+        else:
+            behavior_type = None
+            confidence = 0.0
+            description = "未检测到异常行为"
+        
+        # 统计信息
+        total_person_frames = self.person_frame_count
+        total_segments = len(self.detection_segments)
+        
+        if total_person_frames > 0:
+            description += f"，共{total_person_frames}帧检测到人，{total_segments}个检测片段"
+        
+        logger.info("检测统计: 总帧数=%d, 检测到人的帧数=%d, 异常帧数=%d, 检测片段数=%d",
+                    frame_count, total_person_frames, abnormal_frame_count, total_segments)
+        
+        return {
+            'has_abnormal': has_abnormal,
+            'behavior_type': behavior_type,
+            'confidence': float(confidence),
+            'person_count': self.max_person_count,
+            'description': description,
+            'frame_count': frame_count,
+            'abnormal_frame_count': abnormal_frame_count,  # 异常帧数
+            'behavior_counts': dict(self.behavior_counts),  # 各异常行为类型的帧数
+            'detection_segments': self.detection_segments,  # 检测片段
+            'total_person_frames': total_person_frames,  # 检测到人的总帧数
+            'total_segments': total_segments  # 检测片段总数
+        }
+
 
 class BehaviorDetector:
     """人体异常行为检测器"""
     
     def __init__(self, model_path: str = MODEL_PATH, 
                  conf_threshold: float = CONFIDENCE_THRESHOLD,
-                 iou_threshold: float = IOU_THRESHOLD):
+                 iou_threshold: float = IOU_THRESHOLD,
+                 batch_size: int = VIDEO_BATCH_SIZE,
+                 frame_skip: int = DETECTION_FRAME_SKIP,
+                 active_frame_skip: int = DETECTION_ACTIVE_FRAME_SKIP,
+                 adaptive_sampling: bool = DETECTION_ADAPTIVE_SAMPLING,
+                 pipeline_queue_size: int = VIDEO_PIPELINE_QUEUE_SIZE,
+                 trace_size: int = DETECTION_TRACE_SIZE,
+                 imgsz: int = DETECTION_IMGSZ):
         """
         初始化检测器
         
@@ -51,22 +208,69 @@ class BehaviorDetector:
             model_path: YOLO模型路径
             conf_threshold: 置信度阈值
             iou_threshold: IOU阈值
+            batch_size: 视频检测时每次推理的帧数
+            frame_skip: 视频检测时每隔几帧推理一次（空场景采样间隔）
+            active_frame_skip: 自适应采样时，有人或异常场景的采样间隔
+            adaptive_sampling: 是否启用自适应采样
+            pipeline_queue_size: 视频流水线各阶段之间的队列长度
+            trace_size: 判定过程追踪缓冲区容量，0 表示关闭
+            imgsz: 推理尺寸（长边像素），向上取整到 MODEL_STRIDE 的倍数
         """
         # 初始化区域检测器
         self.zone_detector = ZoneDetector()
         self.model_path = model_path
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
+        self.batch_size = max(1, batch_size)
+        self.frame_skip = max(1, frame_skip)
+        self.active_frame_skip = max(1, active_frame_skip)
+        self.adaptive_sampling = adaptive_sampling
+        self.pipeline_queue_size = max(1, pipeline_queue_size)
+        self.imgsz = round_imgsz(imgsz)
+        self._model_lock = threading.Lock()
         self.KEYPOINT_DICT = KEYPOINT_DICT
+        # 判定过程追踪（默认关闭，开启后通过 /debug/trace 读取）
+        self.trace = DecisionTrace(trace_size)
+        # 检测结果可视化（图片、视频帧、实时接口共用）
+        self.annotator = FrameAnnotator()
         
         # 加载模型
         try:
             self.model = YOLO(model_path)
-            print(f"成功加载模型: {model_path}")
+            logger.info("成功加载模型: %s", model_path)
         except Exception as e:
-            print(f"加载模型失败: {e}")
+            logger.error("加载模型失败: %s", e)
             self.model = None
     
+    def predict(self, source):
+        """
+        执行模型推理（线程安全）
+        
+        参数:
+            source: 单帧图像或图像列表（通常为 prepare 的输出）
+        
+        返回:
+            YOLO检测结果列表
+        """
+        # 同一模型实例被多个线程共享（视频任务、RTSP流），推理需串行执行
+        with self._model_lock:
+            return self.model(
+                source,
+                conf=self.conf_threshold,
+                iou=self.iou_threshold,
+                imgsz=self.imgsz,
+                device=MODEL_DEVICE,
+            )
+    
+    def prepare(self, frame: np.ndarray) -> Tuple[np.ndarray, LetterboxTransform]:
+        """
+        将帧缩小到推理尺寸（长边不超过 imgsz 的帧原样返回）
+        
+        返回:
+            (模型输入图像, 坐标变换)，结果交给 _analyze_results 时传入该变换以映射回原图坐标
+        """
+        return letterbox(frame, self.imgsz)
+    
     def detect_image(self, image_path: str, visualize: bool = False, output_path: str = None) -> Dict[str, Any]:
         """
         检测图片中的异常行为
@@ -84,176 +288,60 @@ class BehaviorDetector:
         if image is None:
             raise ValueError(f"无法读取图片: {image_path}")
         
-        # 进行检测
-        results = self.model(
-            image,
-            conf=self.conf_threshold,
-            iou=self.iou_threshold,
-            device=MODEL_DEVICE,
-        )
+        return self.detect_frame(image, visualize=visualize, output_path=output_path)
+    
+    def detect_frame(self, frame: np.ndarray, visualize: bool = False, output_path: str = None,
+                     tracker: Optional[PersonTracker] = None) -> Dict[str, Any]:
+        """
+        检测内存中的单帧图像（BGR ndarray），不经过临时文件
+        
+        参数:
+            frame: BGR格式的图像数组
+            visualize: 是否生成可视化图片
+            output_path: 可视化图片保存路径
+            tracker: 该视频流的人员跟踪器（可选），见 _analyze_results
+        
+        返回:
+            检测结果字典
+        """
+        if frame is None or frame.size == 0:
+            raise ValueError("无效的图像帧")
+        
+        # 缩小到推理尺寸后检测，结果坐标映射回原图
+        model_input, transform = self.prepare(frame)
+        results = self.predict(model_input)
         
         # 分析结果
-        result = self._analyze_results(results, image.shape)
+        result = self._analyze_results(results, frame.shape, tracker, transform)
         
         # 生成可视化图片
         if visualize and output_path:
-            vis_image = self._visualize_detection(image, results, result)
+            vis_image = self.annotator.annotate(frame, result, copy=True)
             cv2.imwrite(output_path, vis_image)
             result['visualization_path'] = output_path
         
         return result
     
-    def _visualize_detection(self, image, results, detection_result):
+    @staticmethod
+    def predict_frame(result: Dict[str, Any], tracker: PersonTracker, steps: float) -> Dict[str, Any]:
         """
-        可视化检测结果（图片）
+        跳过推理的帧的结果：沿用上一次检测的判定，人员为跟踪器按运动估计外推的位置
         
         参数:
-            image: 原始图片
-            results: YOLO检测结果
-            detection_result: 分析后的检测结果
+            result: 上一次带 tracker 检测的结果
+            tracker: 产生该结果的人员跟踪器
+            steps: 距离上一次检测的推理间隔数，见 PersonTracker.predict
         
         返回:
-            可视化后的图片
+            新的结果字典，persons 带跟踪ID，另含 predicted=True
         """
-        try:
-            # 使用ultralytics内置的plot方法生成可视化图像
-            if results and len(results) > 0 and detection_result['person_count'] > 0:
-                try:
-                    vis_image = results[0].plot(
-                        conf=False,
-                        line_width=2,
-                        font_size=0.5,
-                        pil=False,
-                        labels=False,
-                        boxes=True,
-                        kpt_radius=5
-                    )
-                except Exception as plot_error:
-                    print(f"使用内置plot方法失败: {plot_error}")
-                    vis_image = image.copy()
-            else:
-                vis_image = image.copy()
-            
-            # 添加检测结果文本
-            if detection_result['has_abnormal']:
-                behavior_text = f"ABNORMAL: {detection_result['behavior_type']}"
-                conf_text = f"Confidence: {detection_result['confidence']:.2f}"
-                
-                # 添加半透明背景
-                overlay = vis_image.copy()
-                cv2.rectangle(overlay, (10, 10), (350, 70), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, vis_image, 0.4, 0, vis_image)
-                
-                # 添加文字
-                cv2.putText(vis_image, behavior_text, (18, 33),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 255), 2)
-                cv2.putText(vis_image, conf_text, (18, 55),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            else:
-                # 正常状态
-                overlay = vis_image.copy()
-                cv2.rectangle(overlay, (10, 10), (200, 50), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, vis_image, 0.4, 0, vis_image)
-                
-                cv2.putText(vis_image, "Status: NORMAL", (18, 35),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 0), 2)
-            
-            # 添加人数统计
-            person_count_text = f"Persons: {detection_result['person_count']}"
-            text_size = cv2.getTextSize(person_count_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            text_x = 18
-            text_y = vis_image.shape[0] - 22
-            
-            overlay = vis_image.copy()
-            cv2.rectangle(overlay, 
-                         (text_x - 8, text_y - text_size[1] - 8),
-                         (text_x + text_size[0] + 8, text_y + 8),
-                         (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.6, vis_image, 0.4, 0, vis_image)
-            
-            cv2.putText(vis_image, person_count_text, (text_x, text_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            return vis_image
-            
-        except Exception as e:
-            print(f"可视化失败: {e}")
-            return image.copy()
-    
-    def _visualize_frame(self, frame, results, detection_result):
-        """
-        可视化单个视频帧
-        
-        参数:
-            frame: 原始视频帧
-            results: YOLO检测结果
-            detection_result: 分析后的检测结果
-        
-        返回:
-            可视化后的帧
-        """
-        try:
-            # 使用ultralytics内置的plot方法生成可视化图像
-            if results and len(results) > 0 and detection_result['person_count'] > 0:
-                try:
-                    vis_frame = results[0].plot(
-                        conf=False,
-                        line_width=2,
-                        font_size=0.5,
-                        pil=False,
-                        labels=False,
-                        boxes=True,
-                        kpt_radius=5
-                    )
-                except Exception as plot_error:
-                    vis_frame = frame.copy()
-            else:
-                vis_frame = frame.copy()
-            
-            # 添加检测结果文本
-            if detection_result['has_abnormal']:
-                behavior_text = f"ABNORMAL: {detection_result['behavior_type']}"
-                conf_text = f"Confidence: {detection_result['confidence']:.2f}"
-                
-                overlay = vis_frame.copy()
-                cv2.rectangle(overlay, (10, 10), (350, 70), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
-                
-                cv2.putText(vis_frame, behavior_text, (18, 33),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 255), 2)
-                cv2.putText(vis_frame, conf_text, (18, 55),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            else:
-                overlay = vis_frame.copy()
-                cv2.rectangle(overlay, (10, 10), (200, 50), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
-                
-                cv2.putText(vis_frame, "Status: NORMAL", (18, 35),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 0), 2)
-            
-            # 添加人数统计
-            person_count_text = f"Persons: {detection_result['person_count']}"
-            text_size = cv2.getTextSize(person_count_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            text_x = 18
-            text_y = vis_frame.shape[0] - 22
-            
-            overlay = vis_frame.copy()
-            cv2.rectangle(overlay, 
-                         (text_x - 8, text_y - text_size[1] - 8),
-                         (text_x + text_size[0] + 8, text_y + 8),
-                         (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
-            
-            cv2.putText(vis_frame, person_count_text, (text_x, text_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            return vis_frame
-            
-        except Exception as e:
-            print(f"帧可视化失败: {e}")
-            return frame.copy()
+        return dict(result, persons=tracker.predict(steps), predicted=True)
     
-    def detect_video(self, video_path: str, visualize: bool = False, output_path: str = None) -> Dict[str, Any]:
+    def detect_video(self, video_path: str, visualize: bool = False, output_path: str = None,
+                     batch_size: int = None, frame_skip: int = None,
+                     adaptive: bool = None,
+                     progress_callback: Callable[[int, int], None] = None,
+                     records_path: str = None) -> Dict[str, Any]:
         """
         检测视频中的异常行为
         
@@ -261,9 +349,14 @@ class BehaviorDetector:
             video_path: 视频路径
             visualize: 是否生成可视化视频
             output_path: 可视化视频保存路径
+            batch_size: 每次推理的帧数，默认使用初始化时的配置
+            frame_skip: 每隔几帧推理一次，跳过的帧沿用上一次的判定，人员位置按跟踪运动估计外推
+            adaptive: 是否根据场景自适应调整采样密度
+            progress_callback: 进度回调 (已处理帧数, 总帧数)，总帧数未知时为0
+            records_path: 逐帧记录 NPZ 文件保存路径（以 .npz 结尾），为空时不保存；另含每帧每人的跟踪ID与检测框
         
         返回:
-            检测结果字典
+            检测结果字典（只含汇总与检测片段，逐帧数据见 records_path）
         """
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
@@ -273,6 +366,7 @@ class BehaviorDetector:
         fps = int(cap.get(cv2.CAP_PROP_FPS))
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
         
         # 创建视频写入器（使用浏览器兼容的H.264编码）
         video_writer = None
@@ -290,222 +384,255 @@ class BehaviorDetector:
                     fourcc = cv2.VideoWriter_fourcc(*fourcc_str)
                     video_writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
                     if video_writer.isOpened():
-                        print(f"✓ 成功创建视频写入器: {output_path}")
-                        print(f"  编码器: {codec_name}, fps={fps}, size={width}x{height}")
+                        logger.info("成功创建视频写入器: %s (编码器: %s, fps=%s, size=%dx%d)",
+                                    output_path, codec_name, fps, width, height)
                         break
                     else:
                         video_writer.release()
                         video_writer = None
                 except Exception as e:
-                    print(f"× 尝试编码器 {codec_name} 失败: {e}")
+                    logger.warning("尝试编码器 %s 失败: %s", codec_name, e)
                     continue
             
             if video_writer is None or not video_writer.isOpened():
                 raise RuntimeError("无法创建视频写入器，请检查OpenCV和编码器支持")
         
-        frame_count = 0
-        abnormal_frames = []  # 异常行为帧
-        person_detected_frames = []  # 检测到人的帧
-        all_detections = []  # 所有检测结果
-        detection_segments = []  # 检测片段（连续检测到人的时间段）
-        
-        current_segment = None  # 当前检测片段
+        batch_size = max(1, int(batch_size or self.batch_size))
+        frame_skip = max(1, int(frame_skip or self.frame_skip))
+        adaptive = self.adaptive_sampling if adaptive is None else adaptive
+        records = FrameRecordWriter(records_path) if records_path else None
+        aggregator = _VideoResultAggregator(fps, records)
         
         # 检查VideoWriter是否成功创建
         if visualize and video_writer is None:
-            print(f"× 警告：VideoWriter未创建，跳过可视化")
+            logger.warning("VideoWriter未创建，跳过可视化")
             visualize = False
+        write_video = video_writer is not None and video_writer.isOpened()
         
-        try:
+        # 各阶段共享的计数与最近一次分析结果
+        state = {'frame_count': 0, 'inferred_count': 0, 'last_frame_result': None}
+        # 人员跟踪（只在分析阶段按帧序使用）：跳过推理的帧由上一次推理外推人员位置，
+        # infer_interval 为最近两次推理相隔的帧数，即跟踪器速度估计所对应的间隔
+        tracker = PersonTracker()
+        track_state = {'last_infer_frame': 0, 'infer_interval': frame_skip}
+        predict_skipped = write_video or records is not None
+        # 每组处理完成后的最后分析结果，供解码阶段自适应采样使用
+        chunk_results = []
+        chunk_done = threading.Condition()
+        
+        def sampling_feedback(chunk_index: int) -> Optional[Dict[str, Any]]:
+            """
+            自适应采样所依据的分析结果：第 chunk_index 组使用第 chunk_index - 2 组结束时的结果，
+            解码可领先分析两组，且采样结果不受线程调度影响
+            """
+            if not adaptive:
+                return None
+            required = chunk_index - 1
+            if required <= 0:
+                return None
+            with chunk_done:
+                while len(chunk_results) < required and not pipeline.is_stopped():
+                    chunk_done.wait(timeout=0.1)
+                return chunk_results[required - 1] if len(chunk_results) >= required else None
+        
+        def decode_chunks():
+            """解码阶段：读取帧并按采样策略标记需要推理的帧，每凑满 batch_size 个推理帧输出一组"""
+            # 每组元素: (帧序号, 帧图像, 模型输入, 坐标变换, 是否推理)；未推理的帧沿用上一次的结果，
+            # 不写可视化视频时只保留缩小后的模型输入
+            chunk = []
+            chunk_index = 0
+            feedback = None
+            infer_pending = 0
+            next_infer_frame = 1
+            frame_count = 0
             while True:
-                ret, frame = cap.read()
+                if not chunk:
+                    feedback = sampling_feedback(chunk_index)
+                infer = frame_count + 1 >= next_infer_frame
+                if infer or write_video:
+                    ret, frame = cap.read()
+                else:
+                    # 跳过的帧无需可视化时只grab，不做解码后的颜色转换
+                    ret, frame = cap.grab(), None
                 if not ret:
                     break
                 
                 frame_count += 1
+                state['frame_count'] = frame_count
+                if infer:
+                    next_infer_frame = frame_count + self._sampling_interval(feedback, frame_skip, adaptive)
+                    infer_pending += 1
+                model_input, transform = self.prepare(frame) if infer else (None, None)
+                chunk.append((frame_count, frame if write_video else None, model_input, transform, infer))
                 
-                # 进行检测（不跳帧，确保视频完整）
-                results = self.model(
-                    frame,
-                    conf=self.conf_threshold,
-                    iou=self.iou_threshold,
-                    device=MODEL_DEVICE,
-                )
-                frame_result = self._analyze_results(results, frame.shape)
+                if infer_pending >= batch_size:
+                    yield chunk
+                    chunk = []
+                    chunk_index += 1
+                    infer_pending = 0
                 
-                # 记录异常帧
-                if frame_result['has_abnormal']:
-                    abnormal_frames.append({
-                        'frame_number': frame_count,
-                        'timestamp': frame_count / fps,
-                        'behavior_type': frame_result['behavior_type'],
-                        'confidence': frame_result['confidence'],
-                        'person_count': frame_result['person_count']
-                    })
-                
-                # 记录检测到人的帧
-                if frame_result['person_count'] > 0:
-                    person_detected_frames.append({
-                        'frame_number': frame_count,
-                        'timestamp': frame_count / fps,
-                        'person_count': frame_result['person_count'],
-                        'has_abnormal': frame_result['has_abnormal'],
-                        'behavior_type': frame_result['behavior_type'],
-                        'confidence': frame_result['confidence']
-                    })
-                    
-                    # 检测片段管理
-                    if current_segment is None:
-                        # 开始新片段
-                        current_segment = {
-                            'start_frame': frame_count,
-                            'end_frame': frame_count,
-                            'start_time': frame_count / fps,
-                            'end_time': frame_count / fps,
-                            'person_count_max': frame_result['person_count'],
-                            'has_abnormal': frame_result['has_abnormal'],
-                            'abnormal_count': 1 if frame_result['has_abnormal'] else 0,
-                            'total_frames': 1
-                        }
-                    else:
-                        # 继续当前片段
-                        current_segment['end_frame'] = frame_count
-                        current_segment['end_time'] = frame_count / fps
-                        current_segment['person_count_max'] = max(
-                            current_segment['person_count_max'],
-                            frame_result['person_count']
-                        )
-                        current_segment['has_abnormal'] = current_segment['has_abnormal'] or frame_result['has_abnormal']
-                        if frame_result['has_abnormal']:
-                            current_segment['abnormal_count'] += 1
-                        current_segment['total_frames'] += 1
+                # 每100帧记录一次进度
+                if frame_count % 100 == 0:
+                    logger.debug("已处理 %d 帧...", frame_count)
+            
+            # 剩余不足一批的帧
+            if chunk:
+                yield chunk
+        
+        def infer_chunk(chunk):
+            """推理阶段：对一组中需要推理的帧执行一次批量推理"""
+            infer_frames = [model_input for _, _, model_input, _, infer in chunk if infer]
+            batch_results = self.predict(infer_frames) if infer_frames else []
+            state['inferred_count'] += len(infer_frames)
+            return chunk, list(batch_results)
+        
+        def render_chunk(item):
+            """分析可视化阶段：按顺序分析结果、汇总片段并生成可视化帧"""
+            chunk, batch_results = item
+            batch_results = iter(batch_results)
+            vis_frames = []
+            for frame_number, frame, _, transform, infer in chunk:
+                if infer:
+                    frame_result = self._analyze_results(
+                        [next(batch_results)], transform.source_shape, tracker, transform)
+                    if track_state['last_infer_frame']:
+                        track_state['infer_interval'] = frame_number - track_state['last_infer_frame']
+                    track_state['last_infer_frame'] = frame_number
+                    state['last_frame_result'] = frame_result
+                elif predict_skipped:
+                    steps = (frame_number - track_state['last_infer_frame']) / track_state['infer_interval']
+                    frame_result = self.predict_frame(state['last_frame_result'], tracker, steps)
                 else:
-                    # 未检测到人，结束当前片段
-                    if current_segment is not None:
-                        # 保存片段
-                        current_segment['duration'] = current_segment['end_time'] - current_segment['start_time']
-                        detection_segments.append(current_segment)
-                        print(f"保存检测片段: 帧{current_segment['start_frame']}-{current_segment['end_frame']}, "
-                              f"时长{current_segment['duration']:.1f}s, "
-                              f"最多{current_segment['person_count_max']}人, "
-                              f"异常帧{current_segment['abnormal_count']}帧")
-                        current_segment = None
+                    frame_result = state['last_frame_result']
+                aggregator.add(frame_number, frame_result, inferred=infer)
                 
-                all_detections.append(frame_result)
-                
-                # 生成可视化帧并写入
-                if video_writer is not None and video_writer.isOpened():
-                    vis_frame = self._visualize_frame(frame, results, frame_result)
+                if write_video:
+                    # 解码出的帧只在本阶段使用，直接在其上绘制
+                    vis_frame = self.annotator.annotate(frame, frame_result)
                     # 确保帧尺寸正确
-                    if vis_frame.shape[1] == width and vis_frame.shape[0] == height:
-                        video_writer.write(vis_frame)
-                    else:
-                        # 如果尺寸不匹配，resize
+                    if vis_frame.shape[1] != width or vis_frame.shape[0] != height:
                         vis_frame = cv2.resize(vis_frame, (width, height))
-                        video_writer.write(vis_frame)
-                
-                # 每100帧打印一次进度
-                if frame_count % 100 == 0:
-                    print(f"  已处理 {frame_count} 帧...")
-            
-            # 处理最后一个片段
-            if current_segment is not None:
-                current_segment['duration'] = current_segment['end_time'] - current_segment['start_time']
-                detection_segments.append(current_segment)
-                print(f"保存最后检测片段: 帧{current_segment['start_frame']}-{current_segment['end_frame']}, "
-                      f"时长{current_segment['duration']:.1f}s")
-                    
+                    vis_frames.append(vis_frame)
+            with chunk_done:
+                chunk_results.append(state['last_frame_result'])
+                chunk_done.notify_all()
+            if progress_callback is not None:
+                progress_callback(chunk[-1][0], total_frames)
+            return vis_frames
+        
+        def encode_frames(vis_frames):
+            """编码阶段：写入可视化视频"""
+            for vis_frame in vis_frames:
+                video_writer.write(vis_frame)
+        
+        stages = [("infer", infer_chunk), ("render", render_chunk)]
+        if write_video:
+            stages.append(("encode", encode_frames))
+        pipeline = StagedPipeline(decode_chunks(), stages, source_name="decode", queue_size=self.pipeline_queue_size)
+        
+        completed = False
+        try:
+            pipeline_stats = pipeline.run()
+            aggregator.finish()
+            if records is not None:
+                records.close()
+            completed = True
         finally:
+            pipeline.stop()
             cap.release()
+            if records is not None and not completed:
+                records.abort()
             if video_writer is not None:
                 video_writer.release()
-                print(f"✓ 视频处理完成，共 {frame_count} 帧")
+                logger.info("视频处理完成，共 %d 帧", state['frame_count'])
                 if visualize and output_path:
                     import os
                     if os.path.exists(output_path):
                         file_size = os.path.getsize(output_path) / (1024 * 1024)
-                        print(f"✓ 视频可视化完成: {output_path} ({file_size:.2f} MB)")
+                        logger.info("视频可视化完成: %s (%.2f MB)", output_path, file_size)
                     else:
-                        print(f"× 警告：输出文件未生成: {output_path}")
+                        logger.warning("输出文件未生成: %s", output_path)
         
-        # 汇总结果（时序平滑：投票 + 平均置信度）
-        has_abnormal = len(abnormal_frames) > 0
-        if has_abnormal:
-            behavior_types = [f['behavior_type'] for f in abnormal_frames]
-            # 投票：最常出现的行为类型
-            from collections import Counter
-            behavior_type = Counter(behavior_types).most_common(1)[0][0]
-            
-            # 平均置信度
-            confidence = np.mean([f['confidence'] for f in abnormal_frames])
-            
-            description = f"视频中检测到{len(abnormal_frames)}帧异常行为: {behavior_type}"
-        else:
-            behavior_type = None
-            confidence = 0.0
-            description = "未检测到异常行为"
+        logger.info("流水线耗时: %.0fms, 瓶颈阶段: %s", pipeline_stats['elapsed_ms'], pipeline_stats['bottleneck'])
+        for name, stage in pipeline_stats['stages'].items():
+            logger.debug("  %-8s 处理%d组, 平均%.2fms, 利用率%.0f%%",
+                         name, stage['items'], stage['avg_ms'], stage['utilization'] * 100)
         
-        # 统计信息
-        total_person_frames = len(person_detected_frames)
-        total_segments = len(detection_segments)
-        
-        if total_person_frames > 0:
-            description += f"，共{total_person_frames}帧检测到人，{total_segments}个检测片段"
-        
-        print(f"\n检测统计:")
-        print(f"  总帧数: {frame_count}")
-        print(f"  检测到人的帧数: {total_person_frames}")
-        print(f"  异常帧数: {len(abnormal_frames)}")
-        print(f"  检测片段数: {total_segments}")
+        result = aggregator.summary(state['frame_count'])
+        result['inferred_frames'] = state['inferred_count']  # 实际执行推理的帧数
+        result['track_count'] = tracker.total_tracks  # 跟踪到的不同人员数（跟踪ID个数）
+        result['pipeline_stats'] = pipeline_stats  # 各阶段耗时与队列深度
+        if records is not None:
+            # 逐帧记录的列名与条数
+            result['frame_records'] = {
+                'count': records.count,
+                'columns': list(FRAME_RECORD_DTYPE.names),
+                'behavior_types': records.behavior_types,
+                'track_record_count': records.track_count,
+                'track_columns': TRACK_RECORD_COLUMNS,
+            }
+        return result
+    
+    def _sampling_interval(self, frame_result: Optional[Dict[str, Any]], frame_skip: int, adaptive: bool) -> int:
+        """
+        计算距离下一次推理的帧数
         
-        return {
-            'has_abnormal': has_abnormal,
-            'behavior_type': behavior_type,
-            'confidence': float(confidence),
-            'person_count': max([d['person_count'] for d in all_detections]) if all_detections else 0,
-            'description': description,
-            'frame_count': frame_count,
-            'abnormal_frames': abnormal_frames,
-            'person_detected_frames': person_detected_frames,  # 检测到人的所有帧
-            'detection_segments': detection_segments,  # 检测片段
-            'total_person_frames': total_person_frames,  # 检测到人的总帧数
-            'total_segments': total_segments  # 检测片段总数
-        }
+        自适应模式下，上一次检测到人员或异常时密集采样，空场景按 frame_skip 稀疏采样
+        """
+        if not adaptive or frame_result is None:
+            return frame_skip
+        if frame_result['has_abnormal'] or frame_result['person_count'] > 0:
+            return min(frame_skip, self.active_frame_skip)
+        return frame_skip
     
-    def _analyze_results(self, results, image_shape) -> Dict[str, Any]:
+    def _analyze_results(self, results, image_shape, tracker: Optional[PersonTracker] = None,
+                         transform: Optional[LetterboxTransform] = None) -> Dict[str, Any]:
         """
         分析检测结果
         
         参数:
             results: YOLO检测结果
-            image_shape: 图片尺寸
+            image_shape: 原图尺寸
+            tracker: 该视频流的人员跟踪器（可选），提供时为每人分配跟踪ID并给出逐人判定
+            transform: 模型输入为 prepare 缩小后的图像时传入，关键点与检测框先映射回原图坐标
         
         返回:
-            分析结果字典
+            分析结果字典；提供 tracker 时另含 tracks（每人的跟踪ID、行为类型与置信度）
         """
         result = results[0]
         
-        # 提取关键点
-        persons = []
+        # 提取关键点：整帧只转换一次为 float64 数组，每人只保存视图
+        persons = PoseBatch(np.empty((0, 17, 3)))
         if result.keypoints is not None and result.keypoints.data is not None:
             keypoints = result.keypoints.data.cpu().numpy()
-            boxes = result.boxes.data.cpu().numpy() if result.boxes is not None else []
+            boxes = result.boxes.data.cpu().numpy() if result.boxes is not None else None
             
             # 确保keypoints数组不为空且有正确的维度
             if keypoints.size > 0 and len(keypoints.shape) >= 2:
-                for i, kps in enumerate(keypoints):
-                    person_data = {
-                        'keypoints': kps.tolist(),
-                        'box': boxes[i][:4].tolist() if i < len(boxes) else None
-                    }
-                    persons.append(person_data)
+                keypoints = keypoints.astype(np.float64)
+                boxes = boxes[:, :4].astype(np.float64) if boxes is not None and len(boxes) else None
+                if transform is not None:
+                    transform.keypoints_to_source(keypoints)
+                    if boxes is not None:
+                        transform.boxes_to_source(boxes)
+                persons = PoseBatch(keypoints, boxes)
             else:
-                print(f"关键点数组为空或维度不正确: shape={keypoints.shape}")
+                logger.debug("关键点数组为空或维度不正确: shape=%s", keypoints.shape)
         
         # 检测异常行为
-        abnormal_behavior = self._detect_abnormal_behavior(persons, image_shape)
+        person_behaviors = [] if tracker is not None else None
+        abnormal_behavior = self._detect_abnormal_behavior(persons, image_shape, person_behaviors)
+        self.trace.record(
+            'frame',
+            person_count=len(persons),
+            behavior_type=abnormal_behavior['behavior_type'],
+            confidence=round(float(abnormal_behavior['confidence']), 4),
+            description=abnormal_behavior['description']
+        )
+        if abnormal_behavior['is_abnormal']:
+            logger.debug("检测到异常: %s", abnormal_behavior['description'])
         
-        return {
+        analysis = {
             'has_abnormal': abnormal_behavior['is_abnormal'],
             'behavior_type': abnormal_behavior['behavior_type'],
             'confidence': abnormal_behavior['confidence'],
@@ -513,14 +640,24 @@ class BehaviorDetector:
             'persons': persons,
             'description': abnormal_behavior['description']
         }
+        if tracker is not None:
+            persons.set_track_ids(tracker.update(persons))
+            analysis['tracks'] = [
+                {'track_id': track_id, 'behavior_type': behavior_type, 'confidence': confidence}
+                for track_id, (behavior_type, confidence) in zip(persons.track_ids.tolist(), person_behaviors)
+            ]
+        return analysis
     
-    def _detect_abnormal_behavior(self, persons: List[Dict], image_shape) -> Dict[str, Any]:
+    def _detect_abnormal_behavior(self, persons: List[Dict], image_shape,
+                                  person_behaviors: Optional[List[Tuple[Optional[str], float]]] = None) -> Dict[str, Any]:
         """
         检测异常行为
         
         参数:
             persons: 检测到的人员列表
             image_shape: 图片尺寸
+            person_behaviors: 传入列表时，额外对每人完整判定一遍，按人员顺序追加 (行为类型, 置信度)，
+                正常人员的行为类型为 None
         
         返回:
             {
@@ -538,9 +675,15 @@ class BehaviorDetector:
                 'description': '未检测到人员'
             }
         
-        # 1. 检测跌倒
-        for person in persons:
-            fall_result = self._detect_fall(person['keypoints'], image_shape)
+        # 1. 检测跌倒（所有人一次向量化计算）
+        fall_results = self._detect_fall_all(persons, image_shape)
+        fight_result = None
+        if person_behaviors is not None:
+            if len(persons) >= 2:
+                fight_result = self._detect_fight(persons, image_shape)
+            person_behaviors.extend(self._person_behaviors(persons, image_shape, fall_results, fight_result))
+        
+        for fall_result in fall_results:
             if fall_result['is_fall']:
                 return {
                     'is_abnormal': True,
@@ -551,7 +694,8 @@ class BehaviorDetector:
         
         # 2. 检测打架（需要多人）
         if len(persons) >= 2:
-            fight_result = self._detect_fight(persons, image_shape)
+            if fight_result is None:
+                fight_result = self._detect_fight(persons, image_shape)
             if fight_result['is_fight']:
                 return {
                     'is_abnormal': True,
@@ -582,6 +726,50 @@ class BehaviorDetector:
             'description': '未检测到异常行为'
         }
     
+    def _person_behaviors(self, persons: List[Dict], image_shape, fall_results: List[Dict[str, Any]],
+                          fight_result: Optional[Dict[str, Any]]) -> List[Tuple[Optional[str], float]]:
+        """
+        逐人判定行为，优先级与整帧判定一致：跌倒 > 打架 > 异常姿态
+        
+        返回:
+            每人的 (行为类型, 置信度)，正常人员为 (None, 0.0)
+        """
+        fighters = set(fight_result['persons']) if fight_result and fight_result['is_fight'] else set()
+        behaviors = []
+        for i, (person, fall_result) in enumerate(zip(persons, fall_results)):
+            if fall_result['is_fall']:
+                behaviors.append(('FALL', fall_result['confidence']))
+                continue
+            if i in fighters:
+                behaviors.append(('FIGHT', fight_result['confidence']))
+                continue
+            pose_result = self._detect_abnormal_pose(person['keypoints'], image_shape)
+            if pose_result['is_abnormal']:
+                behaviors.append(('ABNORMAL_POSE', pose_result['confidence']))
+            else:
+                behaviors.append((None, 0.0))
+        return behaviors
+    
+    def _detect_fall_all(self, persons: List[Dict], image_shape) -> List[Dict[str, Any]]:
+        """对所有人检测跌倒；PoseBatch 直接使用整帧关键点数组，关键点形状不一致时逐人检测"""
+        if isinstance(persons, PoseBatch):
+            keypoints = persons.keypoints
+        else:
+            try:
+                keypoints = np.asarray([person['keypoints'] for person in persons], dtype=np.float64)
+            except ValueError:
+                keypoints = None
+        if keypoints is None or keypoints.ndim != 3 or keypoints.shape[1] != 17 or keypoints.shape[2] < 3:
+            return [self._detect_fall(person['keypoints'], image_shape) for person in persons]
+        try:
+            if len(keypoints) < FALL_BATCH_MIN_PERSONS and not self._fall_tracing():
+                return [self._detect_fall_rules(kps, image_shape) for kps in keypoints.tolist()]
+            return self._detect_fall_batch(keypoints, image_shape)
+        except Exception as e:
+            logger.exception("跌倒检测错误: %s", e)
+            return [{'is_fall': False, 'confidence': 0.0, 'description': f'检测失败: {str(e)}'}
+                    for _ in persons]
+    
     def _calculate_normal_confidence(self, persons: List[Dict]) -> float:
         """
         计算正常行为的置信度
@@ -594,13 +782,15 @@ class BehaviorDetector:
         total_keypoints = 0
         
         for person in persons:
-            keypoints = np.array(person['keypoints'])
+            keypoints = np.asarray(person['keypoints'])
             if keypoints.size == 0 or len(keypoints.shape) < 2:
                 continue
             
             # 提取置信度（第三列）
-            confidences = keypoints[:, 2] if keypoints.shape[1] >= 3 else []
-            valid_confidences = [c for c in confidences if c > 0]
+            if keypoints.shape[1] < 3:
+                continue
+            confidences = keypoints[:, 2]
+            valid_confidences = confidences[confidences > 0].tolist()
             
             if valid_confidences:
                 total_confidence += sum(valid_confidences)
@@ -614,14 +804,7 @@ class BehaviorDetector:
     
     def _detect_fall(self, keypoints, image_shape) -> Dict[str, Any]:
         """
-        检测跌倒行为
-        
-        策略：
-        1. 检查身体重心高度
-        2. 检查头部位置
-        3. 检查身体宽高比
-        4. 检查身体角度
-        5. 检查膝盖位置
+        检测单人跌倒行为，判定规则见 _detect_fall_batch
         
         参数:
             keypoints: 人体关键点 (17, 3) [x, y, confidence]
@@ -631,228 +814,302 @@ class BehaviorDetector:
             检测结果字典
         """
         try:
-            keypoints = np.array(keypoints)
+            keypoints = np.asarray(keypoints, dtype=np.float64)
             
             # 添加检查：确保keypoints不为空
             if keypoints.size == 0 or len(keypoints.shape) < 2:
-                print(f"跌倒检测: 关键点数据无效: shape={keypoints.shape}")
+                logger.debug("跌倒检测: 关键点数据无效: shape=%s", keypoints.shape)
                 return {
                     'is_fall': False,
                     'confidence': 0.0,
                     'description': '关键点数据不足'
                 }
             
-            # 提取关键点
-            nose = keypoints[self.KEYPOINT_DICT['nose']]
-            left_shoulder = keypoints[self.KEYPOINT_DICT['left_shoulder']]
-            right_shoulder = keypoints[self.KEYPOINT_DICT['right_shoulder']]
-            left_hip = keypoints[self.KEYPOINT_DICT['left_hip']]
-            right_hip = keypoints[self.KEYPOINT_DICT['right_hip']]
-            left_knee = keypoints[self.KEYPOINT_DICT['left_knee']]
-            right_knee = keypoints[self.KEYPOINT_DICT['right_knee']]
-            left_ankle = keypoints[self.KEYPOINT_DICT['left_ankle']]
-            right_ankle = keypoints[self.KEYPOINT_DICT['right_ankle']]
-            left_wrist = keypoints[self.KEYPOINT_DICT['left_wrist']]
-            right_wrist = keypoints[self.KEYPOINT_DICT['right_wrist']]
-            left_elbow = keypoints[self.KEYPOINT_DICT['left_elbow']]
-            right_elbow = keypoints[self.KEYPOINT_DICT['right_elbow']]
-            
-            # 检查关键点是否可见（置信度 > 0.3）
-            if nose[2] < 0.3 or (left_shoulder[2] < 0.3 and right_shoulder[2] < 0.3):
-                return {
-                    'is_fall': False,
-                    'confidence': 0.0,
-                    'description': '关键点不可见'
-                }
-            
-            # 计算肩膀和臀部中心点
-            shoulder_center = ((left_shoulder + right_shoulder) / 2) if (left_shoulder[2] > 0.3 and right_shoulder[2] > 0.3) else left_shoulder if left_shoulder[2] > 0.3 else right_shoulder
-            hip_center = ((left_hip + right_hip) / 2) if (left_hip[2] > 0.3 and right_hip[2] > 0.3) else left_hip if left_hip[2] > 0.3 else right_hip
-            
-            # 初始化检测结果
-            fall_detected = False
-            confidence = 0.0
-            detection_reason = ""
-            
-            # 检查是否是坐姿或运动姿态（避免误判）
-            is_sitting = False
-            is_exercise_pose = False
-            
-            # 坐姿判断：臀部在膝盖上方，且膝盖弯曲
-            if (left_hip[2] > 0.3 and left_knee[2] > 0.3 and left_ankle[2] > 0.3):
-                # 检查臀部是否明显在膝盖上方（y坐标较小）
-                if left_hip[1] < left_knee[1] - image_shape[0] * 0.1:
-                    # 检查膝盖弯曲（膝盖到脚踝的水平距离小）
-                    knee_ankle_horiz_dist = abs(left_knee[0] - left_ankle[0])
-                    if knee_ankle_horiz_dist < image_shape[1] * 0.1:
-                        is_sitting = True
-                        print(f"检测到坐姿（左侧）")
-            
-            if (right_hip[2] > 0.3 and right_knee[2] > 0.3 and right_ankle[2] > 0.3):
-                if right_hip[1] < right_knee[1] - image_shape[0] * 0.1:
-                    knee_ankle_horiz_dist = abs(right_knee[0] - right_ankle[0])
-                    if knee_ankle_horiz_dist < image_shape[1] * 0.1:
-                        is_sitting = True
-                        print(f"检测到坐姿（右侧）")
-            
-            # 运动姿态判断（俯卧撑、平板支撑等）
-            # 更严格的条件：双手都可见、在身体两侧支撑、身体相对水平
-            if (left_shoulder[2] > 0.3 and right_shoulder[2] > 0.3 and 
-                left_wrist[2] > 0.5 and right_wrist[2] > 0.5):
-                
-                # 计算身体中心点
-                body_center_x = (left_shoulder[0] + right_shoulder[0]) / 2
-                body_center_y = (left_shoulder[1] + right_shoulder[1]) / 2
-                
-                # 检查双手是否在身体两侧（左右分开）
-                left_wrist_left = left_wrist[0] < body_center_x - image_shape[1] * 0.1
-                right_wrist_right = right_wrist[0] > body_center_x + image_shape[1] * 0.1
-                
-                # 检查双手是否在肩膀下方支撑
-                hands_below_shoulder = (left_wrist[1] > body_center_y and 
-                                       right_wrist[1] > body_center_y)
-                
-                # 检查身体是否相对水平（肩膀和臀部高度差不大）
-                if hip_center[2] > 0.3:
-                    shoulder_hip_height = abs(shoulder_center[1] - hip_center[1])
-                    body_horizontal = shoulder_hip_height < image_shape[0] * 0.2
-                else:
-                    body_horizontal = False
-                
-                # 同时满足：双手分开支撑 + 在肩膀下方 + 身体水平
-                if left_wrist_left and right_wrist_right and hands_below_shoulder and body_horizontal:
-                    is_exercise_pose = True
-                    print(f"检测到运动姿态：双手支撑平板姿态")
-                else:
-                    print(f"支撑条件不满足: 左手在左={left_wrist_left}, 右手在右={right_wrist_right}, "
-                          f"手在下方={hands_below_shoulder}, 身体水平={body_horizontal}")
-            
-            # 方法1：计算人体重心高度
-            # 头部、肩部、臀部的平均高度
-            body_center_y = (nose[1] + shoulder_center[1] + hip_center[1]) / 3
-            body_height_ratio = body_center_y / image_shape[0]
-            
-            print(f"身体重心比例: {body_height_ratio:.3f} (图片高度: {image_shape[0]}px)")
-            
-            # 降低阈值，更容易检测到跌倒
-            # 如果是坐姿或运动姿态，不判定为跌倒
-            if not is_sitting and not is_exercise_pose and body_height_ratio > 0.5:
-                # 重心过低，可能是跌倒
-                confidence = min(0.95, (body_height_ratio - 0.5) / 0.4 * 0.6 + 0.35)
-                fall_detected = True
-                detection_reason = f"重心过低(ratio={body_height_ratio:.2f})"
-                print(f"✓ 检测到跌倒：{detection_reason}, confidence={confidence:.2f}")
-            
-            # 方法2：计算头部位置（如果头部可见）
-            if nose[2] > 0.3:
-                nose_y_ratio = nose[1] / image_shape[0]
-                print(f"头部位置比例: {nose_y_ratio:.3f}")
-                
-                # 降低阈值到0.55
-                if not is_sitting and not is_exercise_pose and nose_y_ratio > 0.55:
-                    head_confidence = min(0.92, (nose_y_ratio - 0.55) / 0.35 * 0.6 + 0.32)
-                    if head_confidence > confidence:
-                        confidence = head_confidence
-                        fall_detected = True
-                        detection_reason = f"头部过低(ratio={nose_y_ratio:.2f})"
-                    print(f"✓ 检测到跌倒：{detection_reason}, confidence={confidence:.2f}")
-            else:
-                print(f"头部不可见，跳过头部位置检测")
-            
-            # 方法3：计算人体宽高比（重要指标）
-            # 计算身体的垂直跨度和水平跨度
-            all_x = [kpt[0] for kpt in keypoints if kpt[2] > 0.3]
-            all_y = [kpt[1] for kpt in keypoints if kpt[2] > 0.3]
-            
-            if len(all_x) > 0 and len(all_y) > 0:
-                body_width = max(all_x) - min(all_x)
-                body_height = max(all_y) - min(all_y)
-                
-                # 计算宽高比
-                if body_height > 0:
-                    aspect_ratio = body_width / body_height
-                    print(f"身体宽高比: {aspect_ratio:.2f} (width={body_width:.1f}, height={body_height:.1f})")
-                    
-                    # 降低阈值到1.2，站立时宽高比约0.3-0.5，躺下时>1.0
-                    if not is_sitting and not is_exercise_pose and aspect_ratio > 1.2:
-                        aspect_confidence = min(0.90, (aspect_ratio - 1.2) / 1.2 * 0.5 + 0.40)
-                        if aspect_confidence > confidence:
-                            confidence = aspect_confidence
-                            fall_detected = True
-                            detection_reason = f"身体横向(ratio={aspect_ratio:.2f})"
-                        print(f"✓ 检测到跌倒：{detection_reason}, confidence={confidence:.2f}")
-            
-            # 方法4：计算人体角度（相对于垂直方向）
-            if hip_center[2] > 0.3:
-                dx = shoulder_center[0] - hip_center[0]
-                dy = shoulder_center[1] - hip_center[1]
-                
-                if abs(dy) > 1:  # 避免除零
-                    angle = abs(math.atan2(dx, dy) * 180 / math.pi)
-                    print(f"身体角度: {angle:.1f}°")
-                    
-                    # 降低角度阈值到45度（站立时接近0度，躺下时接近90度）
-                    if not is_sitting and not is_exercise_pose and angle > 45:
-                        angle_confidence = min(0.88, (angle - 45) / 45 * 0.6 + 0.28)
-                        if angle_confidence > confidence:
-                            confidence = angle_confidence
-                            fall_detected = True
-                            detection_reason = f"角度异常({angle:.1f}°)"
-                        print(f"✓ 检测到跌倒：{detection_reason}, confidence={confidence:.2f}")
-            
-            # 方法5：检查膝盖位置
-            # 如果膝盖在身体下部，且不是坐姿或运动姿态，可能是躺着
-            if not is_sitting and not is_exercise_pose and (left_knee[2] > 0.3 or right_knee[2] > 0.3):
-                knee_y = max(left_knee[1] if left_knee[2] > 0.3 else 0,
-                            right_knee[1] if right_knee[2] > 0.3 else 0)
-                knee_y_ratio = knee_y / image_shape[0]
-                
-                print(f"膝盖位置比例: {knee_y_ratio:.3f}")
-                
-                # 提高阈值到0.7，避免误判
-                if knee_y_ratio > 0.7:
-                    knee_confidence = min(0.86, (knee_y_ratio - 0.7) / 0.25 * 0.4 + 0.46)
-                    if knee_confidence > confidence:
-                        confidence = knee_confidence
-                        fall_detected = True
-                        detection_reason = f"膝盖过低(ratio={knee_y_ratio:.2f})"
-                    print(f"✓ 检测到跌倒：{detection_reason}, confidence={confidence:.2f}")
-            
-            if fall_detected:
-                print("=" * 40)
-                print(f"最终判定：跌倒检测成功！")
-                print(f"原因：{detection_reason}")
-                print(f"置信度：{confidence:.2f}")
-                print("=" * 40)
-            else:
-                print("未检测到跌倒")
-            
-            return {
-                'is_fall': fall_detected,
-                'confidence': float(confidence),
-                'description': f'检测到跌倒行为: {detection_reason}' if fall_detected else '未检测到跌倒'
-            }
+            if keypoints.ndim == 2 and keypoints.shape[0] == 17 and keypoints.shape[1] >= 3 \
+                    and not self._fall_tracing():
+                return self._detect_fall_rules(keypoints.tolist(), image_shape)
+            return self._detect_fall_batch(keypoints[np.newaxis], image_shape)[0]
             
         except Exception as e:
-            print(f"跌倒检测错误: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("跌倒检测错误: %s", e)
             return {
                 'is_fall': False,
                 'confidence': 0.0,
                 'description': f'检测失败: {str(e)}'
             }
     
+    def _fall_tracing(self) -> bool:
+        """是否需要逐人整理跌倒判定指标（开启追踪或 DEBUG 日志时只走批量检测）"""
+        return self.trace.enabled or logger.isEnabledFor(logging.DEBUG)
+    
+    def _detect_fall_rules(self, keypoints: List[List[float]], image_shape) -> Dict[str, Any]:
+        """
+        单人跌倒检测（逐条判断），规则与计算顺序与 _detect_fall_batch 一致；
+        人数少时比批量检测的数组开销更小
+        
+        参数:
+            keypoints: 人体关键点列表 17 x [x, y, confidence]
+            image_shape: 图片尺寸 (height, width, channels)
+        
+        返回:
+            检测结果字典
+        """
+        img_h, img_w = image_shape[0], image_shape[1]
+        K = self.KEYPOINT_DICT
+        nose = keypoints[K['nose']]
+        left_shoulder, right_shoulder = keypoints[K['left_shoulder']], keypoints[K['right_shoulder']]
+        left_hip, right_hip = keypoints[K['left_hip']], keypoints[K['right_hip']]
+        left_knee, right_knee = keypoints[K['left_knee']], keypoints[K['right_knee']]
+        left_ankle, right_ankle = keypoints[K['left_ankle']], keypoints[K['right_ankle']]
+        left_wrist, right_wrist = keypoints[K['left_wrist']], keypoints[K['right_wrist']]
+        
+        if nose[2] < 0.3 or (left_shoulder[2] < 0.3 and right_shoulder[2] < 0.3):
+            return {'is_fall': False, 'confidence': 0.0, 'description': '关键点不可见'}
+        
+        def center(left, right):
+            if left[2] > 0.3 and right[2] > 0.3:
+                return [(left[0] + right[0]) / 2, (left[1] + right[1]) / 2, (left[2] + right[2]) / 2]
+            return left if left[2] > 0.3 else right
+        
+        shoulder_center = center(left_shoulder, right_shoulder)
+        hip_center = center(left_hip, right_hip)
+        
+        # 坐姿或运动姿态不判定为跌倒
+        for hip, knee, ankle in ((left_hip, left_knee, left_ankle), (right_hip, right_knee, right_ankle)):
+            if (hip[2] > 0.3 and knee[2] > 0.3 and ankle[2] > 0.3 and hip[1] < knee[1] - img_h * 0.1
+                    and abs(knee[0] - ankle[0]) < img_w * 0.1):
+                return {'is_fall': False, 'confidence': 0.0, 'description': '未检测到跌倒'}
+        body_center_x = (left_shoulder[0] + right_shoulder[0]) / 2
+        body_center_y = (left_shoulder[1] + right_shoulder[1]) / 2
+        if (left_shoulder[2] > 0.3 and right_shoulder[2] > 0.3 and left_wrist[2] > 0.5 and right_wrist[2] > 0.5
+                and left_wrist[0] < body_center_x - img_w * 0.1 and right_wrist[0] > body_center_x + img_w * 0.1
+                and left_wrist[1] > body_center_y and right_wrist[1] > body_center_y
+                and hip_center[2] > 0.3 and abs(shoulder_center[1] - hip_center[1]) < img_h * 0.2):
+            return {'is_fall': False, 'confidence': 0.0, 'description': '未检测到跌倒'}
+        
+        confidence = 0.0
+        detection_reason = None
+        
+        # 方法1：人体重心高度
+        body_height_ratio = (nose[1] + shoulder_center[1] + hip_center[1]) / 3 / img_h
+        if body_height_ratio > 0.5:
+            confidence = min(0.95, (body_height_ratio - 0.5) / 0.4 * 0.6 + 0.35)
+            detection_reason = f"重心过低(ratio={body_height_ratio:.2f})"
+        
+        # 方法2：头部位置
+        nose_y_ratio = nose[1] / img_h
+        if nose[2] > 0.3 and nose_y_ratio > 0.55:
+            head_confidence = min(0.92, (nose_y_ratio - 0.55) / 0.35 * 0.6 + 0.32)
+            if head_confidence > confidence:
+                confidence = head_confidence
+                detection_reason = f"头部过低(ratio={nose_y_ratio:.2f})"
+        
+        # 方法3：人体宽高比
+        visible = [kpt for kpt in keypoints if kpt[2] > 0.3]
+        if visible:
+            body_width = max(kpt[0] for kpt in visible) - min(kpt[0] for kpt in visible)
+            body_height = max(kpt[1] for kpt in visible) - min(kpt[1] for kpt in visible)
+            if body_height > 0:
+                aspect_ratio = body_width / body_height
+                if aspect_ratio > 1.2:
+                    aspect_confidence = min(0.90, (aspect_ratio - 1.2) / 1.2 * 0.5 + 0.40)
+                    if aspect_confidence > confidence:
+                        confidence = aspect_confidence
+                        detection_reason = f"身体横向(ratio={aspect_ratio:.2f})"
+        
+        # 方法4：人体角度（相对于垂直方向）
+        dx = shoulder_center[0] - hip_center[0]
+        dy = shoulder_center[1] - hip_center[1]
+        if hip_center[2] > 0.3 and abs(dy) > 1:
+            angle = abs(math.atan2(dx, dy) * 180 / math.pi)
+            if angle > 45:
+                angle_confidence = min(0.88, (angle - 45) / 45 * 0.6 + 0.28)
+                if angle_confidence > confidence:
+                    confidence = angle_confidence
+                    detection_reason = f"角度异常({angle:.1f}°)"
+        
+        # 方法5：膝盖位置
+        if left_knee[2] > 0.3 or right_knee[2] > 0.3:
+            knee_y = max(left_knee[1] if left_knee[2] > 0.3 else 0, right_knee[1] if right_knee[2] > 0.3 else 0)
+            knee_y_ratio = knee_y / img_h
+            if knee_y_ratio > 0.7:
+                knee_confidence = min(0.86, (knee_y_ratio - 0.7) / 0.25 * 0.4 + 0.46)
+                if knee_confidence > confidence:
+                    confidence = knee_confidence
+                    detection_reason = f"膝盖过低(ratio={knee_y_ratio:.2f})"
+        
+        if detection_reason is None:
+            return {'is_fall': False, 'confidence': 0.0, 'description': '未检测到跌倒'}
+        return {'is_fall': True, 'confidence': float(confidence), 'description': f'检测到跌倒行为: {detection_reason}'}
+    
+    def _detect_fall_batch(self, keypoints: np.ndarray, image_shape) -> List[Dict[str, Any]]:
+        """
+        对所有人同时检测跌倒行为（向量化）
+        
+        策略：
+        1. 检查身体重心高度
+        2. 检查头部位置
+        3. 检查身体宽高比
+        4. 检查身体角度
+        5. 检查膝盖位置
+        坐姿或运动姿态（俯卧撑、平板支撑等）不判定为跌倒
+        
+        参数:
+            keypoints: 所有人的关键点 (N, 17, 3) [x, y, confidence]
+            image_shape: 图片尺寸 (height, width, channels)
+        
+        返回:
+            每个人的检测结果字典列表
+        """
+        kps = np.asarray(keypoints, dtype=np.float64)
+        if kps.shape[0] == 0:
+            return []
+        img_h, img_w = image_shape[0], image_shape[1]
+        K = self.KEYPOINT_DICT
+        
+        nose = kps[:, K['nose']]
+        left_shoulder, right_shoulder = kps[:, K['left_shoulder']], kps[:, K['right_shoulder']]
+        left_hip, right_hip = kps[:, K['left_hip']], kps[:, K['right_hip']]
+        left_knee, right_knee = kps[:, K['left_knee']], kps[:, K['right_knee']]
+        left_ankle, right_ankle = kps[:, K['left_ankle']], kps[:, K['right_ankle']]
+        left_wrist, right_wrist = kps[:, K['left_wrist']], kps[:, K['right_wrist']]
+        
+        # 检查关键点是否可见（置信度 > 0.3）
+        visible = ~((nose[:, 2] < 0.3) | ((left_shoulder[:, 2] < 0.3) & (right_shoulder[:, 2] < 0.3)))
+        
+        # 计算肩膀和臀部中心点：两侧都可见取中点，否则取可见的一侧
+        def center(left, right):
+            both = (left[:, 2] > 0.3) & (right[:, 2] > 0.3)
+            one = np.where((left[:, 2] > 0.3)[:, None], left, right)
+            return np.where(both[:, None], (left + right) / 2, one)
+        
+        shoulder_center = center(left_shoulder, right_shoulder)
+        hip_center = center(left_hip, right_hip)
+        
+        # 坐姿判断：臀部在膝盖上方，且膝盖弯曲（膝盖到脚踝的水平距离小）
+        def sitting(hip, knee, ankle):
+            return ((hip[:, 2] > 0.3) & (knee[:, 2] > 0.3) & (ankle[:, 2] > 0.3)
+                    & (hip[:, 1] < knee[:, 1] - img_h * 0.1)
+                    & (np.abs(knee[:, 0] - ankle[:, 0]) < img_w * 0.1))
+        
+        is_sitting = sitting(left_hip, left_knee, left_ankle) | sitting(right_hip, right_knee, right_ankle)
+        
+        # 运动姿态判断：双手分开支撑 + 在肩膀下方 + 身体水平
+        body_center_x = (left_shoulder[:, 0] + right_shoulder[:, 0]) / 2
+        body_center_y = (left_shoulder[:, 1] + right_shoulder[:, 1]) / 2
+        is_exercise_pose = ((left_shoulder[:, 2] > 0.3) & (right_shoulder[:, 2] > 0.3)
+                            & (left_wrist[:, 2] > 0.5) & (right_wrist[:, 2] > 0.5)
+                            & (left_wrist[:, 0] < body_center_x - img_w * 0.1)
+                            & (right_wrist[:, 0] > body_center_x + img_w * 0.1)
+                            & (left_wrist[:, 1] > body_center_y) & (right_wrist[:, 1] > body_center_y)
+                            & (hip_center[:, 2] > 0.3)
+                            & (np.abs(shoulder_center[:, 1] - hip_center[:, 1]) < img_h * 0.2))
+        
+        candidate = visible & ~is_sitting & ~is_exercise_pose
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 方法1：人体重心高度（头部、肩部、臀部的平均高度）
+            body_height_ratio = (nose[:, 1] + shoulder_center[:, 1] + hip_center[:, 1]) / 3 / img_h
+            
+            # 方法2：头部位置
+            nose_y_ratio = nose[:, 1] / img_h
+            
+            # 方法3：人体宽高比（站立时约0.3-0.5，躺下时>1.0）
+            valid_kps = kps[:, :, 2] > 0.3
+            xs = kps[:, :, 0]
+            ys = kps[:, :, 1]
+            body_width = np.where(valid_kps, xs, -np.inf).max(axis=1) - np.where(valid_kps, xs, np.inf).min(axis=1)
+            body_height = np.where(valid_kps, ys, -np.inf).max(axis=1) - np.where(valid_kps, ys, np.inf).min(axis=1)
+            has_extent = valid_kps.any(axis=1) & (body_height > 0)
+            aspect_ratio = np.where(has_extent, body_width / np.where(has_extent, body_height, 1.0), 0.0)
+            
+            # 方法4：人体角度（相对于垂直方向，站立时接近0度，躺下时接近90度）
+            dx = shoulder_center[:, 0] - hip_center[:, 0]
+            dy = shoulder_center[:, 1] - hip_center[:, 1]
+            # 与 math.atan2 逐位一致（np.arctan2 存在末位误差）
+            angle = np.abs(np.fromiter(map(math.atan2, dx, dy), dtype=np.float64, count=len(dx)) * 180 / math.pi)
+            
+            # 方法5：膝盖位置
+            left_knee_visible = left_knee[:, 2] > 0.3
+            right_knee_visible = right_knee[:, 2] > 0.3
+            knee_y = np.maximum(np.where(left_knee_visible, left_knee[:, 1], 0),
+                                np.where(right_knee_visible, right_knee[:, 1], 0))
+            knee_y_ratio = knee_y / img_h
+        
+        # 各方法的触发条件与置信度，按原顺序依次取更高的置信度
+        methods = [
+            (candidate & (body_height_ratio > 0.5),
+             np.minimum(0.95, (body_height_ratio - 0.5) / 0.4 * 0.6 + 0.35)),
+            (candidate & (nose[:, 2] > 0.3) & (nose_y_ratio > 0.55),
+             np.minimum(0.92, (nose_y_ratio - 0.55) / 0.35 * 0.6 + 0.32)),
+            (candidate & has_extent & (aspect_ratio > 1.2),
+             np.minimum(0.90, (aspect_ratio - 1.2) / 1.2 * 0.5 + 0.40)),
+            (candidate & (hip_center[:, 2] > 0.3) & (np.abs(dy) > 1) & (angle > 45),
+             np.minimum(0.88, (angle - 45) / 45 * 0.6 + 0.28)),
+            (candidate & (left_knee_visible | right_knee_visible) & (knee_y_ratio > 0.7),
+             np.minimum(0.86, (knee_y_ratio - 0.7) / 0.25 * 0.4 + 0.46)),
+        ]
+        
+        confidence = np.zeros(len(kps))
+        reason = np.full(len(kps), -1)
+        for index, (triggered, method_confidence) in enumerate(methods):
+            # 方法1直接赋值，其余方法仅在置信度更高时覆盖
+            update = triggered & ((method_confidence > confidence) if index > 0 else True)
+            confidence = np.where(update, method_confidence, confidence)
+            reason = np.where(update, index, reason)
+        
+        reason_formats = [
+            lambda i: f"重心过低(ratio={body_height_ratio[i]:.2f})",
+            lambda i: f"头部过低(ratio={nose_y_ratio[i]:.2f})",
+            lambda i: f"身体横向(ratio={aspect_ratio[i]:.2f})",
+            lambda i: f"角度异常({angle[i]:.1f}°)",
+            lambda i: f"膝盖过低(ratio={knee_y_ratio[i]:.2f})",
+        ]
+        
+        # 判定指标只在开启追踪或 DEBUG 日志时逐人整理
+        if self.trace.enabled or logger.isEnabledFor(logging.DEBUG):
+            for i in range(len(kps)):
+                metrics = {
+                    'person': i,
+                    'visible': bool(visible[i]),
+                    'sitting': bool(is_sitting[i]),
+                    'exercise_pose': bool(is_exercise_pose[i]),
+                    'body_height_ratio': round(float(body_height_ratio[i]), 4),
+                    'nose_y_ratio': round(float(nose_y_ratio[i]), 4),
+                    'aspect_ratio': round(float(aspect_ratio[i]), 4),
+                    'angle': round(float(angle[i]), 2),
+                    'knee_y_ratio': round(float(knee_y_ratio[i]), 4),
+                    'confidence': round(float(confidence[i]), 4),
+                    'method': int(reason[i]) + 1 if visible[i] and reason[i] >= 0 else None,
+                }
+                self.trace.record('fall', **metrics)
+                logger.debug("跌倒判定 %s", metrics)
+        
+        results = []
+        for i in range(len(kps)):
+            if not visible[i]:
+                results.append({'is_fall': False, 'confidence': 0.0, 'description': '关键点不可见'})
+            elif reason[i] >= 0:
+                detection_reason = reason_formats[reason[i]](i)
+                results.append({
+                    'is_fall': True,
+                    'confidence': float(confidence[i]),
+                    'description': f'检测到跌倒行为: {detection_reason}'
+                })
+            else:
+                results.append({'is_fall': False, 'confidence': 0.0, 'description': '未检测到跌倒'})
+        return results
+    
     def _detect_abnormal_pose(self, keypoints, image_shape) -> Dict[str, Any]:
         """
         检测异常姿态
         """
         try:
-            keypoints = np.array(keypoints)
+            keypoints = np.asarray(keypoints)
             
             # 添加检查：确保keypoints不为空
             if keypoints.size == 0 or len(keypoints.shape) < 2:
-                print(f"异常姿态检测: 关键点数据无效: shape={keypoints.shape}")
+                logger.debug("异常姿态检测: 关键点数据无效: shape=%s", keypoints.shape)
                 return {
                     'is_abnormal': False,
                     'confidence': 0.0,
@@ -868,7 +1125,7 @@ class BehaviorDetector:
                 'description': '姿态正常'
             }
         except Exception as e:
-            print(f"异常姿态检测错误: {e}")
+            logger.exception("异常姿态检测错误: %s", e)
             return {
                 'is_abnormal': False,
                 'confidence': 0.0,
@@ -884,6 +1141,9 @@ class BehaviorDetector:
         2. 身体有交叠
         3. 手臂有挥动动作（手腕位置异常）
         4. 身体姿态不稳定
+        
+        先用网格索引筛选中心点距离在阈值内的候选对，再按 (i, j) 字典序分块批量计算各条件，
+        结果与逐对遍历一致（返回第一对打架）
         """
         try:
             if len(persons) < 2:
@@ -893,95 +1153,72 @@ class BehaviorDetector:
                     'description': '人数不足'
                 }
             
-            # 打架检测：检查每对人
-            for i in range(len(persons)):
-                for j in range(i + 1, len(persons)):
-                    person1_kps = np.array(persons[i]['keypoints'])
-                    person2_kps = np.array(persons[j]['keypoints'])
-                    
-                    # 添加检查：确保关键点数组不为空
-                    if person1_kps.size == 0 or len(person1_kps.shape) < 2:
-                        continue
-                    if person2_kps.size == 0 or len(person2_kps.shape) < 2:
-                        continue
-                    
-                    # 提取有效关键点
-                    p1_valid_kps = person1_kps[person1_kps[:, 2] > 0.3][:, :2]
-                    p2_valid_kps = person2_kps[person2_kps[:, 2] > 0.3][:, :2]
-                    
-                    if len(p1_valid_kps) == 0 or len(p2_valid_kps) == 0:
-                        continue
-                    
-                    # 计算两人中心点距离
-                    person1_center = np.mean(p1_valid_kps, axis=0)
-                    person2_center = np.mean(p2_valid_kps, axis=0)
-                    
-                    center_distance = np.linalg.norm(person1_center - person2_center)
-                    distance_ratio = center_distance / image_shape[1]
-                    
-                    print(f"两人距离: {center_distance:.1f}px, 比例: {distance_ratio:.3f}")
-                    
-                    # 条件1：两人距离很近（小于图片宽度的25%）
-                    if distance_ratio > 0.25:
-                        continue
-                    
-                    # 条件2：检查手臂位置（是否有挥动或推搡动作）
-                    # 提取手腕关键点
-                    p1_left_wrist = person1_kps[self.KEYPOINT_DICT['left_wrist']]
-                    p1_right_wrist = person1_kps[self.KEYPOINT_DICT['right_wrist']]
-                    p2_left_wrist = person2_kps[self.KEYPOINT_DICT['left_wrist']]
-                    p2_right_wrist = person2_kps[self.KEYPOINT_DICT['right_wrist']]
-                    
-                    # 检查是否有手腕朝向对方（可能是推搡或击打）
-                    arms_engaged = False
-                    if p1_left_wrist[2] > 0.3 and p1_right_wrist[2] > 0.3:
-                        # 检查手腕是否在肩膀前方且靠近对方
-                        p1_shoulder_center = (person1_kps[self.KEYPOINT_DICT['left_shoulder']][:2] + 
-                                            person1_kps[self.KEYPOINT_DICT['right_shoulder']][:2]) / 2
-                        
-                        # 检查任一手腕是否在向对方方向移动
-                        wrist_to_p2_left = np.linalg.norm(p1_left_wrist[:2] - person2_center)
-                        wrist_to_p2_right = np.linalg.norm(p1_right_wrist[:2] - person2_center)
-                        shoulder_to_p2 = np.linalg.norm(p1_shoulder_center - person2_center)
-                        
-                        if wrist_to_p2_left < shoulder_to_p2 or wrist_to_p2_right < shoulder_to_p2:
-                            arms_engaged = True
-                            print(f"检测到person1手臂朝向person2")
-                    
-                    # 条件3：检查两人是否有身体接触（关键点重叠）
-                    has_overlap = False
-                    for kp1 in p1_valid_kps:
-                        for kp2 in p2_valid_kps:
-                            kp_distance = np.linalg.norm(kp1 - kp2)
-                            if kp_distance < image_shape[1] * 0.05:  # 关键点距离很近
-                                has_overlap = True
-                                break
-                        if has_overlap:
-                            break
-                    
-                    # 综合判断
-                    fight_confidence = 0.0
-                    if distance_ratio < 0.15:  # 非常近
-                        fight_confidence += 0.4
-                    elif distance_ratio < 0.25:  # 很近
-                        fight_confidence += 0.2
-                    
-                    if arms_engaged:
-                        fight_confidence += 0.3
-                    
-                    if has_overlap:
-                        fight_confidence += 0.3
-                        print(f"检测到身体接触")
-                    
-                    print(f"打架置信度: {fight_confidence:.2f}")
-                    
-                    # 如果置信度超过0.6，判定为打架
-                    if fight_confidence >= 0.6:
-                        return {
-                            'is_fight': True,
-                            'confidence': min(0.95, fight_confidence),
-                            'description': f'检测到打架行为（距离={distance_ratio:.2f}, 置信度={fight_confidence:.2f}）'
+            # 每人只计算一次：关键点数组、中心点；没有有效关键点的人不参与判断
+            indices, person_kps, centers = [], [], []
+            for i, person in enumerate(persons):
+                kps = np.asarray(person['keypoints'], dtype=np.float64)
+                # 添加检查：确保关键点数组不为空
+                if kps.size == 0 or len(kps.shape) < 2:
+                    continue
+                valid = kps[kps[:, 2] > 0.3][:, :2]
+                if len(valid) == 0:
+                    continue
+                indices.append(i)
+                person_kps.append(kps)
+                centers.append(np.mean(valid, axis=0))
+            if len(indices) < 2:
+                return {'is_fight': False, 'confidence': 0.0, 'description': '未检测到打架'}
+            indices = np.array(indices)
+            person_kps = np.stack(person_kps)
+            centers = np.stack(centers)
+            
+            width = image_shape[1]
+            first, second = self._fight_candidate_pairs(centers, width * 0.25)
+            # 条件1：两人距离很近（小于图片宽度的25%）
+            distance_ratio = np.linalg.norm(centers[first] - centers[second], axis=1) / width
+            close = np.flatnonzero(distance_ratio <= 0.25)
+            if len(close) == 0:
+                return {'is_fight': False, 'confidence': 0.0, 'description': '未检测到打架'}
+            first, second, distance_ratio = first[close], second[close], distance_ratio[close]
+            # 有效关键点的外接框，用于跳过不可能有身体接触的人对
+            valid = person_kps[:, :, 2] > 0.3
+            xy = person_kps[:, :, :2]
+            box_min = np.where(valid[:, :, np.newaxis], xy, np.inf).min(axis=1)
+            box_max = np.where(valid[:, :, np.newaxis], xy, -np.inf).max(axis=1)
+            
+            # 按 (i, j) 顺序分块计算，块逐渐增大：找到第一对打架即返回，与逐对遍历一样可提前结束
+            start, size = 0, 16
+            while start < len(first):
+                pairs = slice(start, start + size)
+                arms_engaged, has_overlap, fight_confidence = self._fight_pair_metrics(
+                    person_kps, valid, centers, box_min, box_max, first[pairs], second[pairs],
+                    distance_ratio[pairs], width)
+                fights = np.flatnonzero(fight_confidence >= 0.6)
+                evaluated = int(fights[0]) + 1 if len(fights) else len(fight_confidence)
+                if self.trace.enabled or logger.isEnabledFor(logging.DEBUG):
+                    for k in range(evaluated):
+                        metrics = {
+                            'pair': [int(indices[first[start + k]]), int(indices[second[start + k]])],
+                            'distance_ratio': round(float(distance_ratio[start + k]), 4),
+                            'arms_engaged': bool(arms_engaged[k]),
+                            'body_contact': bool(has_overlap[k]),
+                            'confidence': round(float(fight_confidence[k]), 2),
                         }
+                        self.trace.record('fight', **metrics)
+                        logger.debug("打架判定 %s", metrics)
+                
+                # 如果置信度超过0.6，判定为打架
+                if len(fights):
+                    k = int(fights[0])
+                    confidence = float(fight_confidence[k])
+                    return {
+                        'is_fight': True,
+                        'confidence': min(0.95, confidence),
+                        'description': f'检测到打架行为（距离={distance_ratio[start + k]:.2f}, 置信度={confidence:.2f}）',
+                        'persons': (int(indices[first[start + k]]), int(indices[second[start + k]]))
+                    }
+                start += size
+                size = min(size * 2, 1024)
             
             return {
                 'is_fight': False,
@@ -989,12 +1226,105 @@ class BehaviorDetector:
                 'description': '未检测到打架'
             }
         except Exception as e:
-            print(f"打架检测错误: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("打架检测错误: %s", e)
             return {
                 'is_fight': False,
                 'confidence': 0.0,
                 'description': f'检测失败: {str(e)}'
             }
+    
+    def _fight_pair_metrics(self, person_kps: np.ndarray, valid: np.ndarray, centers: np.ndarray,
+                            box_min: np.ndarray, box_max: np.ndarray, first: np.ndarray, second: np.ndarray,
+                            distance_ratio: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        一组距离已满足条件（距离比例不超过 0.25）的人对 (first[k], second[k]) 的打架判定条件
+        
+        返回:
+            (手臂朝向对方, 身体接触, 打架置信度)
+        """
+        kps1 = person_kps[first]
+        center2 = centers[second]
+        
+        # 条件2：检查手臂位置（任一手腕比肩膀中心更靠近对方，可能是推搡或击打）
+        left_wrist = kps1[:, self.KEYPOINT_DICT['left_wrist']]
+        right_wrist = kps1[:, self.KEYPOINT_DICT['right_wrist']]
+        shoulder_center = (kps1[:, self.KEYPOINT_DICT['left_shoulder'], :2] +
+                           kps1[:, self.KEYPOINT_DICT['right_shoulder'], :2]) / 2
+        shoulder_to_p2 = np.linalg.norm(shoulder_center - center2, axis=1)
+        arms_engaged = ((left_wrist[:, 2] > 0.3) & (right_wrist[:, 2] > 0.3) &
+                        ((np.linalg.norm(left_wrist[:, :2] - center2, axis=1) < shoulder_to_p2) |
+                         (np.linalg.norm(right_wrist[:, :2] - center2, axis=1) < shoulder_to_p2)))
+        
+        # 条件3：检查两人是否有身体接触（任意两个有效关键点距离很近）；
+        # 有效关键点外接框的间隔不小于接触距离时不可能接触，不再逐点计算
+        contact_distance = width * 0.05
+        gap = np.maximum(box_min[first] - box_max[second], box_min[second] - box_max[first])
+        possible = np.flatnonzero((gap < contact_distance).all(axis=1))
+        has_overlap = np.zeros(len(first), dtype=bool)
+        if len(possible):
+            a, b = first[possible], second[possible]
+            pairwise = person_kps[a][:, :, np.newaxis, :2] - person_kps[b][:, np.newaxis, :, :2]
+            near = np.linalg.norm(pairwise, axis=3) < contact_distance
+            near &= valid[a][:, :, np.newaxis] & valid[b][:, np.newaxis, :]
+            has_overlap[possible] = near.any(axis=(1, 2))
+        
+        # 综合判断（与逐对计算的加法顺序一致）
+        fight_confidence = np.where(distance_ratio < 0.15, 0.4, np.where(distance_ratio < 0.25, 0.2, 0.0))
+        fight_confidence = fight_confidence + np.where(arms_engaged, 0.3, 0.0)
+        fight_confidence = fight_confidence + np.where(has_overlap, 0.3, 0.0)
+        return arms_engaged, has_overlap, fight_confidence
+    
+    @staticmethod
+    def _fight_candidate_pairs(centers: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        网格索引筛选候选人对：格子边长为距离阈值，只比较相邻格子内的人，再按中心点距离剔除超出阈值的对
+        
+        参数:
+            centers: 每人的中心点 (M, 2)
+            radius: 中心点距离阈值（像素）
+        
+        返回:
+            候选对的两组序号 (first, second)，first < second，按 (first, second) 字典序排列；
+            阈值略放宽（人数少于 8 时不筛选），精确判断由调用方完成
+        """
+        count = len(centers)
+        if count < 2:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        if count < 8:
+            # 人数少时建网格不划算，直接返回全部人对（距离由调用方判断）
+            return _SMALL_PAIRS[count]
+        # 格子略大于阈值，避免浮点误差漏掉恰好在阈值上的对
+        cell_size = max(radius, 1e-6) * (1 + 1e-6)
+        cells = np.floor(centers / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+        span = int(cells[:, 1].max()) + 2
+        keys = cells[:, 0] * span + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        
+        # 对每个相邻格子，用有序格子键二分查找其中的人
+        first_parts, second_parts = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbor = keys + dx * span + dy
+                lo = np.searchsorted(sorted_keys, neighbor, side='left')
+                hi = np.searchsorted(sorted_keys, neighbor, side='right')
+                counts = hi - lo
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                owner = np.repeat(np.arange(count), counts)
+                offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                first_parts.append(owner)
+                second_parts.append(order[np.repeat(lo, counts) + offset])
+        first = np.concatenate(first_parts)
+        second = np.concatenate(second_parts)
+        keep = first < second
+        first, second = first[keep], second[keep]
+        
+        # 相邻格子中的人对有相当一部分超出阈值，按中心点距离剔除
+        within = np.linalg.norm(centers[first] - centers[second], axis=1) <= cell_size
+        first, second = first[within], second[within]
+        order = np.lexsort((second, first))
+        return first[order], second[order]
 
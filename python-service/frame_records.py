@@ -0,0 +1,130 @@
+"""
+视频逐帧检测记录
+检测过程中逐帧追加定长二进制记录到磁盘（不在内存中累积），
+结束时整理为按列存储的 NPZ 文件，供需要逐帧数据的客户端下载；
+带跟踪的结果另记录每帧每人的跟踪ID与检测框（跳过推理的帧为按运动估计外推的位置）
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tracker import person_boxes
+
+# 逐帧记录格式（每帧 21 字节）
+FRAME_RECORD_DTYPE = np.dtype([
+    ('frame_number', '<i4'),
+    ('timestamp', '<f8'),
+    ('person_count', '<u2'),
+    ('has_abnormal', '?'),
+    ('behavior', 'u1'),  # behavior_types 中的下标，0 表示无异常
+    ('confidence', '<f4'),
+    ('inferred', '?'),  # 该帧是否实际执行了推理（否则沿用上一次结果）
+])
+
+# 逐人跟踪记录格式（每帧每人一条，24 字节），NPZ 中列名加 track_ 前缀
+TRACK_RECORD_DTYPE = np.dtype([
+    ('frame_number', '<i4'),
+    ('id', '<i4'),  # 跟踪ID
+    ('box', '<f4', (4,)),  # 检测框 [x1, y1, x2, y2]（原图坐标）
+])
+TRACK_RECORD_COLUMNS = ['track_' + name for name in TRACK_RECORD_DTYPE.names]
+
+
+class FrameRecordWriter:
+    """逐帧记录写入器：缓冲满后追加写入临时文件，close() 时生成 NPZ"""
+
+    def __init__(self, path: str, buffer_size: int = 1024):
+        """
+        参数:
+            path: 输出 NPZ 文件路径
+            buffer_size: 内存缓冲的记录条数
+        """
+        self.path = str(path)
+        self._part_path = self.path + ".part"
+        self._track_part_path = self.path + ".tracks.part"
+        self._file = open(self._part_path, "wb")
+        self._track_file = open(self._track_part_path, "wb")
+        self._buffer = np.zeros(max(1, buffer_size), dtype=FRAME_RECORD_DTYPE)
+        self._buffered = 0
+        self.count = 0
+        self.track_count = 0
+        self.behavior_types: List[Optional[str]] = [None]
+        self._behavior_codes: Dict[Optional[str], int] = {None: 0}
+
+    def _behavior_code(self, behavior_type: Optional[str]) -> int:
+        code = self._behavior_codes.get(behavior_type)
+        if code is None:
+            code = len(self.behavior_types)
+            self.behavior_types.append(behavior_type)
+            self._behavior_codes[behavior_type] = code
+        return code
+
+    def append(self, frame_number: int, timestamp: float, frame_result: Dict[str, Any], inferred: bool):
+        """追加一帧记录"""
+        record = self._buffer[self._buffered]
+        record['frame_number'] = frame_number
+        record['timestamp'] = timestamp
+        record['person_count'] = frame_result['person_count']
+        record['has_abnormal'] = frame_result['has_abnormal']
+        record['behavior'] = self._behavior_code(frame_result['behavior_type'] if frame_result['has_abnormal'] else None)
+        record['confidence'] = frame_result['confidence']
+        record['inferred'] = inferred
+        self._buffered += 1
+        self.count += 1
+        if self._buffered == len(self._buffer):
+            self._flush()
+
+        # 带跟踪ID的人员逐人写入（每帧人数不多，直接追加到临时文件）
+        persons = frame_result.get('persons')
+        if persons is not None and persons.track_ids is not None and len(persons):
+            tracks = np.zeros(len(persons), dtype=TRACK_RECORD_DTYPE)
+            tracks['frame_number'] = frame_number
+            tracks['id'] = persons.track_ids
+            tracks['box'] = person_boxes(persons)
+            tracks.tofile(self._track_file)
+            self.track_count += len(tracks)
+
+    def _flush(self):
+        if self._buffered:
+            self._buffer[:self._buffered].tofile(self._file)
+            self._buffered = 0
+
+    def close(self) -> str:
+        """写完剩余记录并整理为按列存储的 NPZ，返回文件路径"""
+        self._flush()
+        self._file.close()
+        self._track_file.close()
+        records = np.fromfile(self._part_path, dtype=FRAME_RECORD_DTYPE)
+        tracks = np.fromfile(self._track_part_path, dtype=TRACK_RECORD_DTYPE)
+        behavior_types = np.array(['' if t is None else t for t in self.behavior_types])
+        np.savez_compressed(
+            self.path,
+            behavior_types=behavior_types,
+            **{name: records[name] for name in FRAME_RECORD_DTYPE.names},
+            **{'track_' + name: tracks[name] for name in TRACK_RECORD_DTYPE.names}
+        )
+        os.remove(self._part_path)
+        os.remove(self._track_part_path)
+        return self.path
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        for file in (self._file, self._track_file):
+            if not file.closed:
+                file.close()
+        for part_path in (self._part_path, self._track_part_path):
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+
+def load_frame_records(path: str) -> Dict[str, np.ndarray]:
+    """
+    读取逐帧记录
+
+    返回:
+        {列名: 数组}，另含 behavior_types（behavior 列的取值对应的行为类型，下标 0 为空）；
+        track_ 前缀的列为逐人跟踪记录（每帧每人一行，按 track_frame_number 与逐帧记录对应）
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
@@ -0,0 +1,200 @@
+"""
+跨流推理调度器
+多路摄像头提交的帧在截止时间内合并为一个批次推理，再将分析结果分发回各自的流
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import RTSP_BATCH_SIZE, RTSP_BATCH_MAX_LATENCY_MS
+from detector import BehaviorDetector
+from tracker import PersonTracker
+from letterbox import LetterboxTransform
+
+logger = logging.getLogger(__name__)
+
+# 最近多少秒内提交过帧的流视为活跃流
+STREAM_ACTIVE_WINDOW = 5.0
+
+
+class InferenceScheduler:
+    """
+    跨流微批推理调度器
+
+    第一帧到达后最多等待 max_latency_ms 收集更多帧，批次满或到期即执行一次推理。
+    每路流同步等待结果、同一时刻至多一帧在途，因此批次已包含所有活跃流时立即推理。
+    摄像头越多，每个批次越满，单核吞吐随之提升。
+    """
+
+    def __init__(self, detector: BehaviorDetector, max_batch_size: int = RTSP_BATCH_SIZE,
+                 max_latency_ms: float = RTSP_BATCH_MAX_LATENCY_MS):
+        """
+        参数:
+            detector: 共享的检测器
+            max_batch_size: 每批最大帧数
+            max_latency_ms: 批次第一帧的最长等待时间（毫秒）
+        """
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max(0.0, max_latency_ms) / 1000
+
+        self._queue: "queue.Queue[Tuple[np.ndarray, Optional[str], float, Future, Optional[PersonTracker], Optional[LetterboxTransform]]]" = queue.Queue()
+        self._last_seen: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stopped = False
+        self._start_lock = threading.Lock()
+
+        # 统计
+        self.batch_count = 0
+        self.frame_count = 0
+        self.total_wait_time = 0.0
+        self.total_infer_time = 0.0
+
+    def start(self):
+        with self._start_lock:
+            self._start_locked()
+
+    def _start_locked(self):
+        """在持有 _start_lock 时启动调度线程；停止后不再启动"""
+        if self._stopped:
+            raise RuntimeError("推理调度器已停止")
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止调度线程，之后提交的帧被拒绝
+
+        停止前已入队的帧仍会得到结果或异常：调度线程退出前处理完当前批次，并让队列中剩余的帧以异常结束
+        """
+        with self._start_lock:
+            self._stopped = True
+            self._running = False
+            thread = self._thread
+        if thread is None:
+            return
+        thread.join(timeout=5)
+        if thread.is_alive():
+            # 当前批次的推理仍在进行，线程结束前会自行清空队列
+            logger.warning("推理调度线程未在 5 秒内退出")
+            return
+        with self._start_lock:
+            if self._thread is thread:
+                self._thread = None
+
+    def submit(self, frame: np.ndarray, stream_id: str = None, tracker: PersonTracker = None,
+               transform: LetterboxTransform = None) -> Future:
+        """
+        提交一帧
+
+        参数:
+            frame: BGR图像（通常为 detector.prepare 缩小后的模型输入，在调用方线程中完成缩放）
+            stream_id: 来源流ID，用于判断批次是否已包含所有活跃流
+            tracker: 来源流的人员跟踪器（可选）
+            transform: frame 为缩小后的图像时的坐标变换，结果映射回原图坐标
+
+        返回:
+            结果的 Future（结果为 _analyze_results 的输出）
+
+        异常:
+            RuntimeError: 调度器已停止
+        """
+        now = time.perf_counter()
+        future = Future()
+        # 与 stop 互斥：停止后不再入队，停止前入队的帧都会被调度线程处理或在其退出时以异常结束
+        with self._start_lock:
+            self._start_locked()
+            if stream_id is not None:
+                self._last_seen[stream_id] = now
+            self._queue.put((frame, stream_id, now, future, tracker, transform))
+        return future
+
+    def detect(self, frame: np.ndarray, stream_id: str = None, timeout: float = None,
+               tracker: PersonTracker = None, transform: LetterboxTransform = None) -> Dict[str, Any]:
+        """提交一帧并等待检测结果"""
+        return self.submit(frame, stream_id, tracker, transform).result(timeout=timeout)
+
+    def _active_streams(self, now: float) -> set:
+        return {sid for sid, ts in list(self._last_seen.items()) if now - ts <= STREAM_ACTIVE_WINDOW}
+
+    def _collect_batch(self) -> List[Tuple[np.ndarray, Optional[str], float, Future, Optional[PersonTracker], Optional[LetterboxTransform]]]:
+        """等待第一帧，然后在截止时间内尽量凑满一批"""
+        try:
+            first = self._queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_latency
+        active = self._active_streams(time.perf_counter())
+        while len(batch) < self.max_batch_size:
+            # 所有活跃流都已在批次中，不会再有新帧到达
+            if active and active <= {item[1] for item in batch}:
+                break
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            frames = [frame for frame, _, _, _, _, _ in batch]
+            try:
+                batch_results = self.detector.predict(frames)
+            except Exception as e:
+                for _, _, _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            infer_end = time.perf_counter()
+
+            for (frame, _, submitted_at, future, tracker, transform), frame_results in zip(batch, batch_results):
+                try:
+                    image_shape = transform.source_shape if transform is not None else frame.shape
+                    future.set_result(self.detector._analyze_results([frame_results], image_shape, tracker, transform))
+                except Exception as e:
+                    future.set_exception(e)
+                self.total_wait_time += start - submitted_at
+
+            self.batch_count += 1
+            self.frame_count += len(batch)
+            self.total_infer_time += infer_end - start
+
+        # 退出时让等待中的调用方结束
+        while True:
+            try:
+                _, _, _, future, _, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("推理调度器已停止"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """批次数量、平均批大小、平均排队与推理耗时"""
+        return {
+            'running': self._running,
+            'max_batch_size': self.max_batch_size,
+            'max_latency_ms': round(self.max_latency * 1000, 1),
+            'batch_count': self.batch_count,
+            'frame_count': self.frame_count,
+            'avg_batch_size': round(self.frame_count / self.batch_count, 2) if self.batch_count else 0.0,
+            'avg_wait_ms': round(self.total_wait_time * 1000 / self.frame_count, 2) if self.frame_count else 0.0,
+            'avg_infer_ms': round(self.total_infer_time * 1000 / self.batch_count, 2) if self.batch_count else 0.0,
+            'queue_depth': self._queue.qsize(),
+        }
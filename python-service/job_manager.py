@@ -0,0 +1,165 @@
+"""
+异步检测任务管理
+视频检测提交为后台任务，在线程池中执行，通过任务ID轮询进度与结果
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import VIDEO_JOB_WORKERS, VIDEO_JOB_TTL
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "PENDING"
+JOB_RUNNING = "RUNNING"
+JOB_COMPLETED = "COMPLETED"
+JOB_FAILED = "FAILED"
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class DetectionJob:
+    """单个检测任务的状态与进度"""
+
+    def __init__(self, job_id: str, metadata: Dict[str, Any]):
+        self.job_id = job_id
+        self.metadata = metadata
+        self.status = JOB_PENDING
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.frames_processed = 0
+        self.total_frames = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def progress(self) -> Dict[str, Any]:
+        """已处理帧数、处理速度与预计剩余时间"""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        fps = self.frames_processed / elapsed if elapsed > 0 else 0.0
+
+        if self.status == JOB_COMPLETED:
+            percent = 100.0
+        elif self.total_frames > 0:
+            percent = min(99.9, self.frames_processed / self.total_frames * 100)
+        else:
+            percent = 0.0
+
+        eta = None
+        if self.status == JOB_RUNNING and fps > 0 and self.total_frames > 0:
+            eta = max(0.0, (self.total_frames - self.frames_processed) / fps)
+
+        return {
+            'frames_processed': self.frames_processed,
+            'total_frames': self.total_frames,
+            'percent': round(percent, 1),
+            'fps': round(fps, 2),
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': self.progress(),
+            'error': self.error,
+            **self.metadata,
+        }
+
+
+class DetectionJobManager:
+    """检测任务管理器：线程池执行任务，保存状态供轮询，过期任务自动清理"""
+
+    def __init__(self, max_workers: int = VIDEO_JOB_WORKERS, ttl_seconds: int = VIDEO_JOB_TTL):
+        """
+        参数:
+            max_workers: 同时执行的任务数
+            ttl_seconds: 已结束任务保留时间（秒）
+        """
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix="detection-job")
+        self._jobs: Dict[str, DetectionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[[ProgressCallback], Dict[str, Any]], **metadata) -> DetectionJob:
+        """
+        提交任务
+
+        参数:
+            func: 任务函数，接收进度回调 (已处理帧数, 总帧数)，返回检测结果
+            metadata: 附加在任务状态中的信息（如文件名、记录ID）
+
+        返回:
+            新建的任务
+        """
+        self._prune()
+        job = DetectionJob(uuid.uuid4().hex, metadata)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[DetectionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """各状态任务数量"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+        for job in jobs:
+            counts[job.status] += 1
+        return counts
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: DetectionJob, func: Callable[[ProgressCallback], Dict[str, Any]]):
+        with self._lock:
+            job.started_at = time.time()
+            job.status = JOB_RUNNING
+
+        def on_progress(frames_processed: int, total_frames: int):
+            job.frames_processed = frames_processed
+            job.total_frames = total_frames
+
+        result, error, status = None, None, JOB_FAILED
+        try:
+            result = func(on_progress)
+            status = JOB_COMPLETED
+        except Exception as e:
+            logger.exception("检测任务失败 %s", job.job_id)
+            error = str(e)
+        finally:
+            # 先写结束时间与结果再切换状态，is_finished 为真时 finished_at 必然已设置
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.finished_at = time.time()
+                job.status = status
+
+    def _prune(self):
+        """清理过期的已结束任务"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.is_finished and job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,73 @@
+"""
+推理输入缩放
+大于推理尺寸的帧在送入模型前按比例缩小一次（长边等于 imgsz，保持宽高比），
+模型输出的关键点与检测框再按缩放比例映射回原图坐标
+"""
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class LetterboxTransform:
+    """
+    原图与模型输入之间的坐标变换
+
+    模型输入为原图按比例缩放后的图像（不含填充）。ultralytics 只在其外侧补边到步长的整数倍、
+    不再缩放，因此其输出坐标即模型输入坐标，乘以各轴的缩放比例即回到原图坐标
+    """
+
+    __slots__ = ('source_shape', 'input_size', 'scale_x', 'scale_y')
+
+    def __init__(self, source_shape: Tuple[int, ...], input_size: Tuple[int, int]):
+        """
+        参数:
+            source_shape: 原图 shape (高, 宽[, 通道])
+            input_size: 模型输入尺寸 (宽, 高)
+        """
+        self.source_shape = source_shape
+        self.input_size = input_size
+        # 按实际取整后的尺寸计算各轴比例，映射回原图时没有取整误差
+        self.scale_x = source_shape[1] / input_size[0]
+        self.scale_y = source_shape[0] / input_size[1]
+
+    @property
+    def is_identity(self) -> bool:
+        return self.scale_x == 1.0 and self.scale_y == 1.0
+
+    def keypoints_to_source(self, keypoints: np.ndarray) -> np.ndarray:
+        """关键点 (N, 17, 3) 从模型输入坐标映射回原图坐标（原地修改并返回）"""
+        if not self.is_identity:
+            keypoints[..., 0] *= self.scale_x
+            keypoints[..., 1] *= self.scale_y
+        return keypoints
+
+    def boxes_to_source(self, boxes: np.ndarray) -> np.ndarray:
+        """检测框 (M, 4) 从模型输入坐标映射回原图坐标（原地修改并返回）"""
+        if not self.is_identity:
+            boxes[:, [0, 2]] *= self.scale_x
+            boxes[:, [1, 3]] *= self.scale_y
+        return boxes
+
+
+def letterbox(frame: np.ndarray, imgsz: Optional[int]) -> Tuple[np.ndarray, LetterboxTransform]:
+    """
+    将帧缩小到推理尺寸
+
+    长边大于 imgsz 时按比例缩小（双线性插值，与 ultralytics 自身的缩放一致），
+    否则原样返回，由 ultralytics 按原逻辑处理
+
+    参数:
+        frame: BGR 图像
+        imgsz: 推理尺寸（长边像素数），为空或 0 时不缩放
+
+    返回:
+        (模型输入图像, 坐标变换)
+    """
+    height, width = frame.shape[:2]
+    if not imgsz or max(height, width) <= imgsz:
+        return frame, LetterboxTransform(frame.shape, (width, height))
+    ratio = imgsz / max(height, width)
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    resized = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+    return resized, LetterboxTransform(frame.shape, size)
@@ -0,0 +1,121 @@
+"""
+人体姿态检测结果的内部表示
+一帧中所有人的关键点保存为一个 (N, 17, 3) 数组，单人对象只保存该数组的视图，
+仅在 API 边界（JSON 响应、告警详情）转换为列表
+"""
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+class PersonPose:
+    """单人检测结果：关键点 (17, 3) 与检测框 (4,) 均为整帧数组的视图，track_id 为跟踪ID（未跟踪时为 None）"""
+
+    __slots__ = ('keypoints', 'box', 'track_id')
+
+    def __init__(self, keypoints: np.ndarray, box: Optional[np.ndarray] = None, track_id: Optional[int] = None):
+        self.keypoints = keypoints
+        self.box = box
+        self.track_id = track_id
+
+    def __getitem__(self, key: str):
+        """兼容 person['keypoints'] / person['box'] 的字典式访问"""
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'keypoints': self.keypoints.tolist(),
+            'box': self.box.tolist() if self.box is not None else None
+        }
+        if self.track_id is not None:
+            data['track_id'] = self.track_id
+        return data
+
+
+class PoseBatch:
+    """
+    一帧内所有人的检测结果
+
+    keypoints 为 (N, 17, 3) 数组，boxes 为 (M, 4) 数组（M 可能小于 N），
+    track_ids 为 (N,) 跟踪ID（未跟踪时为 None），可像人员列表一样取长度、下标访问与迭代
+    """
+
+    __slots__ = ('keypoints', 'boxes', 'track_ids', '_persons')
+
+    def __init__(self, keypoints: np.ndarray, boxes: Optional[np.ndarray] = None,
+                 track_ids: Optional[np.ndarray] = None):
+        self.keypoints = keypoints
+        self.boxes = boxes if boxes is not None else np.empty((0, 4))
+        self.track_ids = None
+        box_count = len(self.boxes)
+        self._persons = [
+            PersonPose(keypoints[i], self.boxes[i] if i < box_count else None)
+            for i in range(len(keypoints))
+        ]
+        if track_ids is not None:
+            self.set_track_ids(track_ids)
+
+    def set_track_ids(self, track_ids: np.ndarray):
+        """设置每人的跟踪ID"""
+        self.track_ids = track_ids
+        for person, track_id in zip(self._persons, track_ids.tolist()):
+            person.track_id = track_id
+
+    def __len__(self) -> int:
+        return len(self._persons)
+
+    def __iter__(self) -> Iterator[PersonPose]:
+        return iter(self._persons)
+
+    def __getitem__(self, index: int) -> PersonPose:
+        return self._persons[index]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """转换为可JSON序列化的人员列表"""
+        return [person.to_dict() for person in self._persons]
+
+    def to_compact_list(self, with_keypoints: bool = True, decimals: int = 1) -> List[Dict[str, Any]]:
+        """
+        转换为精简的人员列表（用于实时推送）：坐标保留 decimals 位小数，关键点置信度保留 3 位
+
+        参数:
+            with_keypoints: 为 False 时只含检测框与跟踪ID
+            decimals: 坐标保留的小数位数
+        """
+        boxes = np.round(self.boxes, decimals).tolist()
+        track_ids = self.track_ids.tolist() if self.track_ids is not None else None
+        keypoints = None
+        if with_keypoints:
+            rounded = self.keypoints.copy()
+            rounded[:, :, :2] = np.round(rounded[:, :, :2], decimals)
+            rounded[:, :, 2] = np.round(rounded[:, :, 2], 3)
+            keypoints = rounded.tolist()
+        persons = []
+        for i in range(len(self._persons)):
+            data = {'box': boxes[i] if i < len(boxes) else None}
+            if track_ids is not None:
+                data['track_id'] = track_ids[i]
+            if keypoints is not None:
+                data['keypoints'] = keypoints[i]
+            persons.append(data)
+        return persons
+
+
+def serialize_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    将检测结果转换为可JSON序列化的字典（浅拷贝，只转换 persons 字段）
+
+    参数:
+        result: _analyze_results 等返回的检测结果
+
+    返回:
+        persons 为列表的检测结果
+    """
+    if result is None:
+        return None
+    persons = result.get('persons')
+    if isinstance(persons, PoseBatch):
+        return {**result, 'persons': persons.to_list()}
+    return result
@@ -0,0 +1,183 @@
+"""
+RTSP 实时预览
+每路摄像头一个编码线程：新帧到达时缩放、叠加最新检测结果并编码一次 JPEG，
+所有观看者共享同一份编码结果，按各自的帧率上限取用
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import AsyncIterator, Optional, Tuple
+
+import cv2
+
+from annotator import FrameAnnotator
+from config import PREVIEW_WIDTH, PREVIEW_JPEG_QUALITY, PREVIEW_MAX_FPS
+
+logger = logging.getLogger(__name__)
+
+# multipart/x-mixed-replace 各帧之间的分隔符
+MJPEG_BOUNDARY = "frame"
+# 没有观看者后编码线程继续等待的时间（秒），期间有新观看者加入时无需重启线程
+IDLE_TIMEOUT = 5.0
+
+
+class PreviewBroadcaster:
+    """
+    单路摄像头的预览编码与分发
+
+    编码线程只在有观看者时运行；编码帧率为所有观看者请求帧率的最大值（不超过 max_fps），
+    最新一帧 JPEG 以 (版本号, 字节) 保存，观看者按版本号判断是否有新帧
+    """
+
+    def __init__(self, handler, width: int = PREVIEW_WIDTH, quality: int = PREVIEW_JPEG_QUALITY,
+                 max_fps: float = PREVIEW_MAX_FPS, annotator: Optional[FrameAnnotator] = None):
+        """
+        参数:
+            handler: 该摄像头的 RTSPStreamHandler
+            width: 预览画面宽度（按比例缩放），0 表示原始分辨率
+            quality: JPEG 质量（1-100）
+            max_fps: 编码帧率上限
+            annotator: 检测结果绘制器，默认新建
+        """
+        self.handler = handler
+        self.width = max(0, width)
+        self.quality = min(100, max(1, quality))
+        self.max_fps = max(0.1, max_fps)
+        self.annotator = annotator or FrameAnnotator()
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # 观看者ID -> 请求的帧率
+        self._viewers = {}
+        self._next_viewer_id = 1
+        self._version = 0
+        self._jpeg: Optional[bytes] = None
+
+        # 指标
+        self.encoded_frames = 0
+        self.sent_frames = 0
+        self.encode_ms = 0.0
+
+    def add_viewer(self, fps: Optional[float] = None) -> Tuple[int, float]:
+        """登记观看者并按需启动编码线程，返回 (观看者ID, 实际帧率上限)"""
+        fps = self.max_fps if not fps or fps <= 0 else min(fps, self.max_fps)
+        with self._lock:
+            viewer_id = self._next_viewer_id
+            self._next_viewer_id += 1
+            self._viewers[viewer_id] = fps
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._encode_loop,
+                                                name=f"preview-{self.handler.camera_id}", daemon=True)
+                self._thread.start()
+        return viewer_id, fps
+
+    def remove_viewer(self, viewer_id: int):
+        with self._lock:
+            self._viewers.pop(viewer_id, None)
+
+    def latest(self) -> Tuple[int, Optional[bytes]]:
+        """最新编码帧 (版本号, JPEG 字节)，尚未编码时字节为 None"""
+        with self._lock:
+            return self._version, self._jpeg
+
+    def _encode_fps(self) -> float:
+        with self._lock:
+            return max(self._viewers.values(), default=0.0)
+
+    def _encode_loop(self):
+        """编码线程：等待新帧，按最高请求帧率编码；长时间无观看者或流停止时退出"""
+        last_seq = 0
+        last_encode = 0.0
+        idle_since = None
+        while self.handler.is_running:
+            fps = self._encode_fps()
+            if fps <= 0:
+                idle_since = idle_since or time.time()
+                if time.time() - idle_since > IDLE_TIMEOUT:
+                    with self._lock:
+                        # 在锁内确认无观看者后再退出，之后加入的观看者会重新启动线程
+                        if not self._viewers:
+                            self._thread = None
+                            logger.debug("预览编码线程空闲退出 [%s]", self.handler.camera_id)
+                            return
+                time.sleep(0.1)
+                continue
+            idle_since = None
+
+            wait = 1.0 / fps - (time.time() - last_encode)
+            if wait > 0:
+                time.sleep(wait)
+            latest = self.handler._wait_latest_frame(last_seq)
+            if latest is None:
+                break
+            frame, last_seq, _ = latest
+            last_encode = time.time()
+            try:
+                self._encode(frame)
+            except Exception as e:
+                logger.exception("[%s] 预览帧编码失败: %s", self.handler.camera_id, e)
+
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+        logger.debug("预览编码线程已退出 [%s]", self.handler.camera_id)
+
+    def _encode(self, frame):
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        if self.width and self.width != width:
+            size = (self.width, max(1, round(height * self.width / width)))
+            canvas = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        else:
+            # 采集线程每帧写入新数组，最新帧本身不会被修改，绘制前复制一次
+            canvas = frame.copy()
+
+        result, result_size = self.handler.get_latest_result_with_size()
+        if result is not None:
+            scale = (canvas.shape[1] / result_size[0], canvas.shape[0] / result_size[1])
+            self.annotator.annotate(canvas, result, scale=scale)
+
+        ok, buffer = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._lock:
+            self._version += 1
+            self._jpeg = buffer.tobytes()
+        self.encoded_frames += 1
+        self.encode_ms = (time.perf_counter() - start) * 1000
+
+    async def stream(self, fps: Optional[float] = None) -> AsyncIterator[bytes]:
+        """
+        单个观看者的 multipart/x-mixed-replace 数据流
+
+        每个观看者只按自己的帧率上限检查版本号，有新帧时发送共享的 JPEG 字节；
+        客户端断开或流停止时结束
+        """
+        viewer_id, fps = self.add_viewer(fps)
+        interval = 1.0 / fps
+        last_version = 0
+        try:
+            while self.handler.is_running:
+                version, jpeg = self.latest()
+                if jpeg is not None and version != last_version:
+                    last_version = version
+                    self.sent_frames += 1
+                    yield (f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                           f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+                await asyncio.sleep(interval)
+        finally:
+            self.remove_viewer(viewer_id)
+
+    def get_stats(self):
+        with self._lock:
+            viewers = len(self._viewers)
+        return {
+            'viewers': viewers,
+            'encoded_frames': self.encoded_frames,
+            'sent_frames': self.sent_frames,
+            'encode_ms': round(self.encode_ms, 2),
+            'width': self.width,
+            'quality': self.quality,
+            'max_fps': self.max_fps,
+        }
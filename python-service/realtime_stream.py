@@ -7,10 +7,12 @@ import time
 from typing import Optional
 from detector import BehaviorDetector
 from alert_notifier import notifier
-from temporal import TemporalBehaviorAnalyzer
+from temporal import TrackedTemporalAnalyzer
+from tracker import PersonTracker
 import logging
+from config import LOG_LEVEL, LOG_FORMAT
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 
@@ -36,11 +38,12 @@ class RealtimeStreamProcessor:
         self.alert_cooldown = alert_cooldown
         self.last_alert_time = {}  # 记录每种告警类型的最后告警时间
         self.detector = BehaviorDetector()
-        # 时序分析器：15帧窗口，至少40%异常、连续3帧满足
-        self.temporal = TemporalBehaviorAnalyzer(
-            window_size=15,
-            min_abnormal_ratio=0.4,
-            min_streak=3,
+        # 人员跟踪器：为每人分配稳定ID，跳过推理的帧沿用跟踪结果
+        self.tracker = PersonTracker()
+        # 时序分析器：每个跟踪目标累积逐帧判定的证据（至少4帧异常），10帧窗口给出主导行为与平均置信度
+        self.temporal = TrackedTemporalAnalyzer(
+            window_size=10,
+            min_evidence=11.0,
             ema_alpha=0.5,
             cooldown_seconds=alert_cooldown,
         )
@@ -49,7 +52,8 @@ class RealtimeStreamProcessor:
         self,
         source: int = 0,
         save_snapshots: bool = True,
-        snapshot_dir: str = "snapshots"
+        snapshot_dir: str = "snapshots",
+        show_window: bool = False
     ):
         """
         处理视频流
@@ -58,6 +62,7 @@ class RealtimeStreamProcessor:
             source: 视频源（0为默认摄像头，或视频文件路径，或RTSP流地址）
             save_snapshots: 是否保存告警快照
             snapshot_dir: 快照保存目录
+            show_window: 是否在窗口中显示每一帧（调试用）；跳过检测的帧上显示按运动估计外推的跟踪结果
         """
         import os
         if save_snapshots:
@@ -80,18 +85,19 @@ class RealtimeStreamProcessor:
                 
                 frame_count += 1
                 
-                # 每3帧检测一次（提高性能）
+                # 每3帧检测一次（提高性能），跳过的帧只在显示时按运动估计外推已跟踪人员的位置
                 if frame_count % 3 != 0:
+                    if show_window:
+                        # 距上一次检测 1 或 2 帧，即 1/3 或 2/3 个检测间隔
+                        self._draw_tracks(frame, self.tracker.predict(steps=(frame_count % 3) / 3))
+                        cv2.imshow('Realtime Detection', frame)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
                     continue
                 
-                # 保存临时帧
-                temp_frame_path = "temp/current_frame.jpg"
-                os.makedirs("temp", exist_ok=True)
-                cv2.imwrite(temp_frame_path, frame)
-                
-                # 检测异常行为
+                # 检测异常行为（直接使用内存中的帧）
                 try:
-                    result = self.detector.detect_image(temp_frame_path)
+                    result = self.detector.detect_frame(frame, tracker=self.tracker)
                     # 更新时序分析
                     self.temporal.update(result)
                     should, dominant_behavior, smoothed_conf = self.temporal.should_alert(
@@ -110,6 +116,7 @@ class RealtimeStreamProcessor:
                         result_to_send = dict(result)
                         result_to_send['behavior_type'] = dominant_behavior
                         result_to_send['confidence'] = float(smoothed_conf)
+                        result_to_send['track_id'] = self.temporal.alert_track_id
 
                         alert_data = notifier.create_alert_from_detection(
                             user_id=self.user_id,
@@ -119,25 +126,27 @@ class RealtimeStreamProcessor:
                         success = notifier.send_alert(alert_data)
                         if success:
                             logger.info(
-                                f"[时序] 告警已发送: {dominant_behavior}, 平滑置信度: {smoothed_conf:.2f}"
+                                f"[时序] 告警已入队: {dominant_behavior} (跟踪ID {self.temporal.alert_track_id}), "
+                                f"平滑置信度: {smoothed_conf:.2f}"
                             )
                     
-                    # 在帧上绘制检测结果（可选）
-                    self._draw_detection_result(frame, result)
-                    
                     # 显示视频流（可选，用于调试）
-                    # cv2.imshow('Realtime Detection', frame)
+                    if show_window:
+                        self._draw_tracks(frame, result['persons'])
+                        self._draw_detection_result(frame, result)
+                        cv2.imshow('Realtime Detection', frame)
                     
                 except Exception as e:
                     logger.error(f"检测帧时出错: {str(e)}")
                 
                 # 按'q'键退出
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                if show_window and cv2.waitKey(1) & 0xFF == ord('q'):
                     break
                 
         finally:
             cap.release()
-            cv2.destroyAllWindows()
+            if show_window:
+                cv2.destroyAllWindows()
             logger.info("视频流处理结束")
     
     def _should_send_alert(self, behavior_type: str, confidence: float) -> bool:
@@ -164,6 +173,23 @@ class RealtimeStreamProcessor:
         
         return True
     
+    def _draw_tracks(self, frame, persons):
+        """
+        在帧上绘制人员检测框与跟踪ID
+        
+        参数:
+            frame: 视频帧
+            persons: 带跟踪ID的人员（PoseBatch）
+        """
+        for person in persons:
+            if person.box is None:
+                continue
+            x1, y1, x2, y2 = (int(v) for v in person.box)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 200, 0), 2)
+            if person.track_id is not None:
+                cv2.putText(frame, f"#{person.track_id}", (x1, max(15, y1 - 5)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 200, 0), 2)
+    
     def _draw_detection_result(self, frame, result):
         """
         在帧上绘制检测结果
@@ -213,7 +239,8 @@ class RealtimeStreamProcessor:
 def start_realtime_detection(
     user_id: int,
     camera_index: int = 0,
-    alert_threshold: float = 0.7
+    alert_threshold: float = 0.7,
+    show_window: bool = False
 ):
     """
     启动实时检测
@@ -222,12 +249,13 @@ def start_realtime_detection(
         user_id: 用户ID
         camera_index: 摄像头索引或视频源
         alert_threshold: 告警阈值
+        show_window: 是否在窗口中显示检测画面
     """
     processor = RealtimeStreamProcessor(
         user_id=user_id,
         alert_threshold=alert_threshold
     )
-    processor.process_stream(source=camera_index)
+    processor.process_stream(source=camera_index, show_window=show_window)
 
 
 if __name__ == "__main__":
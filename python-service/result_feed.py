@@ -0,0 +1,199 @@
+"""
+RTSP 检测结果实时推送
+每路摄像头一个结果源：检测线程每出一个结果发布一次（两次检测之间另发布按跟踪外推的预测结果），WebSocket 订阅者被唤醒后
+取最新结果，按所选字段投影（同一结果、同一字段选择只投影一次），只发送与上次不同的字段
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from pose_data import PoseBatch
+
+logger = logging.getLogger(__name__)
+
+# 摘要字段（fields=summary）
+SUMMARY_FIELDS = ('has_abnormal', 'behavior_type', 'confidence', 'person_count', 'description')
+# 可选字段：summary 展开为 SUMMARY_FIELDS，其余为检测结果中的同名字段
+FIELD_GROUPS = ('summary', 'tracks', 'persons')
+DEFAULT_FIELDS = FIELD_GROUPS
+# 等待新结果的超时（秒），超时后检查流是否仍在运行
+WAIT_TIMEOUT = 1.0
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    解析逗号分隔的字段选择，如 "summary"、"summary,tracks"、"person_count,persons"
+
+    参数:
+        fields: 字段选择，为空时选择全部字段（DEFAULT_FIELDS）
+
+    返回:
+        去重且保持顺序的字段元组
+
+    异常:
+        ValueError: 含有未知字段
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in selected if name not in FIELD_GROUPS and name not in SUMMARY_FIELDS]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}")
+    return selected or DEFAULT_FIELDS
+
+
+def project_result(result: Dict[str, Any], fields: Iterable[str], with_keypoints: bool = True) -> Dict[str, Any]:
+    """按字段选择生成可JSON序列化的精简结果，persons 见 PoseBatch.to_compact_list"""
+    data = {}
+    for name in fields:
+        if name == 'summary':
+            data.update((key, result.get(key)) for key in SUMMARY_FIELDS)
+        elif name == 'persons':
+            persons = result.get('persons')
+            data['persons'] = (persons.to_compact_list(with_keypoints) if isinstance(persons, PoseBatch)
+                               else list(persons or []))
+        else:
+            data[name] = result.get(name)
+    return data
+
+
+class ResultFeed:
+    """
+    单路摄像头的检测结果推送源
+
+    订阅者只关心最新结果：处理较慢的订阅者被唤醒时直接取最新一次，中间结果跳过
+    """
+
+    def __init__(self, handler):
+        """
+        参数:
+            handler: 该摄像头的 RTSPStreamHandler
+        """
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._result: Optional[Dict[str, Any]] = None
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._frame_time: Optional[float] = None
+        self._predicted = False
+        # (字段选择, 是否含关键点) -> 当前结果的投影
+        self._projections: Dict[Tuple[Tuple[str, ...], bool], Dict[str, Any]] = {}
+        # 订阅者 -> (事件循环, 唤醒事件)
+        self._subscribers: Dict[int, Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._next_subscriber_id = 1
+
+        # 指标
+        self.published = 0
+        self.predicted = 0
+        self.sent_messages = 0
+
+    def publish(self, result: Dict[str, Any], frame_size: Tuple[int, int], frame_time: Optional[float] = None):
+        """
+        发布新的检测结果并唤醒所有订阅者（检测线程调用）
+
+        参数:
+            result: 检测结果（发布后不再修改），predicted 为真时是按跟踪运动估计外推的预测结果
+            frame_size: 结果坐标所在的原始帧尺寸 (宽, 高)，客户端据此缩放叠加层
+            frame_time: 对应帧的采集时间
+        """
+        with self._lock:
+            self._seq += 1
+            self._result = result
+            self._frame_size = frame_size
+            self._frame_time = frame_time
+            self._predicted = bool(result.get('predicted'))
+            self._projections = {}
+            subscribers = list(self._subscribers.values())
+            self.published += 1
+            self.predicted += self._predicted
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭，由其 finally 注销
+                pass
+
+    def reset(self):
+        """清空最新结果（流停止时调用），并唤醒订阅者使其退出"""
+        with self._lock:
+            self._result = None
+            self._projections = {}
+            subscribers = list(self._subscribers.values())
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass
+
+    @property
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+    def _latest(self, fields: Tuple[str, ...], with_keypoints: bool):
+        """最新结果的 (序号, 采集时间, 是否预测, 原始帧尺寸, 投影)，投影按字段选择缓存"""
+        with self._lock:
+            if self._result is None:
+                return self._seq, None, False, None, None
+            key = (fields, with_keypoints)
+            projection = self._projections.get(key)
+            if projection is None:
+                projection = project_result(self._result, fields, with_keypoints)
+                self._projections[key] = projection
+            return self._seq, self._frame_time, self._predicted, self._frame_size, projection
+
+    async def stream(self, fields: Tuple[str, ...] = DEFAULT_FIELDS,
+                     with_keypoints: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        单个订阅者的消息流
+
+        每条消息含 seq（结果序号）、frame_time 与 predicted（是否为两次检测之间的预测结果），第一条为完整结果（full=True），
+        之后只含与上一条相比发生变化的字段；流停止时结束
+
+        参数:
+            fields: parse_fields 的结果
+            with_keypoints: persons 中是否包含关键点
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._lock:
+            subscriber_id = self._next_subscriber_id
+            self._next_subscriber_id += 1
+            self._subscribers[subscriber_id] = (loop, event)
+        last_seq = 0
+        sent: Optional[Dict[str, Any]] = None
+        try:
+            while self.handler.is_running:
+                seq, frame_time, predicted, frame_size, projection = self._latest(fields, with_keypoints)
+                if projection is not None and seq != last_seq:
+                    last_seq = seq
+                    current = {'frame_size': list(frame_size), **projection}
+                    message = {'seq': seq, 'frame_time': frame_time, 'predicted': predicted}
+                    if sent is None:
+                        message['full'] = True
+                        message.update(current)
+                    else:
+                        message.update((key, value) for key, value in current.items() if sent.get(key) != value)
+                    sent = current
+                    self.sent_messages += 1
+                    yield message
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            with self._lock:
+                self._subscribers.pop(subscriber_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            'subscribers': subscribers,
+            'published': self.published,
+            'predicted': self.predicted,
+            'sent_messages': self.sent_messages,
+        }
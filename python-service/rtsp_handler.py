@@ -2,19 +2,62 @@
 RTSP流处理模块
 """
 import cv2
+import logging
 import threading
 import time
 import numpy as np
-from typing import Optional, Dict, Any
+from collections import deque
+from typing import Optional, Dict, Any, Tuple
+from config import ALERT_THRESHOLD, ALERT_COOLDOWN, RTSP_PREDICTION_FPS
 from detector import BehaviorDetector
+from temporal import TrackedTemporalAnalyzer
+from tracker import PersonTracker
+from pose_data import serialize_result
+from preview import PreviewBroadcaster
+from result_feed import ResultFeed
+
+logger = logging.getLogger(__name__)
+
+
+class _RateMeter:
+    """滑动时间窗口内的事件速率统计"""
+    
+    def __init__(self, window_seconds: float = 5.0):
+        self.window_seconds = window_seconds
+        self.timestamps = deque()
+    
+    def tick(self, now: float = None):
+        now = time.time() if now is None else now
+        self.timestamps.append(now)
+        self._evict(now)
+    
+    def rate(self) -> float:
+        now = time.time()
+        self._evict(now)
+        if len(self.timestamps) < 2:
+            return 0.0
+        span = now - self.timestamps[0]
+        return len(self.timestamps) / span if span > 0 else 0.0
+    
+    def _evict(self, now: float):
+        while self.timestamps and now - self.timestamps[0] > self.window_seconds:
+            self.timestamps.popleft()
 
 
 class RTSPStreamHandler:
     """RTSP流处理器"""
     
-    def __init__(self, detector: BehaviorDetector, notifier=None):
+    def __init__(self, detector: BehaviorDetector, notifier=None, camera_id: str = "default",
+                 scheduler=None):
         self.detector = detector
         self.notifier = notifier
+        self.camera_id = camera_id
+        # 跨流推理调度器（可选），多路摄像头的帧合并批量推理
+        self.scheduler = scheduler
+        # 本路流的人员跟踪器，检测结果中的每人带稳定的跟踪ID
+        self.tracker = PersonTracker()
+        # 按跟踪目标的时序分析：同一人多次检测持续异常才告警，同类告警共享冷却
+        self.temporal = TrackedTemporalAnalyzer(cooldown_seconds=ALERT_COOLDOWN)
         
         self.rtsp_url: Optional[str] = None
         self.user_id: Optional[int] = None
@@ -23,12 +66,43 @@ class RTSPStreamHandler:
         
         self.cap: Optional[cv2.VideoCapture] = None
         self.is_running: bool = False
+        self.grab_thread: Optional[threading.Thread] = None
         self.thread: Optional[threading.Thread] = None
         
+        # 最新帧只保存采集到的数组引用（置为只读），不复制；frame_seq 为其版本号
         self.latest_frame: Optional[np.ndarray] = None
         self.latest_result: Optional[Dict[str, Any]] = None
+        # 最新检测结果坐标所在的原始帧尺寸 (宽, 高)，用于把结果坐标换算到其他分辨率
+        self.latest_result_size: Optional[Tuple[int, int]] = None
         self.frame_lock = threading.Lock()
+        # 新帧到达通知（与 frame_lock 共用同一把锁）
+        self.frame_cond = threading.Condition(self.frame_lock)
         self.result_lock = threading.Lock()
+        # 最新帧的 JPEG 与最新结果的序列化结果按需生成，每个版本只生成一次
+        self.jpeg_lock = threading.Lock()
+        self._jpeg_frame: Optional[np.ndarray] = None
+        self._jpeg_bytes: Optional[bytes] = None
+        self._serialized_source: Optional[Dict[str, Any]] = None
+        self._serialized_result: Optional[Dict[str, Any]] = None
+        
+        # 运行指标
+        self.started_at: Optional[float] = None
+        self.frame_count = 0
+        self.detection_count = 0
+        self.last_frame_time: Optional[float] = None
+        self.last_result_frame_time: Optional[float] = None
+        self.last_detection_ms = 0.0
+        self.latency_sum_ms = 0.0
+        self.last_alert_latency_ms: Optional[float] = None
+        self.frame_seq = 0
+        self.skipped_frames = 0
+        self.capture_meter = _RateMeter()
+        self.detection_meter = _RateMeter()
+        
+        # 实时预览（MJPEG），有观看者时才编码
+        self.preview = PreviewBroadcaster(self)
+        # 检测结果推送（WebSocket），每出一个结果发布一次
+        self.results = ResultFeed(self)
         
     def start(self, rtsp_url: str, user_id: int, enable_alert: bool = True, detection_interval: float = 2.0):
         """
@@ -53,18 +127,34 @@ class RTSPStreamHandler:
         if not self.cap.isOpened():
             raise RuntimeError(f"无法连接到RTSP流: {rtsp_url}")
         
-        # 设置缓冲区大小
+        # 设置缓冲区大小（很多后端会忽略该设置，由采集线程持续取帧保证只保留最新帧）
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         
         self.is_running = True
-        self.thread = threading.Thread(target=self._process_stream, daemon=True)
+        self.started_at = time.time()
+        self.frame_count = 0
+        self.detection_count = 0
+        self.skipped_frames = 0
+        self.frame_seq = 0
+        self.latency_sum_ms = 0.0
+        self.tracker.reset()
+        self.temporal.reset()
+        self.grab_thread = threading.Thread(target=self._grab_frames, name=f"rtsp-grab-{self.camera_id}", daemon=True)
+        self.thread = threading.Thread(target=self._process_stream, name=f"rtsp-{self.camera_id}", daemon=True)
+        self.grab_thread.start()
         self.thread.start()
         
-        print(f"✓ RTSP流已启动: {rtsp_url}")
+        logger.info("RTSP流已启动 [%s]: %s", self.camera_id, rtsp_url)
         
     def stop(self):
         """停止RTSP流处理"""
         self.is_running = False
+        with self.frame_cond:
+            self.frame_cond.notify_all()
+        
+        if self.grab_thread:
+            self.grab_thread.join(timeout=5)
+            self.grab_thread = None
         
         if self.thread:
             self.thread.join(timeout=5)
@@ -76,96 +166,263 @@ class RTSPStreamHandler:
         
         with self.frame_lock:
             self.latest_frame = None
+        with self.jpeg_lock:
+            self._jpeg_frame = None
+            self._jpeg_bytes = None
         
         with self.result_lock:
             self.latest_result = None
+            self.latest_result_size = None
+            self._serialized_source = None
+            self._serialized_result = None
+        self.results.reset()
         
-        print("✓ RTSP流已停止")
-        
-    def _process_stream(self):
-        """处理RTSP流的主循环"""
-        last_detection_time = 0
-        frame_count = 0
+        logger.info("RTSP流已停止 [%s]", self.camera_id)
         
+    def _grab_frames(self):
+        """采集线程：持续读取，只保留最新解码帧，避免后端缓冲导致延迟累积"""
         while self.is_running:
             try:
                 ret, frame = self.cap.read()
                 
                 if not ret:
-                    print("⚠ 无法读取RTSP流帧，尝试重新连接...")
+                    logger.warning("无法读取RTSP流帧，尝试重新连接 [%s]...", self.camera_id)
                     time.sleep(1)
                     # 尝试重新连接
                     if self.cap:
                         self.cap.release()
                     self.cap = cv2.VideoCapture(self.rtsp_url)
                     if not self.cap.isOpened():
-                        print("✗ 重新连接失败")
+                        logger.error("重新连接失败 [%s]", self.camera_id)
                         break
                     continue
                 
-                frame_count += 1
+                frame_time = time.time()
+                self.frame_count += 1
+                self.capture_meter.tick(frame_time)
                 
-                # 更新最新帧
-                with self.frame_lock:
-                    self.latest_frame = frame.copy()
+                # read() 每次返回新数组，直接发布引用；置为只读，读取方需要修改时自行复制
+                frame.flags.writeable = False
                 
+                # 更新最新帧并唤醒检测线程
+                with self.frame_cond:
+                    self.latest_frame = frame
+                    self.frame_seq += 1
+                    self.last_frame_time = frame_time
+                    self.frame_cond.notify_all()
+                    
+            except Exception as e:
+                logger.exception("RTSP流采集错误 [%s]: %s", self.camera_id, e)
+                time.sleep(1)
+        
+        # 重连失败退出时同步运行状态
+        self.is_running = False
+        with self.frame_cond:
+            self.frame_cond.notify_all()
+        logger.info("RTSP流采集线程已退出 [%s] (共采集 %d 帧)", self.camera_id, self.frame_count)
+    
+    def _wait_latest_frame(self, last_seq: int):
+        """等待比 last_seq 更新的帧，返回 (帧, 序号, 采集时间)；流停止时返回 None"""
+        with self.frame_cond:
+            while self.is_running and self.frame_seq <= last_seq:
+                self.frame_cond.wait(timeout=0.5)
+            if not self.is_running or self.latest_frame is None:
+                return None
+            return self.latest_frame, self.frame_seq, self.last_frame_time
+    
+    def _publish_prediction(self, result: Dict[str, Any], result_frame_time: float, update_period: float,
+                            last_seq: int) -> int:
+        """
+        两次检测之间推送预测结果：上一次检测的人员按跟踪运动估计外推到最新采集帧（只在检测线程调用，
+        跟踪器只在本线程发起的检测中更新，无需加锁）
+        
+        参数:
+            result: 上一次检测结果
+            result_frame_time: 上一次检测帧的采集时间
+            update_period: 最近两次检测帧的采集时间间隔，即跟踪器速度估计所对应的间隔
+            last_seq: 上一次推送（检测或预测）对应的帧序号
+        
+        返回:
+            本次推送对应的帧序号，未推送时为 last_seq
+        """
+        with self.frame_lock:
+            seq, frame_time = self.frame_seq, self.last_frame_time
+        if seq <= last_seq or not self.results.has_subscribers:
+            return last_seq
+        steps = (frame_time - result_frame_time) / update_period
+        if steps > 1:
+            # 下一次检测已迟到，不再外推超过一个检测间隔
+            return last_seq
+        predicted = self.detector.predict_frame(result, self.tracker, steps)
+        self.results.publish(predicted, self.latest_result_size, frame_time)
+        return seq
+    
+    def _process_stream(self):
+        """检测线程：空闲时取最新帧检测，中间未检测的帧直接丢弃并计数；等待下一次检测期间推送预测结果"""
+        last_detection_time = 0
+        last_seq = 0
+        # 最近一次检测结果、其帧采集时间与最近两次检测帧的间隔，以及最近一次推送的帧序号
+        last_result = None
+        last_result_time = None
+        update_period = None
+        published_seq = 0
+        prediction_period = 1.0 / RTSP_PREDICTION_FPS if RTSP_PREDICTION_FPS > 0 else None
+        
+        while self.is_running:
+            try:
                 # 检测间隔控制
-                current_time = time.time()
-                if current_time - last_detection_time >= self.detection_interval:
-                    last_detection_time = current_time
+                wait = self.detection_interval - (time.time() - last_detection_time)
+                if wait > 0:
+                    if prediction_period is not None and update_period:
+                        published_seq = self._publish_prediction(last_result, last_result_time, update_period,
+                                                                 published_seq)
+                        time.sleep(min(wait, prediction_period))
+                    else:
+                        time.sleep(min(wait, 0.5))
+                    continue
+                
+                latest = self._wait_latest_frame(last_seq)
+                if latest is None:
+                    break
+                frame, seq, frame_time = latest
+                if last_seq > 0:
+                    self.skipped_frames += seq - last_seq - 1
+                last_seq = seq
+                last_detection_time = time.time()
+                
+                # 进行检测：在本线程按比例缩小到推理尺寸一次（保持宽高比），结果坐标为原始帧坐标
+                try:
+                    if self.scheduler is not None:
+                        model_input, transform = self.detector.prepare(frame)
+                        result = self.scheduler.detect(model_input, stream_id=self.camera_id, timeout=30,
+                                                       tracker=self.tracker, transform=transform)
+                    else:
+                        result = self.detector.detect_frame(frame, tracker=self.tracker)
                     
-                    # 调整帧大小以加快检测速度
-                    detect_frame = cv2.resize(frame, (640, 480))
+                    # 更新最新结果
+                    with self.result_lock:
+                        self.latest_result = result
+                        self.latest_result_size = (frame.shape[1], frame.shape[0])
+                    self.results.publish(result, self.latest_result_size, frame_time)
+                    if last_result_time is not None:
+                        update_period = frame_time - last_result_time
+                    last_result, last_result_time, published_seq = result, frame_time, seq
                     
-                    # 保存临时图片
-                    temp_path = "temp/rtsp_frame.jpg"
-                    cv2.imwrite(temp_path, detect_frame)
+                    # 采集到出结果的端到端延迟
+                    latency_ms = (time.time() - frame_time) * 1000
+                    self.detection_count += 1
+                    self.last_result_frame_time = frame_time
+                    self.last_detection_ms = latency_ms
+                    self.latency_sum_ms += latency_ms
+                    self.detection_meter.tick()
                     
-                    # 进行检测
-                    try:
-                        result = self.detector.detect_image(temp_path, visualize=False)
+                    # 单次检测的异常只计入时序分析，满足告警条件（同一人持续异常、不在冷却中）才告警
+                    self.temporal.update(result)
+                    should_alert, behavior_type, smoothed_conf = self.temporal.should_alert(threshold=ALERT_THRESHOLD)
+                    if should_alert and self.enable_alert:
+                        track_id = self.temporal.alert_track_id
+                        logger.warning("[%s] 检测到持续异常: %s (跟踪ID %s, 平滑置信度: %.2f)",
+                                       self.camera_id, behavior_type, track_id, smoothed_conf)
                         
-                        # 更新最新结果
-                        with self.result_lock:
-                            self.latest_result = result
+                        # 保存快照
+                        snapshot_path = f"snapshots/{self.camera_id}_{behavior_type}_{int(time.time())}.jpg"
+                        cv2.imwrite(snapshot_path, frame)
                         
-                        # 如果检测到异常且启用告警
-                        if result['has_abnormal'] and self.enable_alert:
-                            print(f"⚠ 检测到异常: {result['behavior_type']} (置信度: {result['confidence']:.2f})")
-                            
-                            # 保存快照
-                            snapshot_path = f"snapshots/{result['behavior_type']}_{int(time.time())}.jpg"
-                            cv2.imwrite(snapshot_path, frame)
-                            
-                            # 发送告警（如果notifier可用）
-                            if self.notifier:
-                                try:
-                                    alert_data = self.notifier.create_alert_from_detection(
-                                        user_id=self.user_id,
-                                        detection_result=result,
-                                        record_id=None,
-                                        snapshot_path=snapshot_path
-                                    )
-                                    self.notifier.send_alert(alert_data)
-                                except Exception as e:
-                                    print(f"✗ 发送告警失败: {e}")
-                    
-                    except Exception as e:
-                        print(f"✗ 检测失败: {e}")
+                        # 发送告警（如果notifier可用），使用时序分析的行为与平滑置信度
+                        if self.notifier:
+                            try:
+                                alert_result = dict(result, behavior_type=behavior_type,
+                                                    confidence=float(smoothed_conf), track_id=track_id)
+                                alert_data = self.notifier.create_alert_from_detection(
+                                    user_id=self.user_id,
+                                    detection_result=alert_result,
+                                    record_id=None,
+                                    snapshot_path=snapshot_path
+                                )
+                                # 告警只入队，送达延迟见 notifier.get_stats()
+                                self.notifier.send_alert(alert_data)
+                                self.last_alert_latency_ms = (time.time() - frame_time) * 1000
+                            except Exception as e:
+                                logger.error("[%s] 发送告警失败: %s", self.camera_id, e)
+                
+                except Exception as e:
+                    logger.exception("[%s] 检测失败: %s", self.camera_id, e)
                         
             except Exception as e:
-                print(f"✗ RTSP流处理错误: {e}")
+                logger.exception("[%s] RTSP流处理错误: %s", self.camera_id, e)
                 time.sleep(1)
         
-        print(f"✓ RTSP流处理线程已退出 (共处理 {frame_count} 帧)")
+        logger.info("RTSP流检测线程已退出 [%s] (共检测 %d 帧, 丢弃 %d 帧)",
+                    self.camera_id, self.detection_count, self.skipped_frames)
     
     def get_latest_frame(self) -> Optional[np.ndarray]:
-        """获取最新帧"""
+        """获取最新帧（只读数组，不复制；需要修改时由调用方复制）"""
         with self.frame_lock:
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+            return self.latest_frame
+    
+    def get_latest_jpeg(self) -> Optional[bytes]:
+        """
+        获取最新帧的 JPEG 编码
+        
+        每个帧版本只编码一次并缓存，并发请求同一版本时等待并复用同一次编码结果
+        """
+        with self.jpeg_lock:
+            frame = self.get_latest_frame()
+            if frame is None:
+                return None
+            if frame is not self._jpeg_frame:
+                ok, buffer = cv2.imencode('.jpg', frame)
+                if not ok:
+                    return None
+                self._jpeg_frame = frame
+                self._jpeg_bytes = buffer.tobytes()
+            return self._jpeg_bytes
     
     def get_latest_result(self) -> Optional[Dict[str, Any]]:
         """获取最新检测结果"""
         with self.result_lock:
             return self.latest_result.copy() if self.latest_result is not None else None
-
+    
+    def get_serialized_result(self) -> Optional[Dict[str, Any]]:
+        """获取最新检测结果的可 JSON 序列化形式，每个结果只序列化一次（返回值只读）"""
+        with self.result_lock:
+            if self.latest_result is None:
+                return None
+            if self.latest_result is not self._serialized_source:
+                self._serialized_source = self.latest_result
+                self._serialized_result = serialize_result(self.latest_result)
+            return self._serialized_result
+    
+    def get_latest_result_with_size(self) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """获取最新检测结果（不复制，只读）及其坐标所在的原始帧尺寸 (宽, 高)"""
+        with self.result_lock:
+            return self.latest_result, self.latest_result_size
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取运行状态与指标（采集帧率、检测帧率、延迟）"""
+        now = time.time()
+        return {
+            'camera_id': self.camera_id,
+            'is_running': self.is_running,
+            'rtsp_url': self.rtsp_url if self.rtsp_url else None,
+            'uptime_seconds': int(now - self.started_at) if self.started_at and self.is_running else 0,
+            'frame_count': self.frame_count,
+            'detection_count': self.detection_count,
+            'capture_fps': round(self.capture_meter.rate(), 2),
+            'detection_fps': round(self.detection_meter.rate(), 2),
+            # 最新帧距今时间（采集是否停滞）
+            'frame_age_ms': round((now - self.last_frame_time) * 1000, 1) if self.last_frame_time else None,
+            # 最新检测结果对应帧距今时间（结果滞后）
+            'result_lag_ms': round((now - self.last_result_frame_time) * 1000, 1) if self.last_result_frame_time else None,
+            # 采集到出结果的端到端延迟（最近一次 / 平均）
+            'detection_latency_ms': round(self.last_detection_ms, 1),
+            'avg_detection_latency_ms': round(self.latency_sum_ms / self.detection_count, 1) if self.detection_count else 0.0,
+            # 采集到告警发出的延迟（最近一次）
+            'alert_latency_ms': round(self.last_alert_latency_ms, 1) if self.last_alert_latency_ms is not None else None,
+            # 检测线程忙碌期间被新帧覆盖、未检测的帧数
+            'skipped_frames': self.skipped_frames,
+            # 实时预览：观看者数、编码帧数与单帧编码耗时
+            'preview': self.preview.get_stats(),
+            # 结果推送：订阅者数、发布结果数与发送消息数
+            'result_feed': self.results.get_stats(),
+        }
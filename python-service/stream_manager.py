@@ -0,0 +1,114 @@
+"""
+多路RTSP流管理
+按摄像头ID管理多个RTSP流处理器，每路独立采集线程，共享同一个检测器
+"""
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from config import RTSP_MAX_STREAMS
+from detector import BehaviorDetector
+from inference_scheduler import InferenceScheduler
+from rtsp_handler import RTSPStreamHandler
+
+# 兼容旧接口 /rtsp/start 等使用的默认摄像头ID
+DEFAULT_CAMERA_ID = "default"
+
+
+class RTSPStreamManager:
+    """多路RTSP流管理器"""
+
+    def __init__(self, detector: BehaviorDetector, notifier=None, max_streams: int = RTSP_MAX_STREAMS,
+                 scheduler: InferenceScheduler = None):
+        """
+        参数:
+            detector: 所有摄像头共享的检测器
+            notifier: 告警通知器
+            max_streams: 同时运行的最大流数量
+            scheduler: 跨流推理调度器，默认基于 detector 创建
+        """
+        self.detector = detector
+        self.notifier = notifier
+        self.max_streams = max_streams
+        self.scheduler = scheduler or InferenceScheduler(detector)
+        self._handlers: Dict[str, RTSPStreamHandler] = {}
+        self._starting: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self, camera_id: str, rtsp_url: str, user_id: int, enable_alert: bool = True,
+              detection_interval: float = 2.0) -> RTSPStreamHandler:
+        """
+        启动指定摄像头的流处理
+
+        参数:
+            camera_id: 摄像头ID
+            rtsp_url: RTSP流地址
+            user_id: 用户ID
+            enable_alert: 是否启用告警
+            detection_interval: 检测间隔（秒）
+        """
+        with self._lock:
+            handler = self._handlers.get(camera_id)
+            if camera_id in self._starting or (handler is not None and handler.is_running):
+                raise RuntimeError(f"摄像头 {camera_id} 的RTSP流已在运行中")
+
+            running = sum(1 for h in self._handlers.values() if h.is_running)
+            if running >= self.max_streams:
+                raise RuntimeError(f"RTSP流数量已达上限 ({self.max_streams})")
+
+            handler = RTSPStreamHandler(self.detector, self.notifier, camera_id=camera_id,
+                                        scheduler=self.scheduler)
+            # 先占位，避免并发启动同一摄像头
+            self._handlers[camera_id] = handler
+            self._starting.add(camera_id)
+
+        try:
+            handler.start(
+                rtsp_url=rtsp_url,
+                user_id=user_id,
+                enable_alert=enable_alert,
+                detection_interval=detection_interval
+            )
+        except Exception:
+            with self._lock:
+                if self._handlers.get(camera_id) is handler:
+                    del self._handlers[camera_id]
+            raise
+        finally:
+            with self._lock:
+                self._starting.discard(camera_id)
+        return handler
+
+    def stop(self, camera_id: str) -> bool:
+        """停止指定摄像头的流处理，摄像头不存在时返回 False"""
+        with self._lock:
+            handler = self._handlers.pop(camera_id, None)
+        if handler is None:
+            return False
+        handler.stop()
+        return True
+
+    def stop_all(self):
+        """停止所有流"""
+        with self._lock:
+            handlers = list(self._handlers.values())
+            self._handlers.clear()
+        for handler in handlers:
+            handler.stop()
+        self.scheduler.stop()
+
+    def get(self, camera_id: str) -> Optional[RTSPStreamHandler]:
+        with self._lock:
+            return self._handlers.get(camera_id)
+
+    def status(self, camera_id: str) -> Dict[str, Any]:
+        """获取指定摄像头的状态与指标"""
+        handler = self.get(camera_id)
+        if handler is None:
+            return {'camera_id': camera_id, 'is_running': False, 'rtsp_url': None}
+        return handler.get_status()
+
+    def list_status(self) -> List[Dict[str, Any]]:
+        """获取所有摄像头的状态与指标"""
+        with self._lock:
+            handlers = list(self._handlers.values())
+        return [handler.get_status() for handler in handlers]
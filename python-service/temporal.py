@@ -2,13 +2,23 @@
 时序行为分析器
 通过滑动窗口、多帧投票与置信度平滑减少单帧误报
 """
-from collections import deque, Counter, defaultdict
+from collections import deque, defaultdict
 from typing import Deque, Dict, Any, Tuple, Optional
+import math
 import time
 
 
 class TemporalBehaviorAnalyzer:
-    """基于滑动窗口的时序分析器"""
+    """
+    基于滑动窗口的时序分析器
+
+    窗口统计（异常帧数、各行为的帧序号与置信度和）在帧进出窗口时增量维护，
+    update 与 should_alert 的耗时与窗口大小无关。
+
+    设置 min_evidence 时，异常占比与连续帧条件改为按行为累积的证据（CUSUM）：每帧被判为该行为时加
+    log(true_flag_rate / false_flag_rate)，否则加 log((1 - true_flag_rate) / (1 - false_flag_rate))，不低于 0。
+    连续异常不必不间断，偶尔漏判一帧只扣除少量证据；单人的偶发误判很快归零
+    """
 
     def __init__(
         self,
@@ -17,12 +27,30 @@ class TemporalBehaviorAnalyzer:
         min_streak: int = 3,
         ema_alpha: float = 0.5,
         cooldown_seconds: int = 5,
+        min_evidence: Optional[float] = None,
+        false_flag_rate: float = 0.03,
+        true_flag_rate: float = 0.7,
     ) -> None:
+        """
+        参数:
+            window_size: 滑动窗口帧数
+            min_abnormal_ratio: 窗口内异常帧占比下限
+            min_streak: 同一行为连续异常帧数下限
+            ema_alpha: 置信度 EMA 的新值权重
+            cooldown_seconds: 同一行为两次告警的最小间隔
+            min_evidence: 告警所需的累积证据（对数似然比）；为 None 时使用异常占比与连续帧条件
+            false_flag_rate: 正常时每帧被误判为异常的比例（累积证据用）
+            true_flag_rate: 行为发生时每帧被判为异常的比例（累积证据用）
+        """
         self.window_size = window_size
         self.min_abnormal_ratio = min_abnormal_ratio
         self.min_streak = min_streak
         self.ema_alpha = ema_alpha
         self.cooldown_seconds = cooldown_seconds
+        self.min_evidence = min_evidence
+        self._flag_evidence = math.log(true_flag_rate / false_flag_rate)
+        self._miss_evidence = math.log((1 - true_flag_rate) / (1 - false_flag_rate))
+        self.evidence: Dict[str, float] = {}
 
         self.frames: Deque[Dict[str, Any]] = deque(maxlen=window_size)
         self.ema_confidence: Dict[str, float] = defaultdict(float)
@@ -30,6 +58,47 @@ class TemporalBehaviorAnalyzer:
         self.current_streak_count: int = 0
         self.last_alert_time: Dict[str, float] = {}
 
+        # 窗口统计：异常帧数；各行为在窗口内的帧序号（先进先出）与置信度和
+        self._frame_seq = 0
+        self._abnormal_count = 0
+        self._behavior_seqs: Dict[str, Deque[int]] = {}
+        self._confidence_sums: Dict[str, float] = {}
+        self._updates_since_resync = 0
+
+    def _add_frame_stats(self, frame: Dict[str, Any]) -> None:
+        b = frame['behavior_type']
+        if not (frame['has_abnormal'] and b):
+            return
+        self._abnormal_count += 1
+        seqs = self._behavior_seqs.get(b)
+        if seqs is None:
+            seqs = self._behavior_seqs[b] = deque()
+            self._confidence_sums[b] = 0.0
+        seqs.append(self._frame_seq)
+        self._confidence_sums[b] += frame['confidence']
+
+    def _remove_frame_stats(self, frame: Dict[str, Any]) -> None:
+        b = frame['behavior_type']
+        if not (frame['has_abnormal'] and b):
+            return
+        self._abnormal_count -= 1
+        seqs = self._behavior_seqs[b]
+        seqs.popleft()
+        if seqs:
+            self._confidence_sums[b] -= frame['confidence']
+        else:
+            del self._behavior_seqs[b]
+            del self._confidence_sums[b]
+
+    def _resync_confidence_sums(self) -> None:
+        """按窗口顺序重新求和，消除反复加减累积的浮点误差（每 window_size 帧一次，均摊 O(1)）"""
+        sums = {b: 0.0 for b in self._confidence_sums}
+        for f in self.frames:
+            if f['has_abnormal'] and f['behavior_type']:
+                sums[f['behavior_type']] += f['confidence']
+        self._confidence_sums = sums
+        self._updates_since_resync = 0
+
     def update(self, result: Dict[str, Any]) -> None:
         """更新滑动窗口与内部状态"""
         frame = {
@@ -38,7 +107,14 @@ class TemporalBehaviorAnalyzer:
             'behavior_type': result.get('behavior_type'),
             'confidence': float(result.get('confidence', 0.0)),
         }
+        if len(self.frames) == self.frames.maxlen:
+            self._remove_frame_stats(self.frames[0])
         self.frames.append(frame)
+        self._frame_seq += 1
+        self._add_frame_stats(frame)
+        self._updates_since_resync += 1
+        if self._updates_since_resync >= self.window_size:
+            self._resync_confidence_sums()
 
         # 更新EMA（按行为类型）
         if frame['has_abnormal'] and frame['behavior_type']:
@@ -48,6 +124,9 @@ class TemporalBehaviorAnalyzer:
                 self.ema_alpha * frame['confidence'] + (1 - self.ema_alpha) * prev
             )
 
+        if self.min_evidence is not None:
+            self._update_evidence(frame['behavior_type'] if frame['has_abnormal'] else None)
+
         # 更新连续计数（按主导行为）
         if frame['has_abnormal'] and frame['behavior_type']:
             if self.current_streak_behavior == frame['behavior_type']:
@@ -60,20 +139,29 @@ class TemporalBehaviorAnalyzer:
             self.current_streak_behavior = None
             self.current_streak_count = 0
 
+    def _update_evidence(self, behavior: Optional[str]) -> None:
+        """本帧判定的行为增加证据，其他行为扣除证据，归零的行为不再保存"""
+        for b in list(self.evidence):
+            if b != behavior:
+                self.evidence[b] += self._miss_evidence
+                if self.evidence[b] <= 0:
+                    del self.evidence[b]
+        if behavior:
+            self.evidence[behavior] = self.evidence.get(behavior, 0.0) + self._flag_evidence
+
     def _window_stats(self) -> Tuple[float, Optional[str], float]:
         """返回窗口内：异常占比、主导行为、主导行为平均置信度"""
         if not self.frames:
             return 0.0, None, 0.0
-        abnormal_frames = [f for f in self.frames if f['has_abnormal'] and f['behavior_type']]
-        abnormal_ratio = len(abnormal_frames) / len(self.frames)
-        if not abnormal_frames:
+        abnormal_ratio = self._abnormal_count / len(self.frames)
+        if not self._abnormal_count:
             return abnormal_ratio, None, 0.0
-        counter = Counter([f['behavior_type'] for f in abnormal_frames])
-        dominant_behavior, _ = counter.most_common(1)[0]
-        avg_conf = (
-            sum(f['confidence'] for f in abnormal_frames if f['behavior_type'] == dominant_behavior)
-            / max(1, sum(1 for f in abnormal_frames if f['behavior_type'] == dominant_behavior))
+        # 帧数最多者为主导行为，并列时取在窗口中最早出现的（与 Counter.most_common 一致）
+        dominant_behavior = min(
+            self._behavior_seqs,
+            key=lambda b: (-len(self._behavior_seqs[b]), self._behavior_seqs[b][0])
         )
+        avg_conf = self._confidence_sums[dominant_behavior] / len(self._behavior_seqs[dominant_behavior])
         return abnormal_ratio, dominant_behavior, avg_conf
 
     def should_alert(self, threshold: float = 0.7) -> Tuple[bool, Optional[str], float]:
@@ -86,13 +174,15 @@ class TemporalBehaviorAnalyzer:
         ema_conf = self.ema_confidence.get(behavior, 0.0)
         smoothed_conf = 0.6 * ema_conf + 0.4 * avg_conf
 
-        # 条件：异常占比、连续帧、置信度
-        if (
-            abnormal_ratio >= self.min_abnormal_ratio
-            and self.current_streak_behavior == behavior
-            and self.current_streak_count >= self.min_streak
-            and smoothed_conf >= threshold
-        ):
+        # 条件：异常占比、连续帧（或本帧异常且累积证据足够）、置信度
+        if self.min_evidence is not None:
+            sustained = (self.current_streak_behavior == behavior
+                         and self.evidence.get(behavior, 0.0) >= self.min_evidence)
+        else:
+            sustained = (abnormal_ratio >= self.min_abnormal_ratio
+                         and self.current_streak_behavior == behavior
+                         and self.current_streak_count >= self.min_streak)
+        if sustained and smoothed_conf >= threshold:
             now = time.time()
             last = self.last_alert_time.get(behavior, 0)
             if now - last >= self.cooldown_seconds:
@@ -103,8 +193,79 @@ class TemporalBehaviorAnalyzer:
 
     def reset(self) -> None:
         self.frames.clear()
+        self._abnormal_count = 0
+        self._behavior_seqs.clear()
+        self._confidence_sums.clear()
+        self._updates_since_resync = 0
         self.current_streak_behavior = None
         self.current_streak_count = 0
+        self.evidence.clear()
         # 不清 cooldown；冷却由时间控制
 
 
+class TrackedTemporalAnalyzer:
+    """
+    按跟踪目标分别做时序分析
+
+    每个跟踪ID一个滑动窗口，只统计该人自身的逐帧判定，避免多人场景中不同人的行为互相冲淡投票；
+    所有窗口共享按行为类型的告警冷却。输入为带 tracks 字段的检测结果（见 BehaviorDetector._analyze_results）
+    """
+
+    def __init__(self, max_idle_frames: int = 30, window_size: int = 10, min_evidence: Optional[float] = 11.0,
+                 **analyzer_kwargs: Any) -> None:
+        """
+        参数:
+            max_idle_frames: 跟踪目标连续多少帧未出现后丢弃其窗口
+            window_size: 每个跟踪目标的窗口大小（主导行为与平均置信度）
+            min_evidence: 每个跟踪目标告警所需的累积证据，见 TemporalBehaviorAnalyzer；默认值至少需要 4 帧异常，
+                比窗口占比 + 连续帧条件更早告警且误报更少（见 benchmark.py tracking）；为 None 时使用窗口条件
+            analyzer_kwargs: 传给每个 TemporalBehaviorAnalyzer 的其他参数
+        """
+        self.max_idle_frames = max_idle_frames
+        self.analyzer_kwargs = dict(analyzer_kwargs, window_size=window_size, min_evidence=min_evidence)
+        self.analyzers: Dict[int, TemporalBehaviorAnalyzer] = {}
+        self.last_alert_time: Dict[str, float] = {}
+        self.alert_track_id: Optional[int] = None
+        self._last_seen: Dict[int, int] = {}
+        self._frame_index = 0
+
+    def update(self, result: Dict[str, Any]) -> None:
+        """用一帧的逐人判定更新对应跟踪目标的窗口"""
+        self._frame_index += 1
+        for track in result.get('tracks') or []:
+            track_id = track['track_id']
+            analyzer = self.analyzers.get(track_id)
+            if analyzer is None:
+                analyzer = self.analyzers[track_id] = TemporalBehaviorAnalyzer(**self.analyzer_kwargs)
+                analyzer.last_alert_time = self.last_alert_time
+            analyzer.update({
+                'has_abnormal': track['behavior_type'] is not None,
+                'behavior_type': track['behavior_type'],
+                'confidence': track['confidence'],
+            })
+            self._last_seen[track_id] = self._frame_index
+
+        for track_id in [t for t, seen in self._last_seen.items() if self._frame_index - seen > self.max_idle_frames]:
+            del self._last_seen[track_id]
+            del self.analyzers[track_id]
+
+    def should_alert(self, threshold: float = 0.7) -> Tuple[bool, Optional[str], float]:
+        """任一跟踪目标满足告警条件即告警，触发的跟踪ID记录在 alert_track_id"""
+        best_conf = 0.0
+        self.alert_track_id = None
+        for track_id, analyzer in self.analyzers.items():
+            # 本帧未出现的目标不触发告警
+            if self._last_seen[track_id] != self._frame_index:
+                continue
+            should, behavior, conf = analyzer.should_alert(threshold)
+            if should:
+                self.alert_track_id = track_id
+                return True, behavior, conf
+            best_conf = max(best_conf, conf)
+        return False, None, best_conf
+
+    def reset(self) -> None:
+        self.analyzers.clear()
+        self._last_seen.clear()
+        self.alert_track_id = None
+        # 不清 cooldown；冷却由时间控制
@@ -0,0 +1,312 @@
+"""
+多目标跟踪
+SORT 风格的轻量跟踪器（仅依赖 NumPy）：对检测框做匀速运动滤波，在与预测框 IoU 达到门限的候选中按中心点距离
+求最优匹配，IoU 不足时退回单纯的中心点距离，为每个人分配稳定的跟踪ID
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import TRACK_IOU_THRESHOLD, TRACK_CENTROID_THRESHOLD, TRACK_MAX_AGE
+from pose_data import PoseBatch
+
+# 检测框缺失时由关键点外接框代替，只使用置信度高于该值的关键点
+KEYPOINT_BOX_CONFIDENCE = 0.3
+
+
+def person_boxes(persons: PoseBatch) -> np.ndarray:
+    """
+    每人的检测框 (N, 4) [x1, y1, x2, y2]
+
+    模型输出的框少于人数时，缺失的框用有效关键点的外接框代替
+    """
+    keypoints = persons.keypoints
+    count = len(keypoints)
+    boxes = np.zeros((count, 4))
+    box_count = min(len(persons.boxes), count)
+    boxes[:box_count] = persons.boxes[:box_count]
+    for i in range(box_count, count):
+        kps = keypoints[i]
+        valid = kps[kps[:, 2] > KEYPOINT_BOX_CONFIDENCE][:, :2]
+        if len(valid) == 0:
+            valid = kps[:, :2]
+        boxes[i, :2] = valid.min(axis=0)
+        boxes[i, 2:] = valid.max(axis=0)
+    return boxes
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组框两两之间的 IoU，(K, 4) x (M, 4) -> (K, M)"""
+    x1 = np.maximum(a[:, np.newaxis, 0], b[np.newaxis, :, 0])
+    y1 = np.maximum(a[:, np.newaxis, 1], b[np.newaxis, :, 1])
+    x2 = np.minimum(a[:, np.newaxis, 2], b[np.newaxis, :, 2])
+    y2 = np.minimum(a[:, np.newaxis, 3], b[np.newaxis, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, np.newaxis] + area_b[np.newaxis, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _greedy_match(score: np.ndarray, valid: np.ndarray, descending: bool) -> List[Tuple[int, int]]:
+    """按得分从优到劣贪心匹配，每行每列至多匹配一次"""
+    rows, cols = np.nonzero(valid)
+    if len(rows) == 0:
+        return []
+    order = np.argsort(score[rows, cols], kind='stable')
+    if descending:
+        order = order[::-1]
+    matched_rows, matched_cols, pairs = set(), set(), []
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in matched_rows or c in matched_cols:
+            continue
+        matched_rows.add(r)
+        matched_cols.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+def _hungarian(cost: List[List[float]]) -> List[int]:
+    """
+    最小总代价的完全匹配（Hungarian 算法，势函数 + 最短增广路，O(n^2 m)），要求行数不多于列数
+
+    返回:
+        每行匹配的列号
+    """
+    rows, cols = len(cost), len(cost[0])
+    inf = float('inf')
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (cols + 1)
+    owner = [0] * (cols + 1)  # owner[j]: 匹配到第 j 列的行（从 1 开始，0 表示未匹配）
+    way = [0] * (cols + 1)
+    for i in range(1, rows + 1):
+        owner[0] = i
+        j0 = 0
+        min_reduced = [inf] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row, u_i0 = cost[i0 - 1], u[i0]
+            delta, j1 = inf, 0
+            for j in range(1, cols + 1):
+                if used[j]:
+                    continue
+                reduced = row[j - 1] - u_i0 - v[j]
+                if reduced < min_reduced[j]:
+                    min_reduced[j] = reduced
+                    way[j] = j0
+                if min_reduced[j] < delta:
+                    delta, j1 = min_reduced[j], j
+            for j in range(cols + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_reduced[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        # 沿增广路翻转匹配
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    assignment = [0] * rows
+    for j in range(1, cols + 1):
+        if owner[j]:
+            assignment[owner[j] - 1] = j - 1
+    return assignment
+
+
+def _linear_assignment(cost: np.ndarray, valid: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    只在 valid 的候选中匹配：先使匹配对数最多，再使总代价最小，每行每列至多匹配一次
+
+    门限把候选切分成互不相连的小组（多数只有一行一列），逐组求解；组内不满足门限的位置代价取一个大于
+    全组代价总和的值，使其只在无法避免时被选中，选中后丢弃
+    """
+    # 只有唯一候选、且该检测也只有这一个候选的目标直接匹配
+    single = valid & (valid.sum(axis=1) == 1)[:, np.newaxis] & (valid.sum(axis=0) == 1)[np.newaxis, :]
+    pairs = list(zip(*(index.tolist() for index in np.nonzero(single))))
+    rows, cols = np.nonzero(valid & ~single.any(axis=1)[:, np.newaxis])
+    if len(rows) == 0:
+        return pairs
+    row_count = valid.shape[0]
+    # 行、列为节点，候选为边，用并查集求连通分量
+    parent = list(range(row_count + valid.shape[1]))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges = list(zip(rows.tolist(), cols.tolist()))
+    for r, c in edges:
+        a, b = find(r), find(row_count + c)
+        if a != b:
+            parent[a] = b
+    groups: Dict[int, Tuple[set, set]] = {}
+    for r, c in edges:
+        group_rows, group_cols = groups.setdefault(find(r), (set(), set()))
+        group_rows.add(r)
+        group_cols.add(c)
+
+    for group_rows, group_cols in groups.values():
+        group_rows, group_cols = sorted(group_rows), sorted(group_cols)
+        if len(group_rows) == 1 or len(group_cols) == 1:
+            # 一行对多列（或多行对一列）时取代价最小的一对
+            r, c = min(((r, c) for r in group_rows for c in group_cols if valid[r, c]), key=lambda rc: cost[rc])
+            pairs.append((r, c))
+            continue
+        block = np.ix_(group_rows, group_cols)
+        sub_valid = valid[block]
+        penalty = float(np.abs(cost[block][sub_valid]).sum()) + 1.0
+        sub_cost = np.where(sub_valid, cost[block], penalty)
+        if len(group_rows) <= len(group_cols):
+            matched = enumerate(_hungarian(sub_cost.tolist()))
+        else:
+            matched = ((r, c) for c, r in enumerate(_hungarian(sub_cost.T.tolist())))
+        pairs += [(group_rows[r], group_cols[c]) for r, c in matched if sub_valid[r, c]]
+    return pairs
+
+
+class PersonTracker:
+    """
+    人员跟踪器，每路视频流一个实例
+
+    每个跟踪目标保存滤波后的框位置与匀速运动估计（alpha-beta 滤波，即固定增益的卡尔曼滤波）及最近一次的检测框与关键点；
+    关联时先在与预测位置 IoU 达到门限的检测中按中心点距离（相对框对角线）求总距离最小的匹配，剩余目标再只按中心点距离匹配，
+    连续 max_age 次未匹配的目标被移除。
+
+    预测位置不直接取上一次的检测框：检测框的抖动会同时进入位置与速度估计，两人交叉时预测误差与两人间距相当，
+    容易互换ID（见 benchmark.py tracking）
+    """
+
+    def __init__(self, iou_threshold: float = TRACK_IOU_THRESHOLD,
+                 centroid_threshold: float = TRACK_CENTROID_THRESHOLD,
+                 max_age: int = TRACK_MAX_AGE, position_gain: float = 0.5, velocity_gain: float = 0.2):
+        """
+        参数:
+            iou_threshold: IoU 匹配的最小值
+            centroid_threshold: 中心点匹配的最大距离（相对跟踪框对角线长度）
+            max_age: 连续未匹配多少次后移除目标
+            position_gain: 位置更新时检测框的权重（1 为直接取检测框）
+            velocity_gain: 速度更新时预测误差的权重
+        """
+        self.iou_threshold = iou_threshold
+        self.centroid_threshold = centroid_threshold
+        self.max_age = max_age
+        self.position_gain = position_gain
+        self.velocity_gain = velocity_gain
+
+        self.reset()
+
+    def reset(self):
+        """清空所有跟踪目标"""
+        self._next_id = 1
+        self._ids = np.empty(0, dtype=np.int64)
+        self._boxes = np.empty((0, 4))
+        self._velocity = np.empty((0, 4))
+        self._detected_boxes = np.empty((0, 4))
+        self._keypoints = np.empty((0, 17, 3))
+        self._misses = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def total_tracks(self) -> int:
+        """reset 以来分配过的跟踪ID个数"""
+        return self._next_id - 1
+
+    def _match(self, predicted: np.ndarray, boxes: np.ndarray) -> List[Tuple[int, int]]:
+        if len(predicted) == 0 or len(boxes) == 0:
+            return []
+        # 中心点距离（相对跟踪框对角线）
+        track_centers = (predicted[:, :2] + predicted[:, 2:]) / 2
+        det_centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        diagonal = np.linalg.norm(predicted[:, 2:] - predicted[:, :2], axis=1)
+        distance = np.linalg.norm(track_centers[:, np.newaxis] - det_centers[np.newaxis], axis=2)
+        distance = distance / np.maximum(diagonal, 1e-6)[:, np.newaxis]
+
+        # IoU 达到门限的候选中按中心点距离匹配：多人重叠时各候选的 IoU 都接近饱和，距离更能区分
+        gate = iou_matrix(predicted, boxes) >= self.iou_threshold
+        pairs = _linear_assignment(distance, gate)
+
+        # IoU 不足（快速移动、框大小突变）时按中心点距离补充匹配
+        track_left = np.setdiff1d(np.arange(len(predicted)), [r for r, _ in pairs])
+        det_left = np.setdiff1d(np.arange(len(boxes)), [c for _, c in pairs])
+        if len(track_left) and len(det_left):
+            left = distance[np.ix_(track_left, det_left)]
+            extra = _linear_assignment(left, left <= self.centroid_threshold)
+            pairs += [(int(track_left[r]), int(det_left[c])) for r, c in extra]
+        return pairs
+
+    def update(self, persons: PoseBatch) -> np.ndarray:
+        """
+        用一次检测结果更新跟踪状态
+
+        参数:
+            persons: 本次检测到的人员
+
+        返回:
+            每人的跟踪ID (N,)，顺序与 persons 一致
+        """
+        boxes = person_boxes(persons)
+        steps = self._misses + 1
+        predicted = self._boxes + self._velocity * steps[:, np.newaxis]
+        pairs = self._match(predicted, boxes)
+
+        ids = np.zeros(len(boxes), dtype=np.int64)
+        matched_tracks = np.zeros(len(self._ids), dtype=bool)
+        if pairs:
+            track, det = (np.array(index) for index in zip(*pairs))
+            ids[det] = self._ids[track]
+            matched_tracks[track] = True
+            residual = boxes[det] - predicted[track]
+            self._boxes[track] = predicted[track] + self.position_gain * residual
+            self._velocity[track] += self.velocity_gain * residual / steps[track][:, np.newaxis]
+            self._detected_boxes[track] = boxes[det]
+            self._keypoints[track] = persons.keypoints[det]
+            self._misses[track] = 0
+
+        # 未匹配的目标下次按更长的时间外推，超过 max_age 后移除
+        self._misses[~matched_tracks] += 1
+        keep = self._misses <= self.max_age
+
+        new = ids == 0
+        new_count = int(new.sum())
+        if new_count:
+            ids[new] = np.arange(self._next_id, self._next_id + new_count)
+            self._next_id += new_count
+        self._ids = np.concatenate([self._ids[keep], ids[new]])
+        self._boxes = np.concatenate([self._boxes[keep], boxes[new]])
+        self._velocity = np.concatenate([self._velocity[keep], np.zeros((new_count, 4))])
+        self._detected_boxes = np.concatenate([self._detected_boxes[keep], boxes[new]])
+        self._keypoints = np.concatenate([self._keypoints[keep], persons.keypoints[new].reshape(-1, 17, 3)])
+        self._misses = np.concatenate([self._misses[keep], np.zeros(new_count, dtype=np.int64)])
+        return ids
+
+    def predict(self, steps: float = 1.0) -> PoseBatch:
+        """
+        跳过推理的帧上沿用已跟踪人员的检测结果：框与关键点从上一次检测的位置按运动估计平移
+
+        滤波后的位置只用于关联：它落后于检测位置，从它外推反而比直接沿用检测结果偏差更大
+
+        参数:
+            steps: 距离上一次 update 的时间，单位为推理间隔（两次 update 之间的时间，速度按每个推理间隔的位移估计），
+                不是帧数：每 3 帧推理一次时，推理后的第 1、2 帧分别为 1/3、2/3
+
+        返回:
+            预测的人员（带跟踪ID），只包含上一次 update 中检测到的目标
+        """
+        active = self._misses == 0
+        shift = self._velocity[active] * steps
+        boxes = self._detected_boxes[active] + shift
+        keypoints = self._keypoints[active].copy()
+        # 关键点随框中心平移，置信度不变
+        keypoints[:, :, :2] += ((shift[:, :2] + shift[:, 2:]) / 2)[:, np.newaxis, :]
+        return PoseBatch(keypoints, boxes, track_ids=self._ids[active].copy())
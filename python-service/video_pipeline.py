@@ -0,0 +1,195 @@
+"""
+分段流水线
+将视频处理拆分为 解码 / 推理 / 分析可视化 / 编码 等阶段，
+各阶段独立线程运行，阶段之间通过有界队列连接（保持顺序、支持背压）
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 队列结束标记
+_END = object()
+
+
+class _StageStats:
+    """单个阶段的耗时统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0  # 处理耗时
+        self.wait_input_time = 0.0  # 等待上游数据的时间（饥饿）
+        self.wait_output_time = 0.0  # 等待下游队列空位的时间（背压）
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'busy_ms': round(self.busy_time * 1000, 2),
+            'avg_ms': round(self.busy_time * 1000 / self.items, 3) if self.items else 0.0,
+            'wait_input_ms': round(self.wait_input_time * 1000, 2),
+            'wait_output_ms': round(self.wait_output_time * 1000, 2),
+            'utilization': round(self.busy_time / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+
+
+class _QueueStats:
+    """队列深度统计（每次出队时采样）"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def sample(self, depth: int):
+        self.samples += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'capacity': self.maxsize,
+            'avg_depth': round(self.depth_sum / self.samples, 2) if self.samples else 0.0,
+            'max_depth': self.max_depth,
+        }
+
+
+class StagedPipeline:
+    """
+    多线程分段流水线
+
+    source 在第一个线程中迭代产生数据，随后依次经过 stages 中的每个处理函数。
+    每个阶段只有一个线程，因此输出顺序与输入顺序一致；
+    队列满时上游阶段阻塞，实现背压。
+    """
+
+    def __init__(self, source: Iterable, stages: List[Tuple[str, Callable[[Any], Any]]],
+                 source_name: str = "source", queue_size: int = 4):
+        """
+        参数:
+            source: 数据源（可迭代对象），在独立线程中迭代
+            stages: [(阶段名, 处理函数)]，处理函数返回值传给下一阶段
+            source_name: 数据源阶段名称
+            queue_size: 阶段之间队列的最大长度
+        """
+        self.source = source
+        self.stages = stages
+        self.source_name = source_name
+        self.queue_size = max(1, queue_size)
+
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._stage_stats = [_StageStats(source_name)] + [_StageStats(name) for name, _ in stages]
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        self._queue_stats = [
+            _QueueStats(f"{self._stage_stats[i].name}->{name}", self.queue_size)
+            for i, (name, _) in enumerate(stages)
+        ]
+        self._elapsed = 0.0
+
+    def _put(self, q: queue.Queue, item: Any, stats: _StageStats) -> bool:
+        """阻塞放入队列；流水线被中止时返回 False"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.wait_output_time += time.perf_counter() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, index: int, stats: _StageStats) -> Any:
+        """阻塞从第 index 个队列取数据；流水线被中止时返回结束标记"""
+        q = self._queues[index]
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue_stats[index].sample(q.qsize())
+                item = q.get(timeout=0.1)
+                stats.wait_input_time += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _run_source(self):
+        stats = self._stage_stats[0]
+        out_q = self._queues[0] if self._queues else None
+        try:
+            iterator = iter(self.source)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.busy_time += time.perf_counter() - start
+                stats.items += 1
+                if out_q is not None and not self._put(out_q, item, stats):
+                    return
+            if out_q is not None:
+                self._put(out_q, _END, stats)
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_stage(self, index: int, func: Callable[[Any], Any]):
+        stats = self._stage_stats[index + 1]
+        out_q = self._queues[index + 1] if index + 1 < len(self._queues) else None
+        try:
+            while True:
+                item = self._get(index, stats)
+                if item is _END:
+                    break
+                start = time.perf_counter()
+                output = func(item)
+                stats.busy_time += time.perf_counter() - start
+                stats.items += 1
+                if out_q is not None and not self._put(out_q, output, stats):
+                    return
+            if out_q is not None:
+                self._put(out_q, _END, stats)
+        except BaseException as e:
+            self._fail(e)
+
+    def run(self) -> Dict[str, Any]:
+        """运行流水线直到数据源耗尽，返回各阶段统计；任一阶段出错时重新抛出该异常"""
+        threads = [threading.Thread(target=self._run_source, name=self.source_name, daemon=True)]
+        for i, (name, func) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage, args=(i, func), name=name, daemon=True))
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self._elapsed = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+        return self.stats()
+
+    def stop(self):
+        """中止流水线"""
+        self._stop.set()
+
+    def is_stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def stats(self) -> Dict[str, Any]:
+        """各阶段耗时与队列深度统计"""
+        stages = {s.name: s.to_dict(self._elapsed) for s in self._stage_stats}
+        bottleneck = max(self._stage_stats, key=lambda s: s.busy_time).name if self._stage_stats else None
+        return {
+            'elapsed_ms': round(self._elapsed * 1000, 2),
+            'stages': stages,
+            'queues': {q.name: q.to_dict() for q in self._queue_stats},
+            'bottleneck': bottleneck,
+        }
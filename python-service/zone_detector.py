@@ -1,9 +1,416 @@
 """
 区域入侵检测模块
 """
+import logging
 import numpy as np
 import cv2
-from typing import List, Tuple, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pose_data import PoseBatch
+
+logger = logging.getLogger(__name__)
+
+# 按分辨率缓存的区域几何最多保留几种分辨率
+MAX_CACHED_SIZES = 4
+# 标签栅格每像素一个位集（最多 uint64），区域更多时只用精确判断
+MAX_RASTER_ZONES = 64
+# 边界带宽度（像素）：带外像素所在的整格与该像素在区域内外的状态一致，带内的点退回精确判断
+BOUNDARY_BAND_THICKNESS = 7
+
+
+def points_in_polygons(edge_start: np.ndarray, edge_end: np.ndarray, polygon_offsets: np.ndarray,
+                       points: np.ndarray) -> np.ndarray:
+    """
+    批量判断点是否在多边形内（含边界），与 cv2.pointPolygonTest(polygon, point, False) >= 0 逐点结果一致
+    
+    Args:
+        edge_start: 所有多边形的边起点 (E, 2) float32，同一多边形的边连续存放
+        edge_end: 边终点 (E, 2) float32
+        polygon_offsets: 每个多边形第一条边的下标 (M,)
+        points: 点坐标 (P, 2)
+        
+    Returns:
+        (M, P) 布尔数组
+    """
+    # 与 OpenCV 相同：点按 float32 处理，坐标差为 float32，叉积以 double 计算
+    pts = np.asarray(points, dtype=np.float64).astype(np.float32)
+    px, py = pts[np.newaxis, :, 0], pts[np.newaxis, :, 1]
+    x0, y0 = edge_start[:, 0:1], edge_start[:, 1:2]
+    x1, y1 = edge_end[:, 0:1], edge_end[:, 1:2]
+    
+    # 该边与从点出发向右的水平射线不相交
+    skip = ((y0 <= py) & (y1 <= py)) | ((y0 > py) & (y1 > py)) | ((x0 < px) & (x1 < px))
+    # 不相交的边中，点恰好在终点或水平边上
+    on_edge = skip & (py == y1) & (
+        (px == x1) | ((py == y0) & (((x0 <= px) & (px <= x1)) | ((x1 <= px) & (px <= x0))))
+    )
+    cross = ((py - y0).astype(np.float64) * (x1 - x0).astype(np.float64)
+             - (px - x0).astype(np.float64) * (y1 - y0).astype(np.float64))
+    on_edge |= ~skip & (cross == 0)
+    cross = np.where(y1 < y0, -cross, cross)
+    crossings = np.add.reduceat((~skip & (cross > 0)).astype(np.int32), polygon_offsets, axis=0)
+    return np.logical_or.reduceat(on_edge, polygon_offsets, axis=0) | (crossings % 2 == 1)
+
+
+def _fill_even_odd(mask: np.ndarray, vertices: np.ndarray):
+    """
+    按奇偶规则填充多边形（与 points_in_polygons 的判定规则一致；cv2.fillPoly 对自相交或超出画面的多边形规则不同）
+    
+    Args:
+        mask: 待填充的 uint8 图 (H, W)，区域内像素置 1
+        vertices: 多边形顶点 (N, 2)
+    """
+    height, width = mask.shape
+    end = vertices.astype(np.float64)
+    start = np.roll(end, 1, axis=0)
+    y = np.arange(height, dtype=np.float64)[:, np.newaxis]
+    crossing = (start[:, 1] <= y) != (end[:, 1] <= y)
+    dy = np.where(start[:, 1] == end[:, 1], 1.0, end[:, 1] - start[:, 1])
+    xs = np.where(crossing, start[:, 0] + (y - start[:, 1]) * (end[:, 0] - start[:, 0]) / dy, np.inf)
+    xs.sort(axis=1)
+    
+    # 每行相邻两个交点之间为区域内，所有水平线段一次绘制
+    left, right = xs[:, 0::2], xs[:, 1::2]
+    rows, pairs = np.nonzero(np.isfinite(right[:, :left.shape[1]]))
+    first = np.clip(np.ceil(left[rows, pairs]), 0, width - 1)
+    last = np.clip(np.floor(right[rows, pairs]), 0, width - 1)
+    keep = (first <= last) & (left[rows, pairs] < width) & (right[rows, pairs] >= 0)
+    segments = np.stack([np.stack([first, rows], axis=1), np.stack([last, rows], axis=1)], axis=1)
+    if keep.any():
+        cv2.polylines(mask, list(segments[keep].astype(np.int32)), False, 1, 1)
+
+
+# 各类型区域的绘制颜色 (BGR) 与填充透明度，有入侵的区域统一用红色
+ZONE_STYLES = {
+    'RESTRICTED': ((0, 165, 255), 0.2),  # 橙色 - 禁区
+    'SAFE': ((0, 255, 0), 0.15),  # 绿色 - 安全区
+    'MONITORED': ((255, 255, 0), 0.2),  # 黄色 - 监控区
+}
+INTRUSION_STYLE = ((0, 0, 255), 0.3)
+LABEL_FONT_SCALE = 0.6
+
+
+def _draw_zone_shape(canvas: np.ndarray, zone: Dict[str, Any], color, thickness: int):
+    """按区域形状绘制填充（thickness=-1）或轮廓"""
+    coords, shape = zone['coords'], zone['shape']
+    if shape == 'RECTANGLE' and len(coords) >= 2:
+        cv2.rectangle(canvas, tuple(coords[0]), tuple(coords[1]), color, thickness)
+    elif shape == 'CIRCLE' and len(coords) >= 2:
+        radius = int(np.linalg.norm(coords[1] - coords[0]))
+        cv2.circle(canvas, tuple(coords[0]), radius, color, thickness)
+    elif thickness < 0:  # POLYGON
+        cv2.fillPoly(canvas, [coords], color)
+    else:
+        cv2.polylines(canvas, [coords], True, color, thickness)
+
+
+def _draw_zone_label(canvas: np.ndarray, zone: Dict[str, Any], label: str, bg_color):
+    """在区域第一个顶点处绘制带背景的标签"""
+    x, y = (int(v) for v in zone['coords'][0])
+    (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, LABEL_FONT_SCALE, 2)
+    cv2.rectangle(canvas, (x, y - text_h - 8), (x + text_w + 8, y), bg_color, -1)
+    cv2.putText(canvas, label, (x + 4, y - 4), cv2.FONT_HERSHEY_SIMPLEX, LABEL_FONT_SCALE, (255, 255, 255), 2)
+
+
+def _bounding_roi(mask: np.ndarray) -> Tuple[slice, slice]:
+    """非零像素的外接矩形（行切片, 列切片），全零时为空切片"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return slice(0, 0), slice(0, 0)
+    return slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+
+
+class _ZoneOverlay:
+    """
+    一种分辨率下预先绘制好的静态区域叠加层（无入侵时的填充、轮廓与标签）
+
+    填充与轮廓按每像素透明度预乘好颜色，绘制时整个区域范围只需一次混合；
+    标签不透明，按掩码直接覆盖。有入侵的区域在静态层之上只在其外接矩形内重新混合
+    """
+    
+    def __init__(self, zones: List[Dict[str, Any]], image_width: int, image_height: int):
+        shape = (image_height, image_width)
+        color = np.zeros(shape + (3,), dtype=np.uint16)
+        alpha = np.zeros(shape, dtype=np.uint16)
+        ink = np.empty(shape + (3,), dtype=np.uint8)
+        ink_mask = np.empty(shape, dtype=np.uint8)
+        fill = np.empty(shape, dtype=np.uint8)
+        outline = np.empty(shape, dtype=np.uint8)
+        # 每个区域入侵时的 (外接矩形, 透明度, 预乘颜色, 掩码)，只在外接矩形内重新混合
+        self.intrusion_parts: List[Tuple[Tuple[slice, slice], np.ndarray, np.ndarray, np.ndarray]] = []
+        # 每个标签的 (外接矩形, 掩码外置零的像素, 反掩码)
+        self.labels: List[Tuple[Tuple[slice, slice], np.ndarray, np.ndarray]] = []
+        intrusion_color, intrusion_alpha = INTRUSION_STYLE
+        
+        for zone in zones:
+            zone_color, zone_alpha = ZONE_STYLES.get(zone['zone_type'], ZONE_STYLES['MONITORED'])
+            fill[:] = 0
+            outline[:] = 0
+            _draw_zone_shape(fill, zone, 1, -1)
+            _draw_zone_shape(outline, zone, 1, 2)
+            inside, edge = fill.view(bool), outline.view(bool)
+            # 后绘制的区域覆盖先绘制的区域；轮廓在填充内不透明，在填充外按 1 - alpha 混合
+            color[inside | edge] = zone_color
+            alpha[inside] = round(zone_alpha * 256)
+            alpha[edge & inside] = 256
+            alpha[edge & ~inside] = 256 - round(zone_alpha * 256)
+            roi = _bounding_roi(fill | outline)
+            self.intrusion_parts.append(self._blend_part(inside[roi], edge[roi], intrusion_color, intrusion_alpha)
+                                        + (roi,))
+            
+            ink_mask[:] = 0
+            _draw_zone_label(ink, zone, zone['zone_name'], zone_color)
+            _draw_zone_label(ink_mask, zone, zone['zone_name'], 1)
+            roi = _bounding_roi(ink_mask)
+            mask = np.repeat((ink_mask[roi] > 0)[:, :, np.newaxis] * np.uint8(255), 3, axis=2)
+            self.labels.append((roi, ink[roi] & mask, ~mask))
+        
+        # 只保存有内容的矩形范围：out = image - image * alpha + color * alpha，后一项预先算好
+        self.fill_roi = _bounding_roi(alpha)
+        weight = alpha[self.fill_roi].astype(np.float32)[:, :, np.newaxis] / 256
+        self.alpha = np.repeat(np.round(weight * 255).astype(np.uint8), 3, axis=2)
+        self.premultiplied = np.round(color[self.fill_roi] * weight).astype(np.uint8)
+    
+    @staticmethod
+    def _blend_part(inside: np.ndarray, edge: np.ndarray, color, alpha: float):
+        """单个区域的 (透明度, 预乘颜色, 掩码)，透明度规则与静态层相同"""
+        weight = np.zeros(inside.shape, dtype=np.float32)
+        weight[inside] = alpha
+        weight[edge & inside] = 1
+        weight[edge & ~inside] = 1 - alpha
+        weight = weight[:, :, np.newaxis]
+        premultiplied = np.round(np.array(color, dtype=np.float32) * weight).astype(np.uint8)
+        mask = np.repeat(((inside | edge)[:, :, np.newaxis] * np.uint8(255)), 3, axis=2)
+        return np.repeat(np.round(weight * 255).astype(np.uint8), 3, axis=2), premultiplied, mask
+    
+    @staticmethod
+    def _blend(region: np.ndarray, alpha: np.ndarray, premultiplied: np.ndarray) -> np.ndarray:
+        """region - region * alpha + premultiplied，返回新数组"""
+        blended = cv2.multiply(region, alpha, scale=1 / 255)
+        cv2.subtract(region, blended, blended)
+        cv2.add(blended, premultiplied, blended)
+        return blended
+    
+    def render(self, image: np.ndarray, highlighted: List[Tuple[int, Dict[str, Any], str]]) -> np.ndarray:
+        """
+        在图像副本上绘制区域
+        
+        Args:
+            image: 原始图像
+            highlighted: 有入侵的区域 [(区域序号, 区域, 标签文字)]
+            
+        Returns:
+            绘制后的图像
+        """
+        img = image.copy()
+        
+        region = image[self.fill_roi]
+        if region.size:
+            img[self.fill_roi] = self._blend(region, self.alpha, self.premultiplied)
+        
+        # 有入侵的区域以原图为底重新混合，掩码外保留静态层结果
+        for index, _, _ in highlighted:
+            alpha, premultiplied, mask, roi = self.intrusion_parts[index]
+            if not mask.size:
+                continue
+            tinted = self._blend(image[roi], alpha, premultiplied)
+            img[roi] = (tinted & mask) | (img[roi] & ~mask)
+        
+        for roi, pixels, inverse_mask in self.labels:
+            img[roi] = (img[roi] & inverse_mask) | pixels
+        
+        intrusion_color, _ = INTRUSION_STYLE
+        for _, zone, label in highlighted:
+            _draw_zone_label(img, zone, label, intrusion_color)
+        return img
+
+
+class _ZoneLayout:
+    """
+    一种分辨率下编译好的启用区域：坐标已换算为像素，同类形状的参数堆叠为数组，
+    所有点对所有区域的判断只需常数次数组运算
+
+    同时栅格化为两张位集图（第 i 位对应第 i 个区域，允许区域重叠）：labels 标记区域内像素，
+    boundary 标记区域边界附近的像素。点落在非边界像素时查表即得结果，否则按几何精确判断
+    """
+    
+    def __init__(self, zones: List[Dict[str, Any]], image_width: int, image_height: int,
+                 normalize: Callable[[List[List[float]], int, int], np.ndarray]):
+        self.zones: List[Dict[str, Any]] = []
+        rect_rows, rect_bounds = [], []
+        circle_rows, circle_centers, circle_radii = [], [], []
+        polygon_rows, edge_start, edge_end, polygon_offsets = [], [], [], []
+        
+        for zone in zones:
+            if not zone.get('is_active', True):
+                continue
+            zone_id = zone['id']
+            coords = normalize(zone['coordinates'], image_width, image_height)
+            shape = zone.get('shape', 'POLYGON')
+            row = len(self.zones)
+            self.zones.append({
+                'zone': zone,
+                'zone_id': zone_id,
+                'zone_name': zone.get('name', f'Zone {zone_id}'),
+                'zone_type': zone.get('type', 'MONITORED'),
+                'enable_alert': zone.get('enable_alert', True),
+                'shape': shape,
+                'coords': coords,
+            })
+            
+            if shape == 'RECTANGLE' and len(coords) >= 2:
+                # 矩形：使用左上角和右下角两个点
+                (x1, y1), (x2, y2) = coords[0], coords[1]
+                rect_rows.append(row)
+                rect_bounds.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2)))
+            elif shape == 'CIRCLE' and len(coords) >= 2:
+                # 圆形：第一个点是圆心，第二个点用于计算半径
+                center, radius_point = coords[0], coords[1]
+                circle_rows.append(row)
+                circle_centers.append(center)
+                circle_radii.append(np.sqrt((radius_point[0] - center[0])**2 +
+                                            (radius_point[1] - center[1])**2))
+            else:  # POLYGON
+                vertices = coords.reshape(-1, 2).astype(np.float32)
+                polygon_rows.append(row)
+                polygon_offsets.append(sum(len(e) for e in edge_start))
+                edge_start.append(np.roll(vertices, 1, axis=0))
+                edge_end.append(vertices)
+        
+        self.rect_rows = np.array(rect_rows, dtype=np.intp)
+        self.rect_bounds = np.array(rect_bounds, dtype=np.int32).reshape(-1, 4)
+        self.circle_rows = np.array(circle_rows, dtype=np.intp)
+        self.circle_centers = np.array(circle_centers, dtype=np.int32).reshape(-1, 2)
+        self.circle_radii = np.array(circle_radii, dtype=np.float64)
+        self.polygon_rows = np.array(polygon_rows, dtype=np.intp)
+        self.polygon_offsets = np.array(polygon_offsets, dtype=np.intp)
+        self.edge_start = np.concatenate(edge_start) if edge_start else np.empty((0, 2), dtype=np.float32)
+        self.edge_end = np.concatenate(edge_end) if edge_end else np.empty((0, 2), dtype=np.float32)
+        
+        self.width = image_width
+        self.height = image_height
+        self.labels, self.boundary = self._rasterize()
+        self._overlay: Optional[_ZoneOverlay] = None
+    
+    @property
+    def overlay(self) -> _ZoneOverlay:
+        """静态叠加层，首次绘制时构建"""
+        if self._overlay is None:
+            self._overlay = _ZoneOverlay(self.zones, self.width, self.height)
+        return self._overlay
+    
+    def _rasterize(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """构建标签位集图与边界位集图，区域过多时返回 (None, None)"""
+        count = len(self.zones)
+        if count == 0 or count > MAX_RASTER_ZONES:
+            return None, None
+        dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.dtype(t).itemsize * 8 >= count)
+        self.shifts = np.arange(count, dtype=dtype)
+        labels = np.zeros((self.height, self.width), dtype=dtype)
+        boundary = np.zeros((self.height, self.width), dtype=dtype)
+        mask = np.empty((self.height, self.width), dtype=np.uint8)
+        
+        for row, zone in enumerate(self.zones):
+            bit = dtype(1) << dtype(row)
+            coords, shape = zone['coords'], zone['shape']
+            for target, thickness in ((labels, -1), (boundary, BOUNDARY_BAND_THICKNESS)):
+                mask[:] = 0
+                if shape == 'RECTANGLE' and len(coords) >= 2:
+                    cv2.rectangle(mask, tuple(coords[0]), tuple(coords[1]), 1, thickness)
+                elif shape == 'CIRCLE' and len(coords) >= 2:
+                    radius = int(round(float(np.linalg.norm(coords[1] - coords[0]))))
+                    cv2.circle(mask, tuple(coords[0]), radius, 1, thickness)
+                elif thickness < 0:
+                    # 少于3个顶点的多边形没有内部，只在边界带内精确判断
+                    if len(coords) >= 3:
+                        _fill_even_odd(mask, coords)
+                else:
+                    cv2.polylines(mask, [coords], True, 1, thickness)
+                target[mask.view(bool)] |= bit
+        return labels, boundary
+    
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """
+        判断每个点是否在每个区域内（含边界），结果与 contains_exact 一致
+        
+        Args:
+            points: 点坐标 (P, 2)
+            
+        Returns:
+            (区域数, P) 布尔数组，行顺序与 self.zones 一致
+        """
+        if self.labels is None or len(points) == 0:
+            return self.contains_exact(points)
+        
+        cols = np.floor(points[:, 0])
+        rows = np.floor(points[:, 1])
+        in_frame = (cols >= 0) & (cols < self.width) & (rows >= 0) & (rows < self.height)
+        cols = np.where(in_frame, cols, 0).astype(np.intp)
+        rows = np.where(in_frame, rows, 0).astype(np.intp)
+        
+        inside = ((self.labels[rows, cols] >> self.shifts[:, np.newaxis]) & 1).astype(bool)
+        uncertain = ((self.boundary[rows, cols] >> self.shifts[:, np.newaxis]) & 1).astype(bool)
+        uncertain[:, ~in_frame] = True
+        
+        # 靠近边界或在画面外的点按几何精确判断
+        pending = np.flatnonzero(uncertain.any(axis=0))
+        if len(pending):
+            exact = self.contains_exact(points[pending])
+            inside[:, pending] = np.where(uncertain[:, pending], exact, inside[:, pending])
+        return inside
+    
+    def coverage(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        每个框被每个区域覆盖的面积比例（按像素统计）
+        
+        Args:
+            boxes: 检测框 (P, 4) [x1, y1, x2, y2]
+            
+        Returns:
+            (区域数, P) 覆盖比例，取值 0~1
+        """
+        result = np.zeros((len(self.zones), len(boxes)))
+        for k, box in enumerate(boxes):
+            x1, x2 = (int(np.clip(np.floor(v), 0, self.width)) for v in (min(box[0], box[2]), max(box[0], box[2])))
+            y1, y2 = (int(np.clip(np.floor(v), 0, self.height)) for v in (min(box[1], box[3]), max(box[1], box[3])))
+            area = max(x2 - x1, 1) * max(y2 - y1, 1)
+            if self.labels is not None:
+                # 框内不同的位集值很少，按值计数后再展开到各区域
+                values, counts = np.unique(self.labels[y1:y2, x1:x2], return_counts=True)
+                result[:, k] = ((values >> self.shifts[:, np.newaxis]) & 1) @ counts / area
+            else:
+                grid = np.mgrid[y1:y2, x1:x2].reshape(2, -1)[::-1].T + 0.5
+                result[:, k] = self.contains_exact(grid).sum(axis=1) / area
+        return result
+    
+    def contains_exact(self, points: np.ndarray) -> np.ndarray:
+        """
+        按几何精确判断每个点是否在每个区域内（含边界）
+        
+        Args:
+            points: 点坐标 (P, 2)
+            
+        Returns:
+            (区域数, P) 布尔数组，行顺序与 self.zones 一致
+        """
+        inside = np.zeros((len(self.zones), len(points)), dtype=bool)
+        if len(points) == 0:
+            return inside
+        px, py = points[np.newaxis, :, 0], points[np.newaxis, :, 1]
+        
+        if len(self.rect_rows):
+            b = self.rect_bounds
+            inside[self.rect_rows] = ((b[:, 0:1] <= px) & (px <= b[:, 1:2])
+                                      & (b[:, 2:3] <= py) & (py <= b[:, 3:4]))
+        if len(self.circle_rows):
+            c = self.circle_centers
+            dist = np.sqrt((px - c[:, 0:1])**2 + (py - c[:, 1:2])**2)
+            inside[self.circle_rows] = dist <= self.circle_radii[:, np.newaxis]
+        if len(self.polygon_rows):
+            inside[self.polygon_rows] = points_in_polygons(self.edge_start, self.edge_end,
+                                                           self.polygon_offsets, points)
+        return inside
 
 
 class ZoneDetector:
@@ -11,8 +418,10 @@ class ZoneDetector:
     
     def __init__(self):
         self.zones = []
+        # {(宽, 高): 编译后的区域几何}，区域变化时清空
+        self._layouts: Dict[Tuple[int, int], _ZoneLayout] = {}
     
-    def set_zones(self, zones: List[Dict[str, Any]]):
+    def set_zones(self, zones: List[Dict[str, Any]], image_size: Optional[Tuple[int, int]] = None):
         """
         设置检测区域
         
@@ -25,19 +434,41 @@ class ZoneDetector:
                 - shape: 形状类型 (RECTANGLE, POLYGON, CIRCLE)
                 - enable_alert: 是否启用告警
                 - alert_level: 告警级别
+            image_size: 已知的画面尺寸 (宽, 高)，提前构建该分辨率的区域栅格；其他分辨率在首次使用时构建
         """
         self.zones = zones
-        print(f"✓ 已加载 {len(zones)} 个检测区域")
+        self._layouts = {}
+        if image_size is not None:
+            self._layout(*image_size)
+        logger.info("已加载 %d 个检测区域", len(zones))
+    
+    def _layout(self, image_width: int, image_height: int) -> _ZoneLayout:
+        """
+        该分辨率下编译好的区域几何，按分辨率缓存
+        
+        区域列表只应通过 set_zones 修改，否则缓存不会失效
+        """
+        key = (image_width, image_height)
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = _ZoneLayout(self.zones, image_width, image_height, self._normalize_coordinates)
+            if len(self._layouts) >= MAX_CACHED_SIZES:
+                self._layouts.pop(next(iter(self._layouts)))
+            self._layouts[key] = layout
+        return layout
     
-    def check_intrusion(self, persons: List[Dict[str, Any]], 
-                       image_width: int, image_height: int) -> Dict[str, Any]:
+    def check_intrusion(self, persons: Union[PoseBatch, List[Dict[str, Any]]],
+                       image_width: int, image_height: int,
+                       anchor: str = 'center', min_coverage: Optional[float] = None) -> Dict[str, Any]:
         """
         检查人体是否入侵区域
         
         Args:
-            persons: 检测到的人体列表
+            persons: 检测到的人体，PoseBatch（直接使用其 boxes 数组）或带 'box' 的字典列表
             image_width: 图像宽度
             image_height: 图像高度
+            anchor: 判断用的参考点，'center' 为边界框中心，'foot' 为边界框底边中点（脚下位置）
+            min_coverage: 设置后改为按面积判断，边界框被区域覆盖的比例不低于该值即视为入侵
             
         Returns:
             检测结果字典
@@ -53,47 +484,49 @@ class ZoneDetector:
                 'total_persons': len(persons)
             }
         
-        # 遍历每个区域
-        for zone in self.zones:
-            if not zone.get('is_active', True):
-                continue
-            
-            zone_id = zone['id']
-            zone_name = zone.get('name', f'Zone {zone_id}')
-            zone_type = zone.get('type', 'MONITORED')
-            enable_alert = zone.get('enable_alert', True)
-            
-            # 转换区域坐标
-            coordinates = self._normalize_coordinates(
-                zone['coordinates'], 
-                image_width, 
-                image_height
-            )
-            
-            intruders_in_zone = []
-            
-            # 检查每个人是否在区域内
+        # 没有边界框的人不参与判断；PoseBatch 中前 len(boxes) 人有检测框
+        if isinstance(persons, PoseBatch):
+            box_count = min(len(persons.boxes), len(persons))
+            person_indices = list(range(box_count))
+            boxes = np.asarray(persons.boxes[:box_count], dtype=np.float64)
+            person_boxes = boxes.tolist()
+            confidences = [0.0] * box_count
+        else:
+            person_indices = []
+            person_boxes = []
+            confidences = []
             for person_idx, person in enumerate(persons):
-                # 获取人体中心点（使用边界框中心）
-                if 'box' in person:
-                    box = person['box']
-                    center_x = (box[0] + box[2]) / 2
-                    center_y = (box[1] + box[3]) / 2
-                    
-                    # 判断是否在区域内
-                    is_inside = self._point_in_zone(
-                        (center_x, center_y),
-                        coordinates,
-                        zone.get('shape', 'POLYGON')
-                    )
-                    
-                    if is_inside:
-                        intruders_in_zone.append({
-                            'person_id': person_idx,
-                            'center': [int(center_x), int(center_y)],
-                            'box': box,
-                            'confidence': person.get('confidence', 0.0)
-                        })
+                box = person.get('box')
+                if box is not None:
+                    person_indices.append(person_idx)
+                    person_boxes.append(box)
+                    confidences.append(person.get('confidence', 0.0))
+            boxes = np.array(person_boxes, dtype=np.float64).reshape(-1, 4)
+        
+        # 所有人的中心点与参考点一次计算（边界框中心，或底边中点即脚下位置）
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        anchors = np.column_stack([centers[:, 0], boxes[:, 3]]) if anchor == 'foot' else centers
+        
+        # 所有区域对所有人一次判断：参考点查区域栅格，面积覆盖按栅格计数
+        layout = self._layout(image_width, image_height)
+        if min_coverage is not None:
+            membership = layout.coverage(boxes) >= min_coverage
+        else:
+            membership = layout.contains(anchors)
+        for zone, inside in zip(layout.zones, membership):
+            zone_id = zone['zone_id']
+            zone_name = zone['zone_name']
+            zone_type = zone['zone_type']
+            
+            intruders_in_zone = [
+                {
+                    'person_id': person_indices[k],
+                    'center': [int(centers[k, 0]), int(centers[k, 1])],
+                    'box': person_boxes[k],
+                    'confidence': confidences[k]
+                }
+                for k in np.flatnonzero(inside)
+            ]
             
             # 统计该区域的入侵情况
             person_count = len(intruders_in_zone)
@@ -106,12 +539,12 @@ class ZoneDetector:
             }
             
             # 如果有入侵且启用告警
-            if person_count > 0 and enable_alert:
+            if person_count > 0 and zone['enable_alert']:
                 intrusions.append({
                     'zone_id': zone_id,
                     'zone_name': zone_name,
                     'zone_type': zone_type,
-                    'alert_level': zone.get('alert_level', 'MEDIUM'),
+                    'alert_level': zone['zone'].get('alert_level', 'MEDIUM'),
                     'person_count': person_count,
                     'intruders': intruders_in_zone,
                     'description': f'{zone_name}检测到{person_count}人入侵'
@@ -150,45 +583,12 @@ class ZoneDetector:
         
         return coords.astype(np.int32)
     
-    def _point_in_zone(self, point: Tuple[float, float], 
-                      zone_coords: np.ndarray, shape: str) -> bool:
-        """
-        判断点是否在区域内
-        
-        Args:
-            point: 点坐标 (x, y)
-            zone_coords: 区域坐标
-            shape: 形状类型
-            
-        Returns:
-            是否在区域内
-        """
-        if shape == 'RECTANGLE' and len(zone_coords) >= 2:
-            # 矩形：使用左上角和右下角两个点
-            x1, y1 = zone_coords[0]
-            x2, y2 = zone_coords[1]
-            return (min(x1, x2) <= point[0] <= max(x1, x2) and 
-                   min(y1, y2) <= point[1] <= max(y1, y2))
-        
-        elif shape == 'CIRCLE' and len(zone_coords) >= 2:
-            # 圆形：第一个点是圆心，第二个点用于计算半径
-            center = zone_coords[0]
-            radius_point = zone_coords[1]
-            radius = np.sqrt((radius_point[0] - center[0])**2 + 
-                           (radius_point[1] - center[1])**2)
-            dist = np.sqrt((point[0] - center[0])**2 + 
-                          (point[1] - center[1])**2)
-            return dist <= radius
-        
-        else:  # POLYGON
-            # 多边形：使用OpenCV的pointPolygonTest
-            result = cv2.pointPolygonTest(zone_coords, point, False)
-            return result >= 0
-    
     def draw_zones(self, image: np.ndarray, intrusion_result: Dict[str, Any] = None) -> np.ndarray:
         """
         在图像上绘制区域和入侵情况
         
+        静态部分每种分辨率只绘制一次并缓存，每帧只做一次混合，有入侵的区域单独重绘
+        
         Args:
             image: 原始图像
             intrusion_result: 入侵检测结果
@@ -199,79 +599,15 @@ class ZoneDetector:
         if not self.zones:
             return image
         
-        img = image.copy()
-        h, w = img.shape[:2]
-        
-        # 创建半透明叠加层
-        overlay = img.copy()
-        
+        h, w = image.shape[:2]
+        layout = self._layout(w, h)
         zone_stats = intrusion_result.get('zone_stats', {}) if intrusion_result else {}
         
-        for zone in self.zones:
-            if not zone.get('is_active', True):
-                continue
-            
-            zone_id = zone['id']
-            zone_name = zone.get('name', f'Zone {zone_id}')
-            zone_type = zone.get('type', 'MONITORED')
-            
-            # 转换坐标
-            coords = self._normalize_coordinates(zone['coordinates'], w, h)
-            
-            # 判断是否有入侵
-            has_intrusion = zone_stats.get(zone_id, {}).get('has_intrusion', False)
-            
-            # 根据区域类型和入侵状态选择颜色
-            if has_intrusion:
-                color = (0, 0, 255)  # 红色 - 有入侵
-                alpha = 0.3
-            elif zone_type == 'RESTRICTED':
-                color = (0, 165, 255)  # 橙色 - 禁区
-                alpha = 0.2
-            elif zone_type == 'SAFE':
-                color = (0, 255, 0)  # 绿色 - 安全区
-                alpha = 0.15
-            else:
-                color = (255, 255, 0)  # 黄色 - 监控区
-                alpha = 0.2
-            
-            # 绘制区域
-            shape = zone.get('shape', 'POLYGON')
-            if shape == 'RECTANGLE' and len(coords) >= 2:
-                cv2.rectangle(overlay, tuple(coords[0]), tuple(coords[1]), color, -1)
-                cv2.rectangle(img, tuple(coords[0]), tuple(coords[1]), color, 2)
-            elif shape == 'CIRCLE' and len(coords) >= 2:
-                center = tuple(coords[0])
-                radius = int(np.linalg.norm(coords[1] - coords[0]))
-                cv2.circle(overlay, center, radius, color, -1)
-                cv2.circle(img, center, radius, color, 2)
-            else:  # POLYGON
-                cv2.fillPoly(overlay, [coords], color)
-                cv2.polylines(img, [coords], True, color, 2)
-            
-            # 混合透明度
-            cv2.addWeighted(overlay, alpha, img, 1 - alpha, 0, img)
-            
-            # 添加区域标签
-            label_pos = tuple(coords[0])
-            person_count = zone_stats.get(zone_id, {}).get('person_count', 0)
-            
-            if has_intrusion:
-                label = f"{zone_name}: {person_count} person(s)"
-                bg_color = (0, 0, 255)
-            else:
-                label = zone_name
-                bg_color = color
-            
-            # 绘制标签背景
-            (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            cv2.rectangle(img, 
-                         (label_pos[0], label_pos[1] - text_h - 8),
-                         (label_pos[0] + text_w + 8, label_pos[1]),
-                         bg_color, -1)
-            cv2.putText(img, label,
-                       (label_pos[0] + 4, label_pos[1] - 4),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        highlighted = []
+        for index, zone in enumerate(layout.zones):
+            stats = zone_stats.get(zone['zone_id'], {})
+            if stats.get('has_intrusion', False):
+                label = f"{zone['zone_name']}: {stats.get('person_count', 0)} person(s)"
+                highlighted.append((index, zone, label))
         
-        return img
-
+        return layout.overlay.render(image, highlighted)